@@ -1,3 +1,4 @@
+import multiprocessing
 import subprocess
 import sys
 import threading
@@ -14,7 +15,6 @@ dev_mode = "--devMode" in sys.argv
 
 port = 5000 if dev_mode else 52586
 URL = f"http://127.0.0.1:{port}"
-app = create_app()
 
 def is_port_in_use(port: int) -> bool:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
@@ -56,7 +56,7 @@ def get_kill_instructions(port: int) -> str:
 
     return base_message + warning + instructions
 
-def run_waitress():
+def run_waitress(app):
     serve(app, host="0.0.0.0", port=port)
 
 
@@ -145,6 +145,8 @@ def main():
         open_console_and_wait()
         return
 
+    app = create_app()
+
     print("Application started successfully.")
     print(f"Please open your browser and go to {URL}")
     print("(Close this window to stop the server.)")
@@ -161,7 +163,7 @@ def main():
 
     print("\n--- Server logs will appear below ---\n")
 
-    server_thread = threading.Thread(target=run_waitress, daemon=True)
+    server_thread = threading.Thread(target=run_waitress, args=(app,), daemon=True)
     server_thread.start()
 
     open_browser()
@@ -176,4 +178,8 @@ def main():
 
 
 if __name__ == "__main__":
+    # First: in frozen builds, the prediction workers
+    # (Config.SIMPLE_MODEL_PROCESS_POOL) run the executable again and take
+    # over here
+    multiprocessing.freeze_support()
     main()
@@ -3,6 +3,11 @@ from flask_cors import CORS
 from app.config import Config
 from app.routes import main_routes
 from app.api import api_routes
+from app.models.simpleModel.utils.model_handle import warm_up_models
+from app.models.simpleModel.utils.process_pool import (
+    in_prediction_worker,
+    start_prediction_pool,
+)
 
 
 def create_app(serve_frontend=True):
@@ -19,4 +24,15 @@ def create_app(serve_frontend=True):
         app.register_blueprint(main_routes)
     app.register_blueprint(api_routes, url_prefix="/api")
 
+    # Prediction workers re-import the server's main module; they load the
+    # models themselves and must not start a pool of their own
+    if in_prediction_worker():
+        return app
+
+    if app.config["MODEL_WARMUP_AT_STARTUP"]:
+        warm_up_models()
+
+    if app.config["SIMPLE_MODEL_PROCESS_POOL"]:
+        start_prediction_pool()
+
     return app
@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from app.api.services.detect_nmr_peaks import analyze_spectrum
 from app.api.services.logger import log_with_time
+from app.api.services.spectrum_encoding import read_spectrum_request
+from app.models.simpleModel.utils.atom_annotations import AtomAnnotations
 import traceback
 
 detect_spectrum_regions_bp = Blueprint("detect_spectrum_regions_bp", __name__)
@@ -8,15 +10,24 @@ detect_spectrum_regions_bp = Blueprint("detect_spectrum_regions_bp", __name__)
 
 @detect_spectrum_regions_bp.route("/detectSpectrumRegions", methods=["POST"])
 def detect_peaks_nmr():
-    data = request.get_json()
+    try:
+        data, ppm, intensity = read_spectrum_request(request)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": f"Invalid spectrum: {e}"}), 400
+
+    # A binary or MessagePack header can decode to any value, not only a map
+    if data is not None and not isinstance(data, dict):
+        return jsonify({"error": "The request body must be an object"}), 400
 
-    if not data or "spectrum" not in data:
+    if not data or ppm is None:
         return jsonify({"error": "Missing 'spectrum' in request body"}), 400
 
-    spectrum = data["spectrum"]
-    ppm = [point["ppm"] for point in spectrum]
-    intensity = [point["intensity"] for point in spectrum]
-    atom_ids = [point.get("atomID", []) for point in spectrum]
+    if "atomIntervals" in data:
+        atom_ids = AtomAnnotations.from_json(data["atomIntervals"])
+    elif isinstance(data.get("spectrum"), list):
+        atom_ids = [point.get("atomID", []) for point in data["spectrum"]]
+    else:
+        atom_ids = AtomAnnotations.empty()
 
     spectrum_type = data.get("type", "auto")
 
@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify
+from app.models.simpleModel.utils.model_handle import model_states
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.route("/health", methods=["GET"])
+def health():
+    # The server is up; reports the load state and timings of each model
+    return jsonify({"status": "ok", "models": model_states()}), 200
+
+
+@health_bp.route("/ready", methods=["GET"])
+def ready():
+    models = model_states()
+    is_ready = all(model["state"] == "ready" for model in models.values())
+    return (
+        jsonify({"ready": is_ready, "models": models}),
+        200 if is_ready else 503,
+    )
@@ -0,0 +1,223 @@
+import json
+import time
+from flask import Blueprint, Response, request, jsonify, url_for
+import requests
+from app.api.services.kekule_converter import convert_smiles_to_kekule
+from app.api.services.jobs import TooManyJobs, job_manager
+from app.api.routes.predict import call_predictor, checked_prediction
+from app.api.routes.predict_many import fan_out, parse_fan_out_request
+from app.api.routes.simple_model_prediction import (
+    batch_metadata,
+    batch_results,
+    parse_batch_request,
+)
+from app.config import Config
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+def kekulized(smiles):
+    if not smiles:
+        raise ValueError("Missing 'smiles' in request body")
+    try:
+        return convert_smiles_to_kekule(smiles)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(str(e))
+
+
+def predict_job(data):
+    # Body of /api/predict (JSON spectrum); one step
+    smiles = data.get("smiles")
+    endpoint = data.get("endpoint")
+    kekule_smiles = kekulized(smiles)
+    if not endpoint:
+        raise ValueError("Missing 'endpoint' (prediction API URL)")
+    payload = {
+        key: value for key, value in data.items() if key not in ["smiles", "endpoint"]
+    }
+    payload["smiles"] = kekule_smiles
+
+    def work(job):
+        try:
+            response_data, _ = call_predictor(endpoint, payload)
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"Prediction request failed: {str(e)}")
+        result = checked_prediction(response_data, smiles)
+        job.progress(1, [result])
+        return result
+
+    return 1, work
+
+
+def predict_many_job(data):
+    # Body of /api/predictMany; one step per predictor, as they finish
+    smiles = data.get("smiles")
+    kekule_smiles = kekulized(smiles)
+    calls, timeout = parse_fan_out_request(data)
+
+    def work(job):
+        results = [None] * len(calls)
+        outcomes = fan_out(calls, kekule_smiles, smiles, timeout)
+        for done, (i, endpoint, outcome) in enumerate(outcomes, 1):
+            results[i] = {"index": i, "endpoint": endpoint, **outcome}
+            job.progress(done, [results[i]])
+        return {"smiles": smiles, "results": results, "timeout": timeout}
+
+    return len(calls), work
+
+
+def batch_job(data):
+    # Body of /api/simpleModelBatchPrediction; one step per
+    # JOB_BATCH_CHUNK_SIZE molecules
+    smiles_list, nuclei, peaks_only, atom_id_format, render_options = (
+        parse_batch_request(data)
+    )
+    chunk_size = Config.JOB_BATCH_CHUNK_SIZE
+
+    def work(job):
+        results = []
+        for start in range(0, len(smiles_list), chunk_size):
+            chunk = batch_results(
+                smiles_list[start : start + chunk_size],
+                nuclei,
+                peaks_only,
+                atom_id_format,
+                render_options,
+            )
+            results.extend(chunk)
+            job.progress(len(results), chunk)
+        return {"results": results, "metadata": batch_metadata(results, nuclei)}
+
+    return len(smiles_list), work
+
+
+JOB_KINDS = {
+    "predict": predict_job,
+    "predictMany": predict_many_job,
+    "simpleModelBatchPrediction": batch_job,
+}
+
+
+def job_links(job):
+    return {
+        "statusUrl": url_for("api.jobs.job_status", job_id=job.id),
+        "eventsUrl": url_for("api.jobs.job_events", job_id=job.id),
+    }
+
+
+@jobs_bp.route("/jobs/<kind>", methods=["POST"])
+def submit_job(kind):
+    # Same body as the synchronous route of this kind; answers 202 with the
+    # job's ID at once
+    if kind not in JOB_KINDS:
+        return jsonify({"error": f"Unknown job kind: {kind}"}), 404
+
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Missing JSON body"}), 400
+
+    try:
+        total, work = JOB_KINDS[kind](data)
+        job = job_manager.submit(kind, total, work)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except TooManyJobs as e:
+        return jsonify({"error": str(e)}), 429
+
+    return jsonify({**job.summary(with_result=False), **job_links(job)}), 202
+
+
+@jobs_bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    return (
+        jsonify(
+            {
+                "jobs": [
+                    job.summary(with_result=False) for job in job_manager.all_jobs()
+                ],
+                "stats": job_manager.stats(),
+            }
+        ),
+        200,
+    )
+
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    # With the result once done, or the partial results so far
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job: {job_id}"}), 404
+    return jsonify(job.summary()), 200
+
+
+@jobs_bp.route("/jobs/<job_id>", methods=["DELETE"])
+def cancel_job(job_id):
+    # Cancels a job in progress (its current step still runs to its end),
+    # or forgets a finished one
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job: {job_id}"}), 404
+    if job.finished is None:
+        job.cancel()
+    else:
+        job_manager.remove(job_id)
+    return jsonify(job.summary(with_result=False)), 200
+
+
+@jobs_bp.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    # Server-sent events: "status", "progress" (with the new partial results)
+    # and a final "done", "failed" or "cancelled". A stream ends after
+    # JOB_EVENTS_MAX_STREAM_SECONDS; EventSource reconnects with the
+    # Last-Event-ID header and resumes after that event. Once the client has
+    # the final event, reconnecting gets 204, which stops EventSource.
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown or expired job: {job_id}"}), 404
+
+    try:
+        last_event = int(request.headers.get("Last-Event-ID", -1))
+    except ValueError:
+        last_event = -1
+
+    missed, ended = job.events_after(last_event, 0)
+    if ended and not missed:
+        return "", 204
+
+    if not job_manager.open_stream():
+        return (
+            jsonify(
+                {
+                    "error": "Too many event streams, poll "
+                    + url_for("api.jobs.job_status", job_id=job_id)
+                }
+            ),
+            503,
+        )
+
+    def stream():
+        event_id = last_event
+        ends = time.monotonic() + Config.JOB_EVENTS_MAX_STREAM_SECONDS
+        yield "retry: 1000\n\n"
+        while True:
+            events, ended = job.events_after(
+                event_id, Config.JOB_EVENTS_KEEPALIVE_IN_SECONDS
+            )
+            for event_id, name, data in events:
+                yield f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n"
+            if ended or time.monotonic() >= ends:
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    response = Response(
+        stream(),
+        200,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    response.call_on_close(job_manager.close_stream)
+    return response
@@ -1,5 +1,11 @@
 from flask import Blueprint, request, jsonify
-from app.api.services.jcampdxLoader import parse_jcamp
+from app.api.services.jcampdxLoader import parse_jcamp, read_jcamp
+from app.api.services.spectrum_encoding import (
+    negotiate_spectrum_format,
+    spectrum_response,
+    unsupported_format_response,
+)
+from app.models.simpleModel.utils.spectrum_decimation import parse_decimation_parameters
 
 load_file_bp = Blueprint("load_file_bp", __name__)
 
@@ -9,6 +15,10 @@ def load_jcamp():
     if "file" not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
 
+    spectrum_format = negotiate_spectrum_format(request)
+    if spectrum_format is None:
+        return unsupported_format_response()
+
     file = request.files["file"]
     if not file.filename.endswith((".jdx", ".jcamp")):
         return (
@@ -18,7 +28,22 @@ def load_jcamp():
             400,
         )
 
-    data, error = parse_jcamp(file)
+    try:
+        max_points, tolerance = parse_decimation_parameters(
+            {**request.args.to_dict(), **request.form.to_dict()}
+        )
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    if spectrum_format != "json":
+        data, error = read_jcamp(file, max_points, tolerance)
+        if error:
+            return jsonify({"error": error}), 400
+        x = data.pop("x")
+        y = data.pop("y")
+        return spectrum_response(data, x, y, spectrum_format)
+
+    data, error = parse_jcamp(file, max_points, tolerance)
 
     if error:
         return jsonify({"error": error}), 400
@@ -1,11 +1,64 @@
 from flask import Blueprint, request, jsonify
 import requests
 from app.api.services.kekule_converter import convert_smiles_to_kekule
+from app.api.services.predictor_client import (
+    post_to_predictor,
+    predictor_wait_timeout,
+)
+from app.api.services.predictor_cache import predictor_cache, predictor_cache_key
+from app.api.routes.simple_model_prediction import local_prediction
+from app.api.services.spectrum_encoding import (
+    negotiate_spectrum_format,
+    spectrum_response,
+    unsupported_format_response,
+)
+from app.models.simpleModel.utils.atom_annotations import AtomAnnotations
 from app.config import Config
-import time
 
 predict_bp = Blueprint("predict", __name__)
 
+# Relative endpoints served in-process, without an HTTP round trip
+LOCAL_PREDICTORS = {"api/simpleModelPrediction": local_prediction}
+
+
+def call_predictor(endpoint, payload, with_points=True):
+    # (response body, prediction) of a predictor. Relative endpoints in
+    # LOCAL_PREDICTORS run in-process and also give the prediction's arrays;
+    # the others are called over HTTP, through the response cache, and give
+    # None. Raises requests.exceptions.RequestException when a call fails.
+    if endpoint.startswith("http://") or endpoint.startswith("https://"):
+        target_url = endpoint
+    else:
+        path = endpoint.lstrip("/")
+        target_url = f"{Config.LOCAL_PREDICTOR_URL}/{path}"
+        if path in LOCAL_PREDICTORS:
+            local = LOCAL_PREDICTORS[path](payload, with_points)
+            if local is not None:
+                return local
+
+    response_data = predictor_cache.fetch(
+        predictor_cache_key(target_url, payload),
+        lambda: post_to_predictor(target_url, payload),
+        predictor_wait_timeout(target_url),
+    )
+    return response_data, None
+
+
+def checked_prediction(response_data, smiles):
+    checked_response = {
+        "smiles": response_data.get("smiles", smiles),
+        "peaksInfos": response_data.get("peaksInfos", []),
+        "spectrum": response_data.get("spectrum", []),
+        "metadata": dict(response_data.get("metadata", {})),
+    }
+
+    if "atomIntervals" in response_data:
+        checked_response["atomIntervals"] = response_data["atomIntervals"]
+
+    if "nucleusType" not in checked_response["metadata"]:
+        checked_response["metadata"]["nucleusType"] = "Unknown"
+    return checked_response
+
 
 @predict_bp.route("/predict", methods=["POST"])
 def predict():
@@ -14,6 +67,10 @@ def predict():
     if not data:
         return jsonify({"error": "Missing JSON body"}), 400
 
+    spectrum_format = negotiate_spectrum_format(request)
+    if spectrum_format is None:
+        return unsupported_format_response()
+
     smiles = data.get("smiles")
     endpoint = data.get("endpoint")
 
@@ -34,30 +91,41 @@ def predict():
     }
     payload["smiles"] = kekule_smiles
 
-    if endpoint.startswith("http://") or endpoint.startswith("https://"):
-        target_url = endpoint
-    else:
-        base_url = "http://127.0.0.1:52586"
-        target_url = f"{base_url}/{endpoint.lstrip('/')}"
-
     try:
-        response = requests.post(
-            target_url, json=payload, timeout=Config.PREDICTION_MODEL_TIMEOUT_IN_SECONDS
+        response_data, prediction = call_predictor(
+            endpoint, payload, spectrum_format == "json"
         )
-        response.raise_for_status()
-        response_data = response.json()
+        checked_response = checked_prediction(response_data, smiles)
 
-        checked_response = {
-            "smiles": response_data.get("smiles", smiles),
-            "peaksInfos": response_data.get("peaksInfos", []),
-            "spectrum": response_data.get("spectrum", []),
-            "metadata": response_data.get("metadata", {}),
-        }
+        if spectrum_format != "json" and prediction is not None:
+            checked_response.pop("spectrum")
+            checked_response["atomIntervals"] = prediction["annotations"].to_json()
+            return spectrum_response(
+                checked_response, prediction["x"], prediction["y"], spectrum_format
+            )
 
-        if "nucleusType" not in checked_response["metadata"]:
-            checked_response["metadata"]["nucleusType"] = "Unknown"
+        if spectrum_format != "json":
+            spectrum = checked_response.pop("spectrum")
+            ppm = [point["ppm"] for point in spectrum]
+            intensity = [point["intensity"] for point in spectrum]
+            if "atomIntervals" not in checked_response:
+                checked_response["atomIntervals"] = AtomAnnotations.from_points(
+                    ppm, [point.get("atomID", []) for point in spectrum]
+                ).to_json()
+            return spectrum_response(checked_response, ppm, intensity, spectrum_format)
 
         return jsonify(checked_response), 200
 
     except requests.exceptions.RequestException as e:
         return jsonify({"error": f"Prediction request failed: {str(e)}"}), 500
+
+
+@predict_bp.route("/predictCache", methods=["GET"])
+def predict_cache_stats():
+    return jsonify(predictor_cache.stats()), 200
+
+
+@predict_bp.route("/predictCache", methods=["DELETE"])
+def predict_cache_clear():
+    predictor_cache.clear()
+    return jsonify(predictor_cache.stats()), 200
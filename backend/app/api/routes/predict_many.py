@@ -0,0 +1,159 @@
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from flask import Blueprint, Response, request, jsonify
+import requests
+from app.api.services.kekule_converter import convert_smiles_to_kekule
+from app.api.routes.predict import call_predictor, checked_prediction
+from app.config import Config
+
+predict_many_bp = Blueprint("predict_many", __name__)
+
+# Calls of /api/predictMany, shared by all its requests. A call still
+# running at a request's deadline keeps its thread until the predictor
+# answers or its own timeout expires.
+fan_out_executor = ThreadPoolExecutor(
+    max_workers=Config.FAN_OUT_WORKERS, thread_name_prefix="fan-out"
+)
+
+
+def parse_fan_out_request(data):
+    # [(endpoint, payload without smiles)] and the deadline in seconds;
+    # raises ValueError
+    predictions = data.get("predictions")
+    if not isinstance(predictions, list) or not predictions:
+        raise ValueError("Missing 'predictions' list in request body")
+    if len(predictions) > Config.FAN_OUT_MAX_PREDICTIONS:
+        raise ValueError(f"Too many predictions (max {Config.FAN_OUT_MAX_PREDICTIONS})")
+
+    calls = []
+    for i, prediction in enumerate(predictions):
+        if isinstance(prediction, str):
+            prediction = {"endpoint": prediction}
+        if not isinstance(prediction, dict) or not prediction.get("endpoint"):
+            raise ValueError(f"Missing 'endpoint' in prediction {i}")
+        payload = {
+            key: value
+            for key, value in prediction.items()
+            if key not in ["smiles", "endpoint"]
+        }
+        calls.append((str(prediction["endpoint"]), payload))
+
+    timeout = data.get("timeout")
+    if timeout in (None, ""):
+        return calls, Config.FAN_OUT_TIMEOUT_IN_SECONDS
+    try:
+        timeout = float(timeout)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid 'timeout': {timeout}")
+    if not 0 < timeout <= Config.FAN_OUT_TIMEOUT_IN_SECONDS:
+        raise ValueError(
+            f"'timeout' must be between 0 and {Config.FAN_OUT_TIMEOUT_IN_SECONDS}"
+        )
+    return calls, timeout
+
+
+def timed_prediction(endpoint, payload, smiles, submitted):
+    started = time.perf_counter()
+    outcome = {"queuedMs": round((started - submitted) * 1000, 3)}
+    try:
+        response_data, _ = call_predictor(endpoint, payload)
+        if "error" in response_data:
+            outcome.update(status="error", error=str(response_data["error"]))
+        else:
+            outcome.update(
+                status="ok", result=checked_prediction(response_data, smiles)
+            )
+    except requests.exceptions.RequestException as e:
+        outcome.update(status="error", error=f"Prediction request failed: {str(e)}")
+    except Exception as e:
+        outcome.update(status="error", error=str(e))
+    outcome["elapsedMs"] = round((time.perf_counter() - started) * 1000, 3)
+    return outcome
+
+
+def fan_out(calls, kekule_smiles, smiles, timeout):
+    # Starts the calls, and returns an iterator over the (index, endpoint,
+    # outcome) of each call as it finishes, then of the calls without a
+    # result at the deadline
+    start = time.perf_counter()
+    deadline = start + timeout
+    futures = {
+        fan_out_executor.submit(
+            timed_prediction,
+            endpoint,
+            {**payload, "smiles": kekule_smiles},
+            smiles,
+            start,
+        ): (i, endpoint)
+        for i, (endpoint, payload) in enumerate(calls)
+    }
+
+    def outcomes():
+        pending = set(futures)
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield (*futures[future], future.result())
+        for future in pending:
+            yield (*futures[future], outcome_at_deadline(future, timeout))
+
+    return outcomes()
+
+
+def outcome_at_deadline(future, timeout):
+    # A call that has not started yet is dropped
+    if future.cancel() or not future.done():
+        return {"status": "timeout", "error": f"No response within {timeout} s"}
+    return future.result()
+
+
+@predict_many_bp.route("/predictMany", methods=["POST"])
+def predict_many():
+    # One molecule sent to several predictors at once. The results come back
+    # together, in the order of 'predictions', or one JSON line each as they
+    # finish with "stream": true. Calls without a result by the deadline
+    # ('timeout' seconds) are reported as timed out.
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Missing JSON body"}), 400
+
+    smiles = data.get("smiles")
+    if not smiles:
+        return jsonify({"error": "Missing 'smiles' in request body"}), 400
+
+    try:
+        calls, timeout = parse_fan_out_request(data)
+        kekule_smiles = convert_smiles_to_kekule(smiles)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+    start = time.perf_counter()
+    outcomes = fan_out(calls, kekule_smiles, smiles, timeout)
+
+    def summary():
+        return {
+            "smiles": smiles,
+            "elapsedMs": round((time.perf_counter() - start) * 1000, 3),
+            "timeout": timeout,
+        }
+
+    if data.get("stream"):
+
+        def lines():
+            for i, endpoint, outcome in outcomes:
+                line = {"index": i, "endpoint": endpoint, **outcome}
+                yield json.dumps(line) + "\n"
+            yield json.dumps({"done": True, **summary()}) + "\n"
+
+        return Response(lines(), 200, mimetype="application/x-ndjson")
+
+    results = [None] * len(calls)
+    for i, endpoint, outcome in outcomes:
+        results[i] = {"index": i, "endpoint": endpoint, **outcome}
+    return jsonify({**summary(), "results": results}), 200
@@ -0,0 +1,261 @@
+from flask import Blueprint, request, jsonify
+from app.models.simpleModel.utils.draw_peaks_and_spectrum import (
+    ADAPTIVE_BASELINE_POINTS,
+    DEFAULT_FWHM,
+    DEFAULT_RESOLUTION,
+    DEFAULT_SPECTROMETER_FREQ,
+    MULTIPLET_NAMES,
+    PPM_RANGES,
+    line_window_points,
+    multiplet_line_count,
+    parse_grid_parameters,
+    parse_multiplicity,
+    prediction_to_json,
+    render_spectrum,
+)
+from app.models.simpleModel.utils.peak_merging import peaks_from_infos
+from app.models.simpleModel.utils.spectrum_decimation import parse_decimation_parameters
+from app.api.services.spectrum_encoding import (
+    COLUMNAR_MIMETYPE,
+    encode_columns,
+    negotiate_spectrum_format,
+    spectrum_response,
+    unsupported_format_response,
+)
+from app.api.routes.simple_model_prediction import (
+    ATOM_ID_FORMATS,
+    NUCLEI,
+    get_parameters,
+)
+from app.config import Config
+
+render_spectrum_bp = Blueprint("render_spectrum", __name__)
+
+
+def positive_number(parameters, key, default):
+    value = parameters.get(key)
+    if value in (None, ""):
+        return default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid '{key}': {value}")
+    if not 0 < value < float("inf"):
+        raise ValueError(f"'{key}' must be a positive number")
+    return value
+
+
+def parse_frequencies(parameters):
+    # One frequency (MHz) or a list of them
+    value = parameters.get("frequency")
+    if isinstance(value, list):
+        if not value:
+            raise ValueError("'frequency' must not be an empty list")
+        if len(value) > Config.RENDER_MAX_FREQUENCIES:
+            raise ValueError(
+                f"Too many frequencies (max {Config.RENDER_MAX_FREQUENCIES})"
+            )
+        return [
+            positive_number({"frequency": v}, "frequency", None) for v in value
+        ], True
+    return [positive_number(parameters, "frequency", DEFAULT_SPECTROMETER_FREQ)], False
+
+
+def parse_ppm_range(parameters, nucleus):
+    value = parameters.get("ppmRange")
+    if value in (None, ""):
+        if nucleus is None:
+            raise ValueError("Missing 'ppmRange' for an unknown nucleus type")
+        return PPM_RANGES[nucleus]
+    try:
+        low, high = sorted(float(v) for v in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid 'ppmRange': {value}")
+    if not (-1e4 < low < high < 1e4):
+        raise ValueError("'ppmRange' must be two different finite shifts")
+    return low, high
+
+
+def parse_resolution(parameters):
+    value = parameters.get("points")
+    if value in (None, ""):
+        return DEFAULT_RESOLUTION
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid 'points': {value}")
+    if not 2 <= value <= Config.RENDER_MAX_RESOLUTION:
+        raise ValueError(
+            f"'points' must be between 2 and {Config.RENDER_MAX_RESOLUTION}"
+        )
+    return value
+
+
+def check_peaks(peaks):
+    # Raises ValueError on a peak whose atom count or multiplet is over the
+    # limits
+    max_tokens = Config.RENDER_MAX_MULTIPLET_TOKENS
+    for i, peak in enumerate(peaks):
+        if not 0 < peak["nb_atoms"] <= Config.RENDER_MAX_ATOMS_PER_PEAK:
+            raise ValueError(
+                f"'nbAtoms' of peak {i} must be positive and at most "
+                f"{Config.RENDER_MAX_ATOMS_PER_PEAK}"
+            )
+        if len(peak["couplings"]) > Config.RENDER_MAX_COUPLINGS:
+            raise ValueError(
+                f"Too many couplings in peak {i} (max {Config.RENDER_MAX_COUPLINGS})"
+            )
+        multiplicity = peak["multiplicity"] or ""
+        if len(multiplicity) > len(MULTIPLET_NAMES[0]) * max_tokens or (
+            len(parse_multiplicity(multiplicity.lower())) > max_tokens
+        ):
+            raise ValueError(
+                f"Too complex multiplicity in peak {i} (max {max_tokens} multiplets)"
+            )
+        lines = multiplet_line_count(multiplicity, peak["couplings"])
+        if lines > Config.RENDER_MAX_MULTIPLET_LINES:
+            raise ValueError(
+                f"Too many lines in the multiplet of peak {i} "
+                f"(max {Config.RENDER_MAX_MULTIPLET_LINES})"
+            )
+
+
+def check_render_cost(peaks, n_frequencies, ppm_range, fwhm, resolution, grid):
+    # Raises ValueError before rendering when the grid points plus the lines x
+    # window points to evaluate, over all frequencies, are over
+    # Config.RENDER_MAX_LINE_POINTS
+    if fwhm > Config.RENDER_MAX_FWHM_SHARE * (ppm_range[1] - ppm_range[0]):
+        raise ValueError(
+            f"'fwhm' must be at most {Config.RENDER_MAX_FWHM_SHARE:.0%} "
+            "of the ppm range"
+        )
+    grid_mode, points_per_fwhm = grid
+    lines = sum(
+        multiplet_line_count(peak["multiplicity"], peak["couplings"]) for peak in peaks
+    )
+    points = lines * line_window_points(
+        fwhm, ppm_range, resolution, grid_mode, points_per_fwhm
+    )
+    points += ADAPTIVE_BASELINE_POINTS if grid_mode == "adaptive" else resolution
+    if points * n_frequencies > Config.RENDER_MAX_LINE_POINTS:
+        raise ValueError(
+            "Spectrum too costly to render: fewer peaks or frequencies, "
+            "simpler multiplets, narrower lines or fewer points are needed"
+        )
+
+
+@render_spectrum_bp.route("/renderSpectrum", methods=["POST"])
+def render_spectrum_from_peaks():
+    # Spectrum of a peaksInfos list (as returned by the simple models or by
+    # /api/predict) at one or several spectrometer frequencies, without
+    # running any model
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Missing JSON body"}), 400
+
+    spectrum_format = negotiate_spectrum_format(request)
+    if spectrum_format is None:
+        return unsupported_format_response()
+
+    infos = data.get("peaksInfos")
+    if not isinstance(infos, list):
+        return jsonify({"error": "Missing 'peaksInfos' list"}), 400
+    if len(infos) > Config.RENDER_MAX_PEAKS:
+        return (
+            jsonify({"error": f"Too many peaks (max {Config.RENDER_MAX_PEAKS})"}),
+            400,
+        )
+
+    parameters = get_parameters(data)
+    spectrum_type = str(parameters.get("type") or "1H")
+    nucleus = NUCLEI.get(spectrum_type.upper())
+
+    atom_id_format = parameters.get("atomIdFormat") or "points"
+    if atom_id_format not in ATOM_ID_FORMATS:
+        return jsonify({"error": f"Invalid 'atomIdFormat': {atom_id_format}"}), 400
+
+    try:
+        peaks = peaks_from_infos(infos)
+        check_peaks(peaks)
+        frequencies, several = parse_frequencies(parameters)
+        ppm_range = parse_ppm_range(parameters, nucleus)
+        fwhm = positive_number(parameters, "fwhm", DEFAULT_FWHM)
+        resolution = parse_resolution(parameters)
+        max_points, tolerance = parse_decimation_parameters(parameters)
+        grid_mode, points_per_fwhm = parse_grid_parameters(parameters)
+        check_render_cost(
+            peaks,
+            len(frequencies),
+            ppm_range,
+            fwhm,
+            resolution,
+            (grid_mode, points_per_fwhm),
+        )
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    if several and spectrum_format not in ("json", "columnar"):
+        return unsupported_format_response()
+
+    metadata = {
+        "nucleusType": nucleus or spectrum_type,
+        "fwhm": fwhm,
+        "ppmRange": list(ppm_range),
+    }
+
+    spectra = []
+    for frequency in frequencies:
+        x, y, annotations = render_spectrum(
+            peaks,
+            ppm_range,
+            fwhm,
+            resolution,
+            frequency,
+            max_points=max_points,
+            tolerance=tolerance,
+            grid_mode=grid_mode,
+            points_per_fwhm=points_per_fwhm,
+        )
+        spectra.append((frequency, x, y, annotations))
+
+    if not several:
+        frequency, x, y, annotations = spectra[0]
+        response = {
+            "peaksInfos": infos,
+            "metadata": {**metadata, "frequency": frequency},
+        }
+        if spectrum_format != "json":
+            response["atomIntervals"] = annotations.to_json()
+            return spectrum_response(response, x, y, spectrum_format)
+
+        formatted = prediction_to_json(
+            {"x": x, "y": y, "annotations": annotations, "peaksInfos": infos},
+            atom_id_format,
+        )
+        return jsonify({**response, **formatted}), 200
+
+    rendered = []
+    for frequency, x, y, annotations in spectra:
+        if spectrum_format == "columnar":
+            item = {
+                "spectrum": encode_columns(x, y),
+                "atomIntervals": annotations.to_json(),
+            }
+        else:
+            item = prediction_to_json(
+                {"x": x, "y": y, "annotations": annotations, "peaksInfos": infos},
+                atom_id_format,
+            )
+            del item["peaksInfos"]
+        rendered.append({"frequency": frequency, **item})
+
+    response = jsonify(
+        {
+            "peaksInfos": infos,
+            "spectra": rendered,
+            "metadata": {**metadata, "frequency": frequencies},
+        }
+    )
+    if spectrum_format == "columnar":
+        response.mimetype = COLUMNAR_MIMETYPE
+    return response, 200
@@ -1,59 +1,340 @@
 from flask import Blueprint, request, jsonify
-from app.models.simpleModel.H.simpleModel_predict_1h_v3 import predict as predict_1h
-from app.models.simpleModel.C.simpleModel_predict_13c_v2 import predict as predict_13c
+from app.models.simpleModel.H.simpleModel_predict_1h_v3 import (
+    predict_spectrum as predict_1h,
+)
+from app.models.simpleModel.C.simpleModel_predict_13c_v2 import (
+    predict_spectrum as predict_13c,
+)
+from app.models.simpleModel.utils.draw_peaks_and_spectrum import (
+    parse_grid_parameters,
+    prediction_to_json,
+)
+from app.models.simpleModel.utils.batch_prediction import predict_batch, predict_nuclei
+from app.models.simpleModel.utils.prediction_cache import prediction_cache
+from app.models.simpleModel.utils.micro_batching import (
+    micro_batching_stats,
+    reset_micro_batching_stats,
+)
+from app.models.simpleModel.utils.process_pool import process_pool_stats
+from app.models.simpleModel.utils.spectrum_decimation import parse_decimation_parameters
+from app.api.services.spectrum_encoding import (
+    COLUMNAR_MIMETYPE,
+    encode_columns,
+    negotiate_spectrum_format,
+    spectrum_response,
+    unsupported_format_response,
+)
+from app.config import Config
 
 simpleModel_bp = Blueprint("simpleModel", __name__)
 
+ATOM_ID_FORMATS = ("points", "intervals")
+NUCLEI = {"1H": "1H", "H": "1H", "13C": "13C", "C": "13C"}
 
-@simpleModel_bp.route("/simpleModelPrediction", methods=["POST"])
-def simpleModel_prediction():
-    data = request.get_json()
-    smiles = data.get("smiles")
 
-    if not smiles:
-        return jsonify({"error": "Missing 'smiles' in simple prediction"}), 200
-
-    spectrum_type = "1H"
+def get_parameters(data):
+    # Parameters come either as {"key": ..., "value": ...} entries (frontend
+    # settings) or as plain top-level keys
+    parameters = {}
     for key, value in data.items():
         if key == "smiles":
             continue
         if isinstance(value, dict):
-            if value.get("key") == "type":
-                spectrum_type = value.get("value", "1H")
+            if "key" in value:
+                parameters[value["key"]] = value.get("value")
+        else:
+            parameters[key] = value
+    return parameters
+
+
+def parse_prediction_request(data):
+    # (type, atom ID format, render options) of a simpleModelPrediction body;
+    # raises ValueError on an invalid parameter
+    parameters = get_parameters(data)
+    spectrum_type = parameters.get("type") or "1H"
+
+    atom_id_format = parameters.get("atomIdFormat") or "points"
+    if atom_id_format not in ATOM_ID_FORMATS:
+        raise ValueError(f"Invalid 'atomIdFormat': {atom_id_format}")
 
+    max_points, tolerance = parse_decimation_parameters(parameters)
+    grid_mode, points_per_fwhm = parse_grid_parameters(parameters)
+    render_options = {
+        "max_points": max_points,
+        "tolerance": tolerance,
+        "grid_mode": grid_mode,
+        "points_per_fwhm": points_per_fwhm,
+    }
+    return spectrum_type, atom_id_format, render_options
+
+
+def single_prediction(smiles, spectrum_type, render_options):
+    # (response without the spectrum, prediction), or (error, None)
     try:
         if (spectrum_type.upper() == "13C" or spectrum_type.upper() == "C"):
             spectrum_type = "13C"
-            result = predict_13c(smiles)
+            result = predict_13c(smiles, **render_options)
         else:
             spectrum_type = "1H"
-            result = predict_1h(smiles)
+            result = predict_1h(smiles, **render_options)
 
         if isinstance(result, dict) and "error" in result:
-            return jsonify(result), 200
+            return result, None
 
-        spectrum = result.get("spectrum", [])
-        peaks_info = result.get("peaksInfos", [])
+        if len(result["x"]) == 0:
+            return {"error": "No spectrum predicted"}, None
 
-        if not spectrum:
-            return jsonify({"error": "No spectrum predicted"}), 200
+        peaks_info = result.get("peaksInfos", [])
 
         metadata = {"nucleusType": spectrum_type}
 
+    except Exception as e:
+        return {"error": f"Failed to predict simple model spectrum: {str(e)}"}, None
+
+    response = {
+        "smiles": smiles,
+        "peaksInfos": peaks_info,
+        "metadata": metadata,
+    }
+    return response, result
+
+
+def add_json_spectrum(response, result, atom_id_format):
+    formatted = prediction_to_json(result, atom_id_format)
+    response["spectrum"] = formatted["spectrum"]
+    if "atomIntervals" in formatted:
+        response["atomIntervals"] = formatted["atomIntervals"]
+    return response
+
+
+@simpleModel_bp.route("/simpleModelPrediction", methods=["POST"])
+def simpleModel_prediction():
+    data = request.get_json()
+    smiles = data.get("smiles")
+
+    if not smiles:
+        return jsonify({"error": "Missing 'smiles' in simple prediction"}), 200
+
+    spectrum_format = negotiate_spectrum_format(request)
+    if spectrum_format is None:
+        return unsupported_format_response()
+
+    try:
+        spectrum_type, atom_id_format, render_options = parse_prediction_request(data)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 200
+
+    if "+" in spectrum_type:
+        return combined_prediction(
+            smiles, spectrum_type, spectrum_format, atom_id_format, render_options
+        )
+
+    response, result = single_prediction(smiles, spectrum_type, render_options)
+    if result is None:
+        return jsonify(response), 200
+
+    if spectrum_format != "json":
+        response["atomIntervals"] = result["annotations"].to_json()
+        return spectrum_response(response, result["x"], result["y"], spectrum_format)
+
+    return jsonify(add_json_spectrum(response, result, atom_id_format)), 200
+
+
+def local_prediction(data, with_points=True):
+    # In-process POST /api/simpleModelPrediction, used by /api/predict for
+    # relative endpoints. Returns (body, prediction): body is the JSON body
+    # the route would send (with the spectrum points only if with_points),
+    # prediction the x/y arrays and annotations (None on error). Returns
+    # None for requests it cannot serve ("1H+13C").
+    smiles = data.get("smiles")
+    if not smiles:
+        return {"error": "Missing 'smiles' in simple prediction"}, None
+
+    try:
+        spectrum_type, atom_id_format, render_options = parse_prediction_request(data)
+    except ValueError as ve:
+        return {"error": str(ve)}, None
+
+    if "+" in spectrum_type:
+        return None
+
+    response, result = single_prediction(smiles, spectrum_type, render_options)
+    if result is not None and with_points:
+        add_json_spectrum(response, result, atom_id_format)
+    return response, result
+
+
+def combined_prediction(
+    smiles, spectrum_type, spectrum_format, atom_id_format, render_options
+):
+    # "1H+13C": one response with a prediction per nucleus
+    if spectrum_format not in ("json", "columnar"):
+        return unsupported_format_response()
+
+    try:
+        nuclei = parse_nuclei(spectrum_type)
+        results = predict_nuclei(smiles, nuclei, **render_options)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 200
     except Exception as e:
         return (
             jsonify({"error": f"Failed to predict simple model spectrum: {str(e)}"}),
             200,
         )
 
-    return (
-        jsonify(
-            {
-                "smiles": smiles,
-                "peaksInfos": peaks_info,
-                "spectrum": spectrum,
-                "metadata": metadata,
+    predictions = {}
+    for nucleus, result in results.items():
+        if "error" in result:
+            return jsonify(result), 200
+        if len(result["x"]) == 0:
+            return jsonify({"error": f"No {nucleus} spectrum predicted"}), 200
+
+        if spectrum_format == "columnar":
+            predictions[nucleus] = {
+                "peaksInfos": result["peaksInfos"],
+                "atomIntervals": result["annotations"].to_json(),
+                "spectrum": encode_columns(result["x"], result["y"]),
             }
-        ),
-        200,
+        else:
+            predictions[nucleus] = prediction_to_json(result, atom_id_format)
+
+    response = jsonify(
+        {
+            "smiles": smiles,
+            "predictions": predictions,
+            "metadata": {"nucleusType": "+".join(nuclei)},
+        }
+    )
+    if spectrum_format == "columnar":
+        response.mimetype = COLUMNAR_MIMETYPE
+    return response, 200
+
+
+def parse_nuclei(value):
+    # A list of nuclei, or one string with nuclei joined by "+" ("1H+13C")
+    values = value if isinstance(value, list) else str(value or "1H").split("+")
+    nuclei = []
+    for v in values:
+        nucleus = NUCLEI.get(str(v).upper())
+        if nucleus is None:
+            raise ValueError(f"Invalid 'type': {v}")
+        if nucleus not in nuclei:
+            nuclei.append(nucleus)
+    return nuclei
+
+
+def parse_batch_request(data):
+    # (SMILES list, nuclei, peaks only, atom ID format, render options) of a
+    # simpleModelBatchPrediction body; raises ValueError
+    smiles_list = data.get("smiles")
+
+    if not isinstance(smiles_list, list) or not smiles_list:
+        raise ValueError("Missing 'smiles' list in batch prediction")
+
+    if len(smiles_list) > Config.SIMPLE_MODEL_BATCH_MAX_SMILES:
+        raise ValueError(
+            f"Too many SMILES in one batch "
+            f"(max {Config.SIMPLE_MODEL_BATCH_MAX_SMILES})"
+        )
+
+    parameters = get_parameters(data)
+    peaks_only = parameters.get("peaksOnly") in (True, 1, "true", "True", "1")
+
+    atom_id_format = parameters.get("atomIdFormat") or "points"
+    if atom_id_format not in ATOM_ID_FORMATS:
+        raise ValueError(f"Invalid 'atomIdFormat': {atom_id_format}")
+
+    nuclei = parse_nuclei(parameters.get("type"))
+    max_points, tolerance = parse_decimation_parameters(parameters)
+    grid_mode, points_per_fwhm = parse_grid_parameters(parameters)
+    render_options = {
+        "max_points": max_points,
+        "tolerance": tolerance,
+        "grid_mode": grid_mode,
+        "points_per_fwhm": points_per_fwhm,
+    }
+    return smiles_list, nuclei, peaks_only, atom_id_format, render_options
+
+
+def batch_results(smiles_list, nuclei, peaks_only, atom_id_format, render_options):
+    valid = [
+        i for i, smiles in enumerate(smiles_list) if isinstance(smiles, str) and smiles
+    ]
+    predictions = predict_batch(
+        [smiles_list[i] for i in valid],
+        nuclei,
+        peaks_only=peaks_only,
+        workers=Config.SIMPLE_MODEL_BATCH_WORKERS,
+        **render_options,
     )
+
+    results = [
+        {"smiles": smiles, "error": "Invalid SMILES entry"} for smiles in smiles_list
+    ]
+    for i, prediction in zip(valid, predictions):
+        results[i] = {
+            "smiles": smiles_list[i],
+            "predictions": {
+                nucleus: (
+                    result if peaks_only else prediction_to_json(result, atom_id_format)
+                )
+                for nucleus, result in prediction.items()
+            },
+        }
+    return results
+
+
+def batch_metadata(results, nuclei):
+    errors = sum(
+        1
+        for item in results
+        if "error" in item
+        or any("error" in result for result in item["predictions"].values())
+    )
+    return {"nuclei": nuclei, "count": len(results), "errors": errors}
+
+
+@simpleModel_bp.route("/simpleModelBatchPrediction", methods=["POST"])
+def simpleModel_batch_prediction():
+    data = request.get_json(silent=True) or {}
+
+    try:
+        smiles_list, nuclei, peaks_only, atom_id_format, render_options = (
+            parse_batch_request(data)
+        )
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 200
+
+    results = batch_results(
+        smiles_list, nuclei, peaks_only, atom_id_format, render_options
+    )
+    metadata = batch_metadata(results, nuclei)
+
+    return jsonify({"results": results, "metadata": metadata}), 200
+
+
+@simpleModel_bp.route("/simpleModelCache", methods=["GET"])
+def simpleModel_cache_stats():
+    return jsonify(prediction_cache.stats()), 200
+
+
+@simpleModel_bp.route("/simpleModelCache", methods=["DELETE"])
+def simpleModel_cache_clear():
+    prediction_cache.clear()
+    return jsonify(prediction_cache.stats()), 200
+
+
+@simpleModel_bp.route("/simpleModelMicroBatching", methods=["GET"])
+def simpleModel_micro_batching_stats():
+    return jsonify(micro_batching_stats()), 200
+
+
+@simpleModel_bp.route("/simpleModelMicroBatching", methods=["DELETE"])
+def simpleModel_micro_batching_reset():
+    reset_micro_batching_stats()
+    return jsonify(micro_batching_stats()), 200
+
+
+@simpleModel_bp.route("/simpleModelProcessPool", methods=["GET"])
+def simpleModel_process_pool_stats():
+    return jsonify(process_pool_stats()), 200
@@ -1,6 +1,7 @@
 import json
 import numpy as np
 from scipy.signal import savgol_filter, find_peaks
+from app.models.simpleModel.utils.atom_annotations import AtomAnnotations
 
 
 def guess_nmr_type(ppm, intensity):
@@ -85,9 +86,11 @@ def analyze_spectrum(ppm, intensity, atom_ids, spectrum_type="auto"):
         multiplicity.sort(key=lambda x: -x["ppm"])
 
         # Find atom IDs between ppmMin and ppmMax
-        region_atom_ids = set()
-        for i in range(len(ppm)):
-            if ppm_min <= ppm[i] <= ppm_max:
+        if isinstance(atom_ids, AtomAnnotations):
+            region_atom_ids = atom_ids.atoms_between(ppm_min, ppm_max)
+        else:
+            region_atom_ids = set()
+            for i in np.flatnonzero((ppm >= ppm_min) & (ppm <= ppm_max)):
                 if atom_ids[i]:
                     region_atom_ids.update(atom_ids[i])
 
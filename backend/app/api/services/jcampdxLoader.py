@@ -2,6 +2,7 @@ import jcamp
 import os
 import tempfile
 import numpy as np
+from app.models.simpleModel.utils.spectrum_decimation import decimate_spectrum
 
 
 def get_observe_frequency(data_dict):
@@ -28,7 +29,7 @@ def get_observe_frequency(data_dict):
     return None
 
 
-def parse_jcamp(file_storage):
+def read_jcamp(file_storage, max_points=None, tolerance=None):
     try:
         with tempfile.NamedTemporaryFile(delete=False) as tmp:
             file_storage.save(tmp.name)
@@ -59,19 +60,35 @@ def parse_jcamp(file_storage):
         if len(x) != len(y):
             return None, "Malformed JCAMP file: x and y length mismatch"
 
-        spectrum = [
-            {"ppm": float(x[i]), "intensity": float(y[i]), "atomIds": []}
-            for i in range(len(x))
-        ]
+        is_sparse = len(x) < 100
 
-        if len(x) < 100:
+        if max_points is not None or tolerance is not None:
+            kept = decimate_spectrum(x, y, max_points, tolerance)
+            x, y = x[kept], y[kept]
+
+        if is_sparse:
             return {
-                "spectrum": spectrum,
+                "x": x,
+                "y": y,
                 "warning": "JCAMP data is sparse; consider using an uncompressed version",
             }, None
 
         else:
-            return {"spectrum": spectrum}, None
+            return {"x": x, "y": y}, None
 
     except Exception as e:
         return None, str(e)
+
+
+def parse_jcamp(file_storage, max_points=None, tolerance=None):
+    data, error = read_jcamp(file_storage, max_points, tolerance)
+    if error:
+        return None, error
+
+    x = data.pop("x")
+    y = data.pop("y")
+    data["spectrum"] = [
+        {"ppm": float(x[i]), "intensity": float(y[i]), "atomIds": []}
+        for i in range(len(x))
+    ]
+    return data, None
@@ -0,0 +1,211 @@
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from app.config import Config
+from app.api.services.logger import log_with_time
+
+# Long predictions run as jobs on a bounded pool instead of holding a server
+# thread: submitting returns at once, and clients poll the job or follow its
+# events (status, progress with partial results, end). A job's work calls
+# job.progress between steps, which is also where a cancelled job stops.
+# Finished jobs are kept for Config.JOB_RESULT_TTL_IN_SECONDS.
+ACTIVE = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class TooManyJobs(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, total):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.total = total
+        self.done = 0
+        self.partial = []
+        self.result = None
+        self.error = None
+        self.future = None
+        # Events are (name, data), their ID is their index
+        self.events = []
+        self.condition = threading.Condition()
+
+    def emit(self, name, data):
+        # Called with the condition held
+        self.events.append((name, data))
+        self.condition.notify_all()
+
+    def start(self):
+        # False if the job was cancelled while queued
+        with self.condition:
+            if self.status != "queued":
+                return False
+            self.status = "running"
+            self.started = time.time()
+            self.emit("status", {"status": "running"})
+            return True
+
+    def progress(self, done, partial=()):
+        # Raises JobCancelled once the job is cancelled
+        with self.condition:
+            if self.status not in ACTIVE:
+                raise JobCancelled()
+            self.done = done
+            self.partial.extend(partial)
+            self.emit(
+                "progress",
+                {"done": done, "total": self.total, "partial": list(partial)},
+            )
+
+    def finish(self, status, result=None, error=None):
+        # The first end wins: a job cancelled while running ends at once and
+        # the result its work returns later is dropped
+        with self.condition:
+            if self.status not in ACTIVE:
+                return False
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished = time.time()
+            self.emit(status, self.summary(with_result=False))
+            return True
+
+    def cancel(self):
+        if self.finish("cancelled") and self.future is not None:
+            self.future.cancel()
+
+    def events_after(self, event_id, timeout):
+        # ([(ID, name, data)] of the events after event_id, waiting up to
+        # timeout for one, and whether the job has ended
+        with self.condition:
+            if len(self.events) <= event_id + 1 and self.status in ACTIVE:
+                self.condition.wait(timeout)
+            first = max(event_id + 1, 0)
+            events = [(i, *event) for i, event in enumerate(self.events[first:], first)]
+            return events, self.status not in ACTIVE
+
+    def summary(self, with_result=True):
+        with self.condition:
+            summary = {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "progress": {"done": self.done, "total": self.total},
+            }
+            if self.error is not None:
+                summary["error"] = self.error
+            if with_result:
+                if self.status == "done":
+                    summary["result"] = self.result
+                elif self.status in ACTIVE:
+                    summary["partialResults"] = list(self.partial)
+            return summary
+
+
+class JobManager:
+    def __init__(self, workers, max_active, ttl, max_streams):
+        self.workers = workers
+        self.max_active = max_active
+        self.ttl = ttl
+        self.max_streams = max_streams
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="job"
+        )
+        self.jobs = {}
+        self.streams = 0
+        self.lock = threading.Lock()
+
+    def purge(self):
+        # Called with the lock held
+        expired = time.time() - self.ttl
+        for job_id in [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job.finished is not None and job.finished < expired
+        ]:
+            del self.jobs[job_id]
+
+    def submit(self, kind, total, work):
+        # work(job) returns the job's result; raises TooManyJobs
+        with self.lock:
+            self.purge()
+            active = sum(job.status in ACTIVE for job in self.jobs.values())
+            if active >= self.max_active:
+                raise TooManyJobs(f"Too many jobs in progress (max {self.max_active})")
+            job = Job(kind, total)
+            self.jobs[job.id] = job
+        job.future = self.executor.submit(self.run, job, work)
+        return job
+
+    def run(self, job, work):
+        if not job.start():
+            return
+        try:
+            job.finish("done", result=work(job))
+        except JobCancelled:
+            pass
+        except Exception as e:
+            log_with_time(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.finish("failed", error=str(e))
+
+    def get(self, job_id):
+        with self.lock:
+            self.purge()
+            return self.jobs.get(job_id)
+
+    def remove(self, job_id):
+        with self.lock:
+            return self.jobs.pop(job_id, None)
+
+    def all_jobs(self):
+        with self.lock:
+            self.purge()
+            return list(self.jobs.values())
+
+    def open_stream(self):
+        # False when Config.JOB_MAX_EVENT_STREAMS streams are open: each holds
+        # a server thread
+        with self.lock:
+            if self.streams >= self.max_streams:
+                return False
+            self.streams += 1
+            return True
+
+    def close_stream(self):
+        with self.lock:
+            self.streams -= 1
+
+    def stats(self):
+        with self.lock:
+            self.purge()
+            statuses = Counter(job.status for job in self.jobs.values())
+            return {
+                "jobs": len(self.jobs),
+                "statuses": dict(statuses),
+                "workers": self.workers,
+                "maxActive": self.max_active,
+                "ttlSeconds": self.ttl,
+                "eventStreams": self.streams,
+                "maxEventStreams": self.max_streams,
+            }
+
+
+job_manager = JobManager(
+    Config.JOB_WORKERS,
+    Config.JOB_MAX_ACTIVE,
+    Config.JOB_RESULT_TTL_IN_SECONDS,
+    Config.JOB_MAX_EVENT_STREAMS,
+)
@@ -1,19 +1,18 @@
 from rdkit import Chem
 from rdkit.Chem import AllChem
 from rdkit.Chem import rdchem
+from app.models.simpleModel.utils.molecule_preparation import prepare_smiles
 
 def convert_smiles_to_kekule(smiles: str):
     try:
-        mol = Chem.MolFromSmiles(smiles)
-        if not mol:
+        prepared, _ = prepare_smiles(smiles)
+        if not prepared:
             raise ValueError("Invalid SMILES or incorrect chemical structure")
         
         try:
-            Chem.Kekulize(mol, clearAromaticFlags=True)
+            return prepared.kekule_smiles()
         except rdchem.KekulizationError as e:
             raise ValueError(f"Kekulization error: {str(e)}")
-        
-        return Chem.MolToSmiles(mol, canonical=True, kekuleSmiles=True)
     
     except ValueError as ve:
         raise ve
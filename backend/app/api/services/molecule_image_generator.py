@@ -3,18 +3,25 @@ from rdkit.Chem import Draw
 from rdkit.Chem.Draw import rdMolDraw2D
 from io import BytesIO
 from rdkit.Chem import rdchem
+from app.models.simpleModel.utils.molecule_preparation import (
+    prepare_smiles,
+    to_canonical_order,
+)
 
 
 def generate_molecule_image_with_atom_ids(smiles: str) -> BytesIO:
-    mol = Chem.MolFromSmiles(smiles)
-    if not mol:
+    prepared, to_input = prepare_smiles(smiles)
+    if not prepared:
         raise ValueError("Invalid SMILES string")
 
     try:
-        Chem.Kekulize(mol, clearAromaticFlags=True)
+        kekule = prepared.kekule()
     except rdchem.KekulizationError as e:
         raise ValueError(f"Kekulization failed: {str(e)}")
 
+    # Atom IDs are drawn in the numbering of the input SMILES
+    mol = Chem.RenumberAtoms(kekule, to_canonical_order(to_input).tolist())
+
     drawer = rdMolDraw2D.MolDraw2DCairo(400, 400)
     drawer.drawOptions().addAtomIndices = True
     drawer.DrawMolecule(mol)
@@ -0,0 +1,159 @@
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+import requests
+from app.config import Config
+
+# Responses of external predictors, keyed by (target URL, kekulé SMILES,
+# rest of the payload), kept for a limited time. While a response is being
+# fetched, identical requests wait for it instead of calling the predictor
+# again (single flight), for up to the predictor's timeout. Failed calls are
+# not cached: every waiter gets its own copy of the error and the next
+# request tries again.
+
+
+def predictor_cache_key(target_url, payload):
+    rest = {key: value for key, value in payload.items() if key != "smiles"}
+    return json.dumps([target_url, payload["smiles"], rest], sort_keys=True)
+
+
+def waiter_error(error):
+    # A new exception per waiter, so that waiters raising it in their own
+    # threads do not all extend the traceback of the leader's. A leader
+    # stopped by a BaseException (e.g. SystemExit) fails the waiters with a
+    # RequestException instead.
+    if isinstance(error, Exception):
+        try:
+            return copy.copy(error)
+        except Exception:
+            pass
+    return requests.exceptions.RequestException(
+        f"The identical predictor call failed: {error!r}"
+    )
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.waiters = 0
+
+
+class PredictorCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.upstream_errors = 0
+        self.max_waiters = 0
+
+    def lookup(self, key):
+        # Cached response, or None after a miss or an expired entry
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, response = entry
+        if time.monotonic() >= expires:
+            del self.entries[key]
+            self.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return response
+
+    def remember(self, key, response):
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        # Upstream errors reported in a successful response are not kept
+        if not isinstance(response, dict) or "error" in response:
+            return
+        self.entries[key] = (time.monotonic() + self.ttl, response)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def fetch(self, key, call, timeout=None):
+        # Response for key: cached, from the identical call in flight, or
+        # from call(). Exceptions raised by call() reach every waiter; a
+        # waiter still without a response after timeout seconds raises
+        # requests.exceptions.Timeout.
+        with self.lock:
+            response = self.lookup(key)
+            if response is not None:
+                self.hits += 1
+                return response
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self.flights[key] = Flight()
+            else:
+                self.coalesced += 1
+                flight.waiters += 1
+                self.max_waiters = max(self.max_waiters, flight.waiters)
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise requests.exceptions.Timeout(
+                    f"The identical predictor call in progress took over {timeout} s"
+                )
+            if flight.error is not None:
+                raise waiter_error(flight.error) from flight.error
+            return flight.response
+
+        try:
+            flight.response = call()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+                if flight.error is None:
+                    self.remember(key, flight.response)
+                else:
+                    self.upstream_errors += 1
+            flight.done.set()
+        return flight.response
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.reset_counters()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "upstreamCalls": self.misses,
+                "upstreamErrors": self.upstream_errors,
+                "inFlight": len(self.flights),
+                "maxWaiters": self.max_waiters,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl,
+            }
+
+
+predictor_cache = PredictorCache(
+    Config.PREDICTOR_CACHE_SIZE, Config.PREDICTOR_CACHE_TTL_IN_SECONDS
+)
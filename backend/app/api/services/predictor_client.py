@@ -0,0 +1,67 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from app.config import Config
+
+# One keep-alive session per predictor host ("scheme://host:port"), so calls
+# to a predictor reuse pooled connections instead of opening a new TCP (and
+# TLS) connection each time. Pool sizes and timeouts can be set per host in
+# Config.
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+def predictor_host(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def predictor_timeout(host):
+    return Config.PREDICTOR_TIMEOUTS_IN_SECONDS.get(
+        host, Config.PREDICTION_MODEL_TIMEOUT_IN_SECONDS
+    )
+
+
+def predictor_wait_timeout(url):
+    # Seconds to wait for a call to url made by another request: its connect
+    # and read timeouts together
+    timeout = predictor_timeout(predictor_host(url))
+    if isinstance(timeout, (tuple, list)):
+        return None if None in timeout else sum(timeout)
+    return timeout
+
+
+def predictor_session(host):
+    with sessions_lock:
+        session = sessions.get(host)
+        if session is None:
+            pool_size = Config.PREDICTOR_POOL_SIZES.get(
+                host, Config.PREDICTOR_POOL_SIZE
+            )
+            # Requests beyond the pool size still go through, on connections
+            # that are closed afterwards
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            sessions[host] = session
+        return session
+
+
+def post_to_predictor(url, payload):
+    # JSON body of the predictor's response; raises
+    # requests.exceptions.RequestException when the call fails
+    host = predictor_host(url)
+    response = predictor_session(host).post(
+        url, json=payload, timeout=predictor_timeout(host)
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def close_predictor_sessions():
+    with sessions_lock:
+        for session in sessions.values():
+            session.close()
+        sessions.clear()
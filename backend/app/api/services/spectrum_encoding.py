@@ -0,0 +1,164 @@
+import base64
+import json
+import struct
+import numpy as np
+from flask import Response, jsonify
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# "json" is the historical list of {"ppm", "intensity", "atomID"} points. The
+# other formats carry parallel little-endian float32 ppm/intensity arrays and
+# send the atom IDs separately as "atomIntervals".
+SPECTRUM_FORMATS = ("json", "columnar", "binary", "msgpack")
+
+COLUMNAR_MIMETYPE = "application/vnd.predictionrmn.spectrum+json"
+BINARY_MIMETYPE = "application/octet-stream"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+FORMAT_BY_MIMETYPE = {
+    "application/json": "json",
+    COLUMNAR_MIMETYPE: "columnar",
+    BINARY_MIMETYPE: "binary",
+    MSGPACK_MIMETYPES[0]: "msgpack",
+    MSGPACK_MIMETYPES[1]: "msgpack",
+}
+
+# Binary layout: magic, version, number of points, header length, UTF-8 JSON
+# header padded to 4 bytes, then ppm[n] and intensity[n] as float32
+BINARY_MAGIC = b"NMRS"
+BINARY_VERSION = 1
+BINARY_PREFIX = struct.Struct("<4sIII")
+WIRE_DTYPE = np.dtype("<f4")
+
+
+def negotiate_spectrum_format(request):
+    requested = request.args.get("format")
+    if requested:
+        requested = requested.lower()
+        if requested not in SPECTRUM_FORMATS:
+            return None
+    else:
+        requested = FORMAT_BY_MIMETYPE.get(
+            request.accept_mimetypes.best_match(list(FORMAT_BY_MIMETYPE)), "json"
+        )
+
+    if requested == "msgpack" and msgpack is None:
+        return None
+    return requested
+
+
+def unsupported_format_response():
+    available = [f for f in SPECTRUM_FORMATS if f != "msgpack" or msgpack]
+    return (
+        jsonify({"error": f"Unsupported spectrum format. Available: {available}"}),
+        406,
+    )
+
+
+def to_wire_arrays(x, y):
+    return (
+        np.ascontiguousarray(x, dtype=WIRE_DTYPE),
+        np.ascontiguousarray(y, dtype=WIRE_DTYPE),
+    )
+
+
+def encode_columns(x, y):
+    ppm, intensity = to_wire_arrays(x, y)
+    return {
+        "encoding": "base64",
+        "dtype": "float32",
+        "length": len(ppm),
+        "ppm": base64.b64encode(ppm.tobytes()).decode("ascii"),
+        "intensity": base64.b64encode(intensity.tobytes()).decode("ascii"),
+    }
+
+
+def decode_columns(columns):
+    ppm = np.frombuffer(base64.b64decode(columns["ppm"]), dtype=WIRE_DTYPE)
+    intensity = np.frombuffer(base64.b64decode(columns["intensity"]), dtype=WIRE_DTYPE)
+    if len(ppm) != len(intensity):
+        raise ValueError("ppm and intensity columns have different lengths")
+    return ppm.astype(float), intensity.astype(float)
+
+
+def encode_binary(body, x, y):
+    ppm, intensity = to_wire_arrays(x, y)
+    header = json.dumps(body).encode("utf-8")
+    header += b" " * (-len(header) % 4)
+    prefix = BINARY_PREFIX.pack(BINARY_MAGIC, BINARY_VERSION, len(ppm), len(header))
+    return b"".join([prefix, header, ppm.tobytes(), intensity.tobytes()])
+
+
+def decode_binary(payload):
+    if len(payload) < BINARY_PREFIX.size:
+        raise ValueError("Binary spectrum payload is too short")
+    magic, version, n_points, header_length = BINARY_PREFIX.unpack_from(payload)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Unknown binary spectrum payload")
+
+    offset = BINARY_PREFIX.size
+    body = json.loads(payload[offset : offset + header_length].decode("utf-8"))
+    offset += header_length
+    expected = offset + 2 * n_points * WIRE_DTYPE.itemsize
+    if len(payload) != expected:
+        raise ValueError("Binary spectrum payload has an unexpected length")
+
+    arrays = np.frombuffer(payload, dtype=WIRE_DTYPE, count=2 * n_points, offset=offset)
+    return body, arrays[:n_points].astype(float), arrays[n_points:].astype(float)
+
+
+def spectrum_response(body, x, y, fmt, status=200):
+    if fmt == "columnar":
+        response = jsonify({**body, "spectrum": encode_columns(x, y)})
+        response.mimetype = COLUMNAR_MIMETYPE
+        return response, status
+
+    if fmt == "binary":
+        return Response(encode_binary(body, x, y), status, mimetype=BINARY_MIMETYPE)
+
+    if fmt == "msgpack":
+        ppm, intensity = to_wire_arrays(x, y)
+        spectrum = {
+            "dtype": "float32",
+            "length": len(ppm),
+            "ppm": ppm.tobytes(),
+            "intensity": intensity.tobytes(),
+        }
+        payload = msgpack.packb({**body, "spectrum": spectrum})
+        return Response(payload, status, mimetype=MSGPACK_MIMETYPES[0])
+
+    raise ValueError(f"Unknown spectrum format: {fmt}")
+
+
+def read_spectrum_request(request):
+    # Returns the request body and the spectrum as (ppm, intensity) arrays for
+    # any supported input format, or None when the body carries no spectrum
+    if request.mimetype == BINARY_MIMETYPE:
+        body, x, y = decode_binary(request.get_data())
+        return body, x, y
+
+    if request.mimetype in MSGPACK_MIMETYPES:
+        if msgpack is None:
+            raise ValueError("MessagePack is not available on this server")
+        body = msgpack.unpackb(request.get_data())
+    else:
+        body = request.get_json(silent=True)
+
+    if not body or "spectrum" not in body:
+        return body, None, None
+
+    spectrum = body["spectrum"]
+    if isinstance(spectrum, dict):
+        if isinstance(spectrum.get("ppm"), bytes):
+            x = np.frombuffer(spectrum["ppm"], dtype=WIRE_DTYPE).astype(float)
+            y = np.frombuffer(spectrum["intensity"], dtype=WIRE_DTYPE).astype(float)
+            return body, x, y
+        x, y = decode_columns(spectrum)
+        return body, x, y
+
+    x = np.array([point["ppm"] for point in spectrum], dtype=float)
+    y = np.array([point["intensity"] for point in spectrum], dtype=float)
+    return body, x, y
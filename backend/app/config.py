@@ -1,6 +1,6 @@
 import os
 import sys
-from platformdirs import user_config_dir
+from platformdirs import user_cache_dir, user_config_dir
 
 
 class Config:
@@ -20,3 +20,80 @@ class Config:
     APP_NAME = "PredictionRMN"
     APP_AUTHOR = "LERIA"
     PREDICTION_MODEL_TIMEOUT_IN_SECONDS = 300
+    # /api/predict keeps a pool of keep-alive connections per predictor host.
+    # Pool sizes and timeouts (seconds, or a (connect, read) pair) can be set
+    # per host, e.g. {"https://predictor.example.org": 60}; other hosts use
+    # PREDICTOR_POOL_SIZE and PREDICTION_MODEL_TIMEOUT_IN_SECONDS.
+    PREDICTOR_POOL_SIZE = 10
+    PREDICTOR_POOL_SIZES = {}
+    PREDICTOR_TIMEOUTS_IN_SECONDS = {}
+    # Relative endpoints are served by this server: in-process when possible,
+    # otherwise over HTTP at this address
+    LOCAL_PREDICTOR_URL = "http://127.0.0.1:52586"
+    # Responses of predictors called over HTTP are kept for this long;
+    # identical requests in flight share one call either way
+    PREDICTOR_CACHE_SIZE = 128
+    PREDICTOR_CACHE_TTL_IN_SECONDS = 600
+    # /api/predictMany: calls run on a pool shared by all its requests, and
+    # a request waits at most FAN_OUT_TIMEOUT_IN_SECONDS for its results
+    FAN_OUT_WORKERS = 16
+    FAN_OUT_MAX_PREDICTIONS = 16
+    FAN_OUT_TIMEOUT_IN_SECONDS = PREDICTION_MODEL_TIMEOUT_IN_SECONDS
+    # /api/jobs: at most JOB_WORKERS jobs run at once, and JOB_MAX_ACTIVE
+    # are queued or running. Finished jobs are kept for
+    # JOB_RESULT_TTL_IN_SECONDS. Each event stream holds a server thread,
+    # hence their limits.
+    JOB_WORKERS = 2
+    JOB_MAX_ACTIVE = 32
+    JOB_RESULT_TTL_IN_SECONDS = 900
+    JOB_BATCH_CHUNK_SIZE = 100
+    JOB_MAX_EVENT_STREAMS = 2
+    JOB_EVENTS_MAX_STREAM_SECONDS = 60
+    JOB_EVENTS_KEEPALIVE_IN_SECONDS = 15
+    # Load the simple models on a background thread when the app starts,
+    # rather than on the first prediction; requests wait up to the timeout
+    # for a model that is still loading
+    MODEL_WARMUP_AT_STARTUP = True
+    MODEL_LOAD_TIMEOUT_IN_SECONDS = 120
+    SIMPLE_MODEL_BATCH_MAX_SMILES = 10000
+    SIMPLE_MODEL_BATCH_WORKERS = min(4, os.cpu_count() or 1)
+    # Concurrent predictions of a nucleus are queued for up to
+    # MICRO_BATCH_MAX_WAIT_IN_MS (or until MICRO_BATCH_MAX_ROWS feature rows)
+    # and run through the forests together. With no wait, requests arriving
+    # while a batch runs still share the next one, and a lone request is not
+    # delayed.
+    MICRO_BATCHING = True
+    MICRO_BATCH_MAX_WAIT_IN_MS = 0
+    MICRO_BATCH_MAX_ROWS = 512
+    # Run each simple model prediction in a pool of worker processes, which
+    # load the models once; a prediction is stopped (and its worker
+    # replaced) after PROCESS_POOL_DEADLINE_IN_SECONDS, and a worker is
+    # replaced after PROCESS_POOL_MAX_TASKS_PER_WORKER predictions. Each
+    # worker holds its own copy of the models.
+    SIMPLE_MODEL_PROCESS_POOL = False
+    PROCESS_POOL_WORKERS = min(4, os.cpu_count() or 1)
+    PROCESS_POOL_DEADLINE_IN_SECONDS = 60
+    PROCESS_POOL_MAX_TASKS_PER_WORKER = 500
+    PROCESS_POOL_START_METHOD = "spawn"
+    # Limits of /api/renderSpectrum. The peaks are client input: a multiplet
+    # of n tokens has up to 9^n lines, and every line is evaluated on the
+    # grid points within a few FWHM of it (about 50 bytes each), so the grid
+    # points plus lines x window points of all frequencies are bounded too.
+    RENDER_MAX_FREQUENCIES = 16
+    RENDER_MAX_RESOLUTION = 1000000
+    RENDER_MAX_PEAKS = 1000
+    RENDER_MAX_ATOMS_PER_PEAK = 1000
+    RENDER_MAX_MULTIPLET_TOKENS = 6
+    RENDER_MAX_COUPLINGS = 6
+    RENDER_MAX_MULTIPLET_LINES = 1024
+    RENDER_MAX_FWHM_SHARE = 0.05
+    RENDER_MAX_LINE_POINTS = 4000000
+
+    PREDICTION_CACHE_SIZE = 256
+    # Keep predictions across restarts in a SQLite file
+    PREDICTION_CACHE_PERSIST = False
+    PREDICTION_CACHE_PATH = os.path.join(
+        user_cache_dir(APP_NAME, APP_AUTHOR), "predictions.sqlite3"
+    )
+    # Parsed molecules shared by the featurizers, Kekulé conversion and images
+    MOLECULE_CACHE_SIZE = 256
@@ -3,6 +3,13 @@ import pandas as pd
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.compose import ColumnTransformer
+from app.models.simpleModel.utils.packed_forest import forest_engine
+from app.models.simpleModel.utils.peak_merging import merge_close_associations
+from app.models.simpleModel.utils.columnar_features import (
+    columnar_preprocessor,
+    joined_list_stats,
+    stat_columns,
+)
 from sklearn.ensemble import RandomForestRegressor
 
 
@@ -11,19 +18,10 @@ class NeighborAtomStats(BaseEstimator, TransformerMixin):
         return self
 
     def transform(self, X):
-        stats = []
-        for val in X.iloc[:, 0]:
-            if pd.isna(val):
-                nums = []
-            else:
-                try:
-                    nums = [int(x) for x in str(val).split(",")]
-                except:
-                    nums = []
-            mean = np.mean(nums) if nums else 0
-            std = np.std(nums) if nums else 0
-            stats.append([mean, std, len(nums)])
-        return np.array(stats)
+        return joined_list_stats(X.iloc[:, 0])
+
+    def list_stat_columns(self, columns):
+        return stat_columns(columns[0])
 
 
 class NeighborCountExtractor(BaseEstimator, TransformerMixin):
@@ -71,14 +69,14 @@ def train_model(X_train, y_train):
         "neighbor_Halogen_count",
     ]
 
-    neighbor_atomic_nums_feature = ["neighbor_atomic_nums"]
+    neighbor_atomic_nums_feature = stat_columns("neighbor_atomic_nums")
 
     categorical_features = ["hybridization"]
 
     preprocessor = ColumnTransformer(
         transformers=[
             ("num", "passthrough", numeric_features),
-            ("neighbor_stats", NeighborAtomStats(), neighbor_atomic_nums_feature),
+            ("neighbor_stats", "passthrough", neighbor_atomic_nums_feature),
             ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_features),
         ]
     )
@@ -94,21 +92,46 @@ def train_model(X_train, y_train):
     }
 
 
+def transform_features(model_dict, X_test):
+    return columnar_preprocessor(model_dict).transform(X_test)
+
+
 def predict_associations(
     model_dict, X_test, heavy_atom_idx_list, merge=True, ppm_tol=0.15
 ):
-    preprocessor = model_dict["preprocessor"]
+    return predict_associations_batch(
+        model_dict, [X_test], [heavy_atom_idx_list], merge, ppm_tol
+    )[0]
 
-    X_proc = preprocessor.transform(X_test)
 
-    ppm_pred = model_dict["reg_ppm"].predict(X_proc)
+def predict_associations_batch(
+    model_dict, X_list, heavy_atom_idx_lists, merge=True, ppm_tol=0.15
+):
+    # Rows of all molecules go through the forest in a single call, then the
+    # predictions are split back per molecule
+    if not X_list:
+        return []
 
+    X_proc = transform_features(model_dict, pd.concat(X_list, ignore_index=True))
+
+    ppm_pred = forest_engine(model_dict).predict(X_proc)["reg_ppm"]
+
+    bounds = np.cumsum([0] + [len(X) for X in X_list])
+    return [
+        build_associations(ppm_pred[start:stop], heavy_atom_idx_list, merge, ppm_tol)
+        for start, stop, heavy_atom_idx_list in zip(
+            bounds[:-1], bounds[1:], heavy_atom_idx_lists
+        )
+    ]
+
+
+def build_associations(ppm_pred, heavy_atom_idx_list, merge, ppm_tol):
     default_multiplicity = "s"
 
     default_couplings = []
 
     associations = []
-    for i in range(len(X_test)):
+    for i in range(len(ppm_pred)):
         associations.append(
             {
                 "ppm": float(ppm_pred[i]),
@@ -121,27 +144,4 @@ def predict_associations(
 
     if not merge:
         return associations
-
-    merged = []
-    associations = sorted(associations, key=lambda x: x["ppm"])
-    if not associations:
-        return merged
-
-    current = associations[0].copy()
-    for assoc in associations[1:]:
-        if abs(assoc["ppm"] - current["ppm"]) < ppm_tol:
-            nb1 = current["nb_atoms"]
-            nb2 = assoc["nb_atoms"]
-            total_nb = nb1 + nb2
-
-            current["ppm"] = (current["ppm"] * nb1 + assoc["ppm"] * nb2) / total_nb
-            current["nb_atoms"] = total_nb
-            current["atoms"].extend(assoc["atoms"])
-
-        else:
-            merged.append(current)
-            current = assoc.copy()
-
-    merged.append(current)
-
-    return merged
+    return merge_close_associations(associations, ppm_tol)
@@ -1,7 +1,21 @@
 from rdkit import Chem
-from rdkit.Chem import rdPartialCharges, AllChem
 from collections import defaultdict
+import numpy as np
 import pandas as pd
+from app.models.simpleModel.utils.molecule_context import (
+    MoleculeContext,
+    features_in_input_order,
+    masked_row_min,
+)
+from app.models.simpleModel.utils.conformers import add_canonical_conformer
+from app.models.simpleModel.utils.molecule_preparation import prepare_smiles
+from app.models.simpleModel.utils.columnar_features import (
+    neighbor_list_stats,
+    stat_columns,
+)
+
+# No feature reads 3D coordinates, so molecules are not embedded
+REQUIRES_CONFORMER = False
 
 
 def get_equivalent_H_groups(mol):
@@ -18,51 +32,20 @@ def get_equivalent_H_groups(mol):
     return atom_to_H
 
 
-def extract_features_for_H_group(mol, heavy_idx, H_indices, groups):
+def extract_features_for_H_group(
+    context,
+    heavy_idx,
+    H_indices,
+    num_couplable_H_neighbors,
+    distance_to_nearest_non_equivalent_H,
+    neighbor_stats,
+):
+    mol = context.mol
     heavy_atom = mol.GetAtomWithIdx(heavy_idx)
     neighbors = [a for a in heavy_atom.GetNeighbors() if a.GetAtomicNum() > 1]
 
-    if not mol.HasProp("_GasteigerChargesComputed"):
-        rdPartialCharges.ComputeGasteigerCharges(mol)
-        mol.SetProp("_GasteigerChargesComputed", "1")
-
-    try:
-        charge = float(heavy_atom.GetProp("_GasteigerCharge"))
-    except:
-        charge = 0.0
-
-    symmetry_classes = Chem.CanonicalRankAtoms(mol, breakTies=False)
-    in_symmetric_env = symmetry_classes[heavy_idx]
-
-    neighbor_H_counts = []
-    for nbr in neighbors:
-        nbr_H = sum(1 for a in nbr.GetNeighbors() if a.GetAtomicNum() == 1)
-        neighbor_H_counts.append(nbr_H)
-    neighbor_H_counts_str = ",".join(map(str, neighbor_H_counts))
-
-    def is_non_equivalent_H(h_idx):
-        for g_heavy, g_H in groups.items():
-            if h_idx in g_H and g_heavy != heavy_idx:
-                return True
-        return False
-
-    num_couplable_H_neighbors = 0
-    for atom in mol.GetAtoms():
-        if atom.GetAtomicNum() == 1 and is_non_equivalent_H(atom.GetIdx()):
-            dist = Chem.rdmolops.GetShortestPath(
-                mol, heavy_idx, atom.GetNeighbors()[0].GetIdx()
-            )
-            if 2 <= len(dist) - 1 <= 3:
-                num_couplable_H_neighbors += 1
-
-    distances = []
-    for atom in mol.GetAtoms():
-        if atom.GetAtomicNum() == 1 and is_non_equivalent_H(atom.GetIdx()):
-            path = Chem.rdmolops.GetShortestPath(
-                mol, heavy_idx, atom.GetNeighbors()[0].GetIdx()
-            )
-            distances.append(len(path) - 1)
-    distance_to_nearest_non_equivalent_H = min(distances) if distances else -1
+    charge = context.charges[heavy_idx]
+    in_symmetric_env = context.symmetry_ranks[heavy_idx]
 
     if distance_to_nearest_non_equivalent_H == 2:
         H_coupling_type = "geminal"
@@ -88,13 +71,15 @@ def extract_features_for_H_group(mol, heavy_idx, H_indices, groups):
         "heavy_formal_charge": heavy_atom.GetFormalCharge(),
         "heavy_partial_charge": charge,
         "num_heavy_neighbors": len(neighbors),
-        "neighbor_atomic_nums": ",".join(str(n.GetAtomicNum()) for n in neighbors),
+        **neighbor_stats["neighbor_atomic_nums"],
         "num_H_neighbors": sum(
             1 for n in heavy_atom.GetNeighbors() if n.GetAtomicNum() == 1
         ),
-        "neighbor_H_counts_per_atom": neighbor_H_counts_str,
-        "num_couplable_H_neighbors": num_couplable_H_neighbors,
-        "distance_to_nearest_non_equivalent_H": distance_to_nearest_non_equivalent_H,
+        **neighbor_stats["neighbor_H_counts_per_atom"],
+        "num_couplable_H_neighbors": int(num_couplable_H_neighbors),
+        "distance_to_nearest_non_equivalent_H": int(
+            distance_to_nearest_non_equivalent_H
+        ),
         "in_symmetric_env": int(in_symmetric_env),
         "H_coupling_type": H_coupling_type,
         "is_in_CH3": int(is_in_CH3),
@@ -105,16 +90,68 @@ def extract_features_for_H_group(mol, heavy_idx, H_indices, groups):
     return feature_dict
 
 
-def extract_features_from_smiles(smiles):
-    mol = Chem.MolFromSmiles(smiles)
-    mol = Chem.AddHs(mol)
-    AllChem.EmbedMolecule(mol, AllChem.ETKDG())
+def extract_features_for_H_groups(context, groups):
+    heavy_indices = np.array(list(groups), dtype=int)
+    hydrogens = context.hydrogen_indices
+    parents = context.hydrogen_parent[hydrogens]
+
+    # Hydrogens of the other groups, and the topological distance from each
+    # group's heavy atom to the heavy atom carrying them
+    non_equivalent = parents[None, :] != heavy_indices[:, None]
+    distances = context.distance_matrix[np.ix_(heavy_indices, parents)]
+
+    couplable = non_equivalent & (distances >= 2) & (distances <= 3)
+    num_couplable = couplable.sum(axis=1)
+    nearest = masked_row_min(distances, non_equivalent)
+
+    # Atomic numbers and hydrogen counts of each group's heavy neighbours
+    adjacency = context.adjacency[heavy_indices]
+    heavy = context.atomic_nums > 1
+    H_counts = context.adjacency[:, context.atomic_nums == 1].sum(axis=1)
+    stats = {
+        "neighbor_atomic_nums": neighbor_list_stats(
+            adjacency, heavy, context.atomic_nums
+        ),
+        "neighbor_H_counts_per_atom": neighbor_list_stats(adjacency, heavy, H_counts),
+    }
+
+    return [
+        extract_features_for_H_group(
+            context,
+            heavy_idx,
+            H_indices,
+            num_couplable[i],
+            nearest[i],
+            {
+                name: dict(zip(stat_columns(name), values[i]))
+                for name, values in stats.items()
+            },
+        )
+        for i, (heavy_idx, H_indices) in enumerate(groups.items())
+    ]
+
+
+def extract_features_from_molecule(prepared):
+    # get_equivalent_H_groups kekulizes in place: work on a copy of the
+    # shared molecule
+    mol = Chem.Mol(prepared.hydrogenated())
+    if REQUIRES_CONFORMER:
+        add_canonical_conformer(mol, prepared.canonical_smiles)
 
     groups = get_equivalent_H_groups(mol)
-    all_features = []
+    if not groups:
+        return pd.DataFrame([])
 
-    for heavy_idx, H_indices in groups.items():
-        feat = extract_features_for_H_group(mol, heavy_idx, H_indices, groups)
-        all_features.append(feat)
+    context = MoleculeContext(mol)
+    return pd.DataFrame(extract_features_for_H_groups(context, groups))
 
-    return pd.DataFrame(all_features)
+
+def extract_features_from_smiles(smiles):
+    prepared, to_input = prepare_smiles(smiles)
+    if prepared is None:
+        raise ValueError(f"Invalid SMILES: {smiles}")
+
+    features = prepared.derive(
+        "features_1h", lambda: extract_features_from_molecule(prepared)
+    )
+    return features_in_input_order(features, to_input)
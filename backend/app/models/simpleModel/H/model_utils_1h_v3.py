@@ -5,6 +5,13 @@ from sklearn.multioutput import MultiOutputRegressor
 from sklearn.preprocessing import OneHotEncoder, LabelEncoder
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.compose import ColumnTransformer
+from app.models.simpleModel.utils.packed_forest import forest_engine
+from app.models.simpleModel.utils.peak_merging import merge_close_associations
+from app.models.simpleModel.utils.columnar_features import (
+    columnar_preprocessor,
+    joined_list_stats,
+    stat_columns,
+)
 
 
 class NeighborAtomStats(BaseEstimator, TransformerMixin):
@@ -12,19 +19,10 @@ class NeighborAtomStats(BaseEstimator, TransformerMixin):
         return self
 
     def transform(self, X):
-        stats = []
-        for val in X.iloc[:, 0]:
-            if pd.isna(val):
-                nums = []
-            else:
-                try:
-                    nums = [int(x) for x in str(val).split(",")]
-                except:
-                    nums = []
-            mean = np.mean(nums) if nums else 0
-            std = np.std(nums) if nums else 0
-            stats.append([mean, std, len(nums)])
-        return np.array(stats)
+        return joined_list_stats(X.iloc[:, 0])
+
+    def list_stat_columns(self, columns):
+        return stat_columns(columns[0])
 
 
 class NeighborHCountsStats(BaseEstimator, TransformerMixin):
@@ -32,19 +30,10 @@ class NeighborHCountsStats(BaseEstimator, TransformerMixin):
         return self
 
     def transform(self, X):
-        stats = []
-        for val in X.iloc[:, 0]:
-            if pd.isna(val):
-                counts = []
-            else:
-                try:
-                    counts = [int(x) for x in str(val).split(",")]
-                except:
-                    counts = []
-            mean = np.mean(counts) if counts else 0
-            std = np.std(counts) if counts else 0
-            stats.append([mean, std, len(counts)])
-        return np.array(stats)
+        return joined_list_stats(X.iloc[:, 0])
+
+    def list_stat_columns(self, columns):
+        return stat_columns(columns[0])
 
 
 class HCouplingTypeEncoder(BaseEstimator, TransformerMixin):
@@ -90,8 +79,8 @@ def train_model(X_train, y_train):
         "is_terminal_CH",
     ]
 
-    neighbor_atomic_nums_feature = ["neighbor_atomic_nums"]
-    neighbor_H_counts_feature = ["neighbor_H_counts_per_atom"]
+    neighbor_atomic_nums_feature = stat_columns("neighbor_atomic_nums")
+    neighbor_H_counts_feature = stat_columns("neighbor_H_counts_per_atom")
 
     categorical_features = ["heavy_hybridization"]
 
@@ -100,8 +89,8 @@ def train_model(X_train, y_train):
     preprocessor = ColumnTransformer(
         transformers=[
             ("num", "passthrough", numeric_features),
-            ("neighbor_stats", NeighborAtomStats(), neighbor_atomic_nums_feature),
-            ("neighbor_H_stats", NeighborHCountsStats(), neighbor_H_counts_feature),
+            ("neighbor_stats", "passthrough", neighbor_atomic_nums_feature),
+            ("neighbor_H_stats", "passthrough", neighbor_H_counts_feature),
             ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_features),
         ]
     )
@@ -141,35 +130,72 @@ def train_model(X_train, y_train):
     }
 
 
-def multiplicity_complexity(m):
-    if m is None:
-        return 0
-    return len(m)
+def transform_features(model_dict, X_test):
+    X_num_cat = columnar_preprocessor(model_dict).transform(X_test)
+    h_coupling_encoded = model_dict["h_coupling_encoder"].transform(
+        X_test["H_coupling_type"]
+    )
+    return np.hstack([X_num_cat, h_coupling_encoded])
 
 
 def predict_associations(
     model_dict, X_test, heavy_atom_idx_list, merge=True, ppm_tol=0.15
 ):
-    preprocessor = model_dict["preprocessor"]
-    h_coupling_enc = model_dict["h_coupling_encoder"]
+    return predict_associations_batch(
+        model_dict, [X_test], [heavy_atom_idx_list], merge, ppm_tol
+    )[0]
 
-    X_num_cat = preprocessor.transform(X_test)
-    h_coupling_encoded = h_coupling_enc.transform(X_test["H_coupling_type"])
 
-    X_proc = np.hstack([X_num_cat, h_coupling_encoded])
+def predict_associations_batch(
+    model_dict, X_list, heavy_atom_idx_lists, merge=True, ppm_tol=0.15
+):
+    # Rows of all molecules go through each forest in a single call, then the
+    # predictions are split back per molecule
+    if not X_list:
+        return []
 
-    ppm_pred = model_dict["reg_ppm"].predict(X_proc)
-    multiplicity_pred_enc = model_dict["clf_multiplicity"].predict(X_proc)
+    X_test = pd.concat(X_list, ignore_index=True)
+    X_proc = transform_features(model_dict, X_test)
+
+    predictions = forest_engine(model_dict).predict(X_proc)
+    ppm_pred = predictions["reg_ppm"]
     multiplicity_pred = model_dict["label_multiplicity"].inverse_transform(
-        multiplicity_pred_enc
+        predictions["clf_multiplicity"]
     )
 
-    couplings_pred_raw = model_dict["reg_couplings"].predict(X_proc)
+    couplings_pred_raw = predictions["reg_couplings"]
+    num_H = X_test["num_H"].to_numpy()
+
+    bounds = np.cumsum([0] + [len(X) for X in X_list])
+    return [
+        build_associations(
+            ppm_pred[start:stop],
+            multiplicity_pred[start:stop],
+            couplings_pred_raw[start:stop],
+            num_H[start:stop],
+            heavy_atom_idx_list,
+            merge,
+            ppm_tol,
+        )
+        for start, stop, heavy_atom_idx_list in zip(
+            bounds[:-1], bounds[1:], heavy_atom_idx_lists
+        )
+    ]
+
 
+def build_associations(
+    ppm_pred,
+    multiplicity_pred,
+    couplings_pred_raw,
+    num_H_list,
+    heavy_atom_idx_list,
+    merge,
+    ppm_tol,
+):
     associations = []
-    for i in range(len(X_test)):
+    for i in range(len(ppm_pred)):
         multiplicity = multiplicity_pred[i]
-        num_H = X_test.iloc[i]["num_H"]
+        num_H = num_H_list[i]
         nb_atoms = int(num_H) if not pd.isna(num_H) else None
 
         couplings = [float(c) for c in couplings_pred_raw[i] if c > 0.01]
@@ -193,33 +219,4 @@ def predict_associations(
 
     if not merge:
         return associations
-
-    merged = []
-    associations = sorted(associations, key=lambda x: x["ppm"])
-    if not associations:
-        return merged
-
-    current = associations[0].copy()
-    for assoc in associations[1:]:
-        if abs(assoc["ppm"] - current["ppm"]) < ppm_tol:
-            nb1 = current["nb_atoms"] or 1
-            nb2 = assoc["nb_atoms"] or 1
-            total_nb = nb1 + nb2
-
-            current["ppm"] = (current["ppm"] * nb1 + assoc["ppm"] * nb2) / total_nb
-            current["nb_atoms"] = total_nb
-            current["atoms"].extend(assoc["atoms"])
-
-            if multiplicity_complexity(assoc["multiplicity"]) > multiplicity_complexity(
-                current["multiplicity"]
-            ):
-                current["multiplicity"] = assoc["multiplicity"]
-                current["couplings"] = assoc["couplings"]
-
-        else:
-            merged.append(current)
-            current = assoc.copy()
-
-    merged.append(current)
-
-    return merged
+    return merge_close_associations(associations, ppm_tol)
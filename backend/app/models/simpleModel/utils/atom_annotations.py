@@ -0,0 +1,165 @@
+import numpy as np
+
+
+# Which atoms contribute to which part of a spectrum, stored as ppm intervals
+# (one or more per peak) instead of one set of atom IDs per grid point.
+# Per-point lists are only built by ``for_points`` for callers that still
+# expect the legacy "atomID" field.
+class AtomAnnotations:
+    def __init__(self, ppm_min, ppm_max, peak_index, atom_ids, atom_offsets):
+        self.ppm_min = np.asarray(ppm_min, dtype=float)
+        self.ppm_max = np.asarray(ppm_max, dtype=float)
+        self.peak_index = np.asarray(peak_index, dtype=int)
+        # Atoms of peak p are atom_ids[atom_offsets[p]:atom_offsets[p + 1]]
+        self.atom_ids = np.asarray(atom_ids, dtype=int)
+        self.atom_offsets = np.asarray(atom_offsets, dtype=int)
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], [], [0])
+
+    @classmethod
+    def from_line_ranges(cls, x, starts, stops, owners, peak_atoms):
+        peak_atoms = [sorted(set(int(a) for a in atoms)) for atoms in peak_atoms]
+        atom_offsets = np.zeros(len(peak_atoms) + 1, dtype=int)
+        atom_offsets[1:] = np.cumsum([len(atoms) for atoms in peak_atoms])
+        atom_ids = [a for atoms in peak_atoms for a in atoms]
+
+        tagged = stops > starts
+        starts, stops, owners = starts[tagged], stops[tagged], owners[tagged]
+        if len(starts) == 0:
+            return cls([], [], [], atom_ids, atom_offsets)
+
+        # Union the overlapping index ranges of the lines of each peak
+        order = np.lexsort((starts, owners))
+        starts, stops, owners = starts[order], stops[order], owners[order]
+        reach = np.empty_like(stops)
+        new_interval = np.ones(len(starts), dtype=bool)
+        reach[0] = stops[0]
+        for i in range(1, len(starts)):
+            if owners[i] == owners[i - 1] and starts[i] <= reach[i - 1]:
+                new_interval[i] = False
+                reach[i] = max(reach[i - 1], stops[i])
+            else:
+                reach[i] = stops[i]
+
+        first = np.flatnonzero(new_interval)
+        last = np.append(first[1:], len(starts)) - 1
+        lo_ppm = x[starts[first]]
+        hi_ppm = x[reach[last] - 1]
+
+        return cls(
+            np.minimum(lo_ppm, hi_ppm),
+            np.maximum(lo_ppm, hi_ppm),
+            owners[first],
+            atom_ids,
+            atom_offsets,
+        )
+
+    @classmethod
+    def from_points(cls, ppm, atom_id_lists):
+        # Each run of consecutive points carrying the same atoms becomes one
+        # interval
+        ppm_min = []
+        ppm_max = []
+        peak_atoms = []
+        run_atoms = None
+        for value, atoms in zip(ppm, atom_id_lists):
+            atoms = sorted(set(atoms)) if atoms else []
+            if atoms and atoms == run_atoms:
+                ppm_min[-1] = min(ppm_min[-1], value)
+                ppm_max[-1] = max(ppm_max[-1], value)
+            elif atoms:
+                ppm_min.append(value)
+                ppm_max.append(value)
+                peak_atoms.append(atoms)
+            run_atoms = atoms
+
+        atom_offsets = np.zeros(len(peak_atoms) + 1, dtype=int)
+        atom_offsets[1:] = np.cumsum([len(atoms) for atoms in peak_atoms])
+        atom_ids = [a for atoms in peak_atoms for a in atoms]
+
+        return cls(ppm_min, ppm_max, np.arange(len(peak_atoms)), atom_ids, atom_offsets)
+
+    def __len__(self):
+        return len(self.ppm_min)
+
+    def atoms_of_peak(self, peak):
+        return self.atom_ids[self.atom_offsets[peak] : self.atom_offsets[peak + 1]]
+
+    def atoms_between(self, ppm_min, ppm_max):
+        overlapping = (self.ppm_min <= ppm_max) & (self.ppm_max >= ppm_min)
+        atoms = set()
+        for peak in np.unique(self.peak_index[overlapping]):
+            atoms.update(int(a) for a in self.atoms_of_peak(peak))
+        return sorted(atoms)
+
+    def for_points(self, ppm):
+        ppm = np.asarray(ppm, dtype=float)
+        n_points = len(ppm)
+        if n_points == 0:
+            return []
+        if len(self) == 0:
+            return [[] for _ in range(n_points)]
+
+        order = np.argsort(ppm, kind="stable")
+        ppm_sorted = ppm[order]
+        lo = np.searchsorted(ppm_sorted, self.ppm_min, side="left")
+        hi = np.searchsorted(ppm_sorted, self.ppm_max, side="right")
+
+        # Points between two consecutive interval bounds share the same atoms,
+        # so each such segment gets a single list object.
+        bounds = np.unique(np.concatenate(([0, n_points], lo, hi)))
+        segment_atoms = []
+        for seg_start, seg_end in zip(bounds[:-1], bounds[1:]):
+            active = (lo <= seg_start) & (hi >= seg_end)
+            atoms = set()
+            for peak in np.unique(self.peak_index[active]):
+                atoms.update(int(a) for a in self.atoms_of_peak(peak))
+            segment_atoms.append(sorted(atoms))
+
+        segment_of_point = np.empty(n_points, dtype=int)
+        segment_of_point[order] = np.repeat(
+            np.arange(len(segment_atoms)), np.diff(bounds)
+        )
+        return [segment_atoms[s] for s in segment_of_point]
+
+    def renumbered(self, mapping):
+        # Same intervals with every atom ID a replaced by mapping[a]
+        atom_ids = np.asarray(mapping, dtype=int)[self.atom_ids]
+        owners = np.repeat(
+            np.arange(len(self.atom_offsets) - 1), np.diff(self.atom_offsets)
+        )
+        order = np.lexsort((atom_ids, owners))
+        return AtomAnnotations(
+            self.ppm_min,
+            self.ppm_max,
+            self.peak_index,
+            atom_ids[order],
+            self.atom_offsets,
+        )
+
+    def to_json(self):
+        return [
+            {
+                "ppmMin": float(lo),
+                "ppmMax": float(hi),
+                "atomIDs": [int(a) for a in self.atoms_of_peak(peak)],
+            }
+            for lo, hi, peak in zip(self.ppm_min, self.ppm_max, self.peak_index)
+        ]
+
+    @classmethod
+    def from_json(cls, intervals):
+        ppm_min = [float(interval["ppmMin"]) for interval in intervals]
+        ppm_max = [float(interval["ppmMax"]) for interval in intervals]
+        peak_atoms = [
+            sorted(set(int(a) for a in interval.get("atomIDs", [])))
+            for interval in intervals
+        ]
+
+        atom_offsets = np.zeros(len(peak_atoms) + 1, dtype=int)
+        atom_offsets[1:] = np.cumsum([len(atoms) for atoms in peak_atoms])
+        atom_ids = [a for atoms in peak_atoms for a in atoms]
+
+        return cls(ppm_min, ppm_max, np.arange(len(intervals)), atom_ids, atom_offsets)
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+from app.models.simpleModel.H import simpleModel_predict_1h_v3 as predictor_1h
+from app.models.simpleModel.C import simpleModel_predict_13c_v2 as predictor_13c
+from app.api.services.logger import log_with_time
+
+PREDICTORS = {"1H": predictor_1h, "13C": predictor_13c}
+
+
+def featurize(predictor, smiles):
+    try:
+        return predictor.extract_features_from_smiles(smiles), None
+    except Exception as e:
+        log_with_time(f"Error during the processing of the SMILES: {e}")
+        return None, f"Could not process the SMILES: {smiles}"
+
+
+def predict_batch(smiles_list, nuclei, peaks_only=False, workers=1, **render_options):
+    # Molecules are featurized on a thread pool, then each nucleus runs its
+    # forests once over the rows of the whole batch. Returns one
+    # {nucleus: prediction or {"error": ...}} dict per SMILES.
+    results = [{} for _ in smiles_list]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for nucleus in nuclei:
+            predictor = PREDICTORS[nucleus]
+            featurized = list(
+                executor.map(lambda smiles: featurize(predictor, smiles), smiles_list)
+            )
+
+            items, positions = [], []
+            for i, (features, error) in enumerate(featurized):
+                if error:
+                    results[i][nucleus] = {"error": error}
+                else:
+                    items.append((smiles_list[i], features))
+                    positions.append(i)
+
+            predictions = predictor.predict_spectra(
+                items, peaks_only=peaks_only, **render_options
+            )
+            for i, prediction in zip(positions, predictions):
+                results[i][nucleus] = prediction
+
+    return results
+
+
+def predict_nuclei(smiles, nuclei, **render_options):
+    # Several nuclei for one molecule: the predictors share its prepared
+    # molecule and run their model inferences at the same time
+    if len(nuclei) == 1:
+        return {
+            nuclei[0]: PREDICTORS[nuclei[0]].predict_spectrum(smiles, **render_options)
+        }
+
+    with ThreadPoolExecutor(max_workers=len(nuclei)) as executor:
+        futures = {
+            nucleus: executor.submit(
+                PREDICTORS[nucleus].predict_spectrum, smiles, **render_options
+            )
+            for nucleus in nuclei
+        }
+        return {nucleus: future.result() for nucleus, future in futures.items()}
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import OneHotEncoder
+
+# Neighbour lists (atomic numbers, hydrogen counts) only reach the models
+# through their mean, population std and length. Featurizers emit these as
+# numeric columns; the joined-string form ("8,6") remains in the training
+# CSVs and is what older pickled models were fitted on.
+LIST_STATS = ("mean", "std", "count")
+INTEGER_TOKEN = r"[+-]?\d+"
+
+
+def stat_columns(name):
+    return [f"{name}_{stat}" for stat in LIST_STATS]
+
+
+def list_stats(rows, values, n_rows):
+    # values[i] belongs to list rows[i]; empty lists give zeros
+    counts = np.bincount(rows, minlength=n_rows).astype(float)
+    nonempty = counts > 0
+    sums = np.bincount(rows, weights=values, minlength=n_rows)
+    mean = np.divide(sums, counts, out=np.zeros(n_rows), where=nonempty)
+    squares = np.bincount(rows, weights=(values - mean[rows]) ** 2, minlength=n_rows)
+    std = np.sqrt(np.divide(squares, counts, out=np.zeros(n_rows), where=nonempty))
+    return np.column_stack([mean, std, counts])
+
+
+def neighbor_list_stats(adjacency, mask, values):
+    # Stats of values over the neighbours selected by mask, one row per
+    # adjacency row
+    rows, cols = np.nonzero(adjacency * mask)
+    return list_stats(rows, values[cols].astype(float), len(adjacency))
+
+
+def parse_joined_lists(column):
+    # Missing values and lists with any non-integer item count as empty,
+    # like the former row-by-row parser
+    text = pd.Series(np.asarray(column, dtype=object)).astype(str)
+    tokens = text.str.split(",").explode().str.strip()
+    row_valid = tokens.str.fullmatch(INTEGER_TOKEN).groupby(level=0).all()
+    keep = row_valid.reindex(tokens.index).to_numpy()
+    rows = tokens.index.to_numpy()[keep]
+    values = tokens.to_numpy()[keep].astype(int).astype(float)
+    return rows, values
+
+
+def joined_list_stats(column):
+    rows, values = parse_joined_lists(column)
+    return list_stats(rows, values, len(column))
+
+
+def expand_joined_list_column(frame, name):
+    # Replaces a joined-string list column by its stat columns, in place of it
+    stats = joined_list_stats(frame[name])
+    position = frame.columns.get_loc(name)
+    frame = frame.drop(columns=[name])
+    for offset, (column, values) in enumerate(zip(stat_columns(name), stats.T)):
+        frame.insert(position + offset, column, values)
+    return frame
+
+
+class ColumnarPreprocessor:
+    # Array-at-a-time replacement for a fitted ColumnTransformer. List stat
+    # transformers fitted on joined strings read the precomputed stat columns
+    # instead, so pickled models keep working on the columnar features.
+    def __init__(self, column_transformer):
+        self.blocks = []
+        for name, transformer, columns in column_transformer.transformers_:
+            if isinstance(transformer, str):
+                if transformer == "passthrough":
+                    self.blocks.append(("columns", list(columns), None))
+            elif hasattr(transformer, "list_stat_columns"):
+                stats = transformer.list_stat_columns(columns)
+                self.blocks.append(("columns", stats, None))
+            elif (
+                isinstance(transformer, OneHotEncoder) and transformer.drop_idx_ is None
+            ):
+                self.blocks.append(("one_hot", list(columns), transformer.categories_))
+            else:
+                self.blocks.append(("transformer", list(columns), transformer))
+
+    def transform(self, frame):
+        arrays = []
+        for kind, columns, extra in self.blocks:
+            if kind == "columns":
+                arrays.append(frame[columns].to_numpy(dtype=float))
+            elif kind == "one_hot":
+                for column, categories in zip(columns, extra):
+                    values = frame[column].to_numpy(dtype=object)
+                    arrays.append(
+                        (values[:, None] == categories[None, :]).astype(float)
+                    )
+            else:
+                arrays.append(np.asarray(extra.transform(frame[columns]), dtype=float))
+        return np.hstack(arrays)
+
+
+def columnar_preprocessor(model_dict):
+    if "columnar_preprocessor" not in model_dict:
+        model_dict["columnar_preprocessor"] = ColumnarPreprocessor(
+            model_dict["preprocessor"]
+        )
+    return model_dict["columnar_preprocessor"]
@@ -0,0 +1,40 @@
+from functools import lru_cache
+from rdkit import Chem
+from rdkit.Chem import AllChem
+
+# Featurizers declare REQUIRES_CONFORMER; molecules are only embedded for
+# the ones that read 3D coordinates. Featurizers work in canonical atom
+# order, so embeddings of the canonical SMILES (fixed seed, cached) apply
+# directly and repeated molecules are deterministic and embedded once.
+CONFORMER_SEED = 42
+CONFORMER_CACHE_SIZE = 256
+
+
+def add_canonical_conformer(mol, canonical_smiles):
+    # mol must be AddHs(MolFromSmiles(canonical_smiles)), in that atom order
+    coordinates = canonical_conformer(canonical_smiles)
+    if coordinates is None:
+        raise ValueError(f"Could not embed a conformer for: {canonical_smiles}")
+    set_conformer(mol, coordinates)
+
+
+@lru_cache(maxsize=CONFORMER_CACHE_SIZE)
+def canonical_conformer(canonical_smiles):
+    # Coordinates in the atom order of AddHs(MolFromSmiles(canonical_smiles))
+    mol = Chem.AddHs(Chem.MolFromSmiles(canonical_smiles))
+    params = AllChem.ETKDG()
+    params.randomSeed = CONFORMER_SEED
+    if AllChem.EmbedMolecule(mol, params) != 0:
+        return None
+    coordinates = mol.GetConformer().GetPositions()
+    coordinates.flags.writeable = False
+    return coordinates
+
+
+def set_conformer(mol, coordinates):
+    conformer = Chem.Conformer(mol.GetNumAtoms())
+    for idx, position in enumerate(coordinates):
+        conformer.SetAtomPosition(idx, position.tolist())
+    conformer.Set3D(True)
+    mol.RemoveAllConformers()
+    mol.AddConformer(conformer, assignId=True)
@@ -1,85 +1,425 @@
 import numpy as np
-from itertools import product
-from scipy.stats import norm
+from functools import lru_cache
+from math import comb
+from app.models.simpleModel.utils.atom_annotations import AtomAnnotations
+from app.models.simpleModel.utils.spectrum_decimation import decimate_spectrum
+
+# Number of lines of each first-order multiplet, named by letter or by name
+MULTIPLET_LINES = {
+    "s": 1,
+    "d": 2,
+    "t": 3,
+    "q": 4,
+    "p": 5,
+    "quint": 5,
+    "h": 6,
+    "sext": 6,
+    "sept": 7,
+    "hept": 7,
+    "o": 8,
+    "oct": 8,
+    "n": 9,
+    "non": 9,
+}
+MULTIPLET_NAMES = sorted(
+    (name for name in MULTIPLET_LINES if len(name) > 1), key=len, reverse=True
+)
+
+# Couplings are rounded to this many decimals (in Hz) in the pattern cache key
+COUPLING_DECIMALS = 3
+# Lines closer than 10^-LINE_MERGE_DECIMALS Hz are merged into one
+LINE_MERGE_DECIMALS = 6
+PATTERN_CACHE_SIZE = 1024
+
+# Rendering defaults of the simple models: spectrometer frequency (MHz), line
+# width (ppm), number of points of the uniform grid and ppm range per nucleus
+DEFAULT_SPECTROMETER_FREQ = 500.0
+DEFAULT_FWHM = 0.004
+DEFAULT_RESOLUTION = 64000
+PPM_RANGES = {"1H": (0, 10), "13C": (0, 250)}
 
 
 def get_basic_pattern(m):
-    patterns = {
-        "s": [1],
-        "d": [1, 1],
-        "t": [1, 2, 1],
-        "q": [1, 3, 3, 1],
-        "m": [1] * 5,
-    }
-    return patterns.get(m, [1])  # default = singulet
+    if m == "m":
+        return [1] * 5
+    n_lines = MULTIPLET_LINES.get(m)
+    if n_lines is None:
+        return [1]  # default = singulet
+    return [comb(n_lines - 1, k) for k in range(n_lines)]
+
+
+def parse_multiplicity(multiplicity):
+    # "dquint" -> ["d", "quint"]; names are matched before single letters
+    tokens = []
+    i = 0
+    while i < len(multiplicity):
+        for name in MULTIPLET_NAMES:
+            if multiplicity.startswith(name, i):
+                tokens.append(name)
+                i += len(name)
+                break
+        else:
+            tokens.append(multiplicity[i])
+            i += 1
+    return tokens
+
+
+def convolve_lines(positions, intensities, kernel_positions, kernel_intensities):
+    positions = np.add.outer(positions, kernel_positions).ravel()
+    intensities = np.multiply.outer(intensities, kernel_intensities).ravel()
+
+    merged, inverse = np.unique(
+        np.round(positions, LINE_MERGE_DECIMALS), return_inverse=True
+    )
+    return merged, np.bincount(inverse, weights=intensities)
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def multiplet_pattern(multiplicity, Js, spectrometer_freq):
+    # Line offsets (ppm, relative to the centre) and normalized intensities.
+    # The returned arrays are shared by the cache and therefore read-only.
+    tokens = multiplet_tokens(multiplicity, Js)
+
+    if all(len(token) == 1 for token in tokens):
+        valid = len(Js) == len(tokens)
+    else:
+        # Named multiplets use one coupling each, extra (padding) ones are ignored
+        valid = len(Js) >= len(tokens)
+
+    positions = np.zeros(1)
+    intensities = np.ones(1)
+    if valid:
+        for token, J in zip(tokens, Js):
+            base_pattern = np.array(get_basic_pattern(token), dtype=float)
+            base_pattern /= base_pattern.sum()
+            n = len(base_pattern)
+            shifts_hz = np.linspace(-J * (n - 1) / 2, J * (n - 1) / 2, n)
+            positions, intensities = convolve_lines(
+                positions, intensities, shifts_hz, base_pattern
+            )
+        intensities /= intensities.sum()
+
+    offsets = positions / spectrometer_freq
+    offsets.setflags(write=False)
+    intensities.setflags(write=False)
+    return offsets, intensities
+
+
+def multiplet_tokens(multiplicity, Js):
+    # Tokens multiplet_pattern convolves: a single letter with several
+    # couplings repeats once per coupling
+    tokens = parse_multiplicity(multiplicity)
+    if len(tokens) == 1 and len(multiplicity) == 1 and len(Js) > 1:
+        tokens = tokens * len(Js)
+    return tokens
 
 
-def get_subpeak_shifts(multiplicity, Js, center_ppm, spectrometer_freq=500.0):
+def multiplet_line_count(multiplicity, Js):
+    # Upper bound of the number of lines of a multiplet, without building it
+    if not multiplicity or not Js or multiplicity == "s":
+        return 1
+    count = 1
+    for token, _ in zip(multiplet_tokens(multiplicity.lower(), Js), Js):
+        count *= len(get_basic_pattern(token))
+    return count
+
+
+def get_subpeak_shifts(
+    multiplicity, Js, center_ppm, spectrometer_freq=DEFAULT_SPECTROMETER_FREQ
+):
     if not multiplicity or not Js or multiplicity == "s":
         return [center_ppm], [1]
 
-    letters = list(multiplicity.lower())
+    offsets, intensities = multiplet_pattern(
+        multiplicity.lower(),
+        tuple(round(float(J), COUPLING_DECIMALS) for J in Js),
+        float(spectrometer_freq),
+    )
+    return offsets + center_ppm, intensities
 
-    if len(letters) == 1 and len(Js) > 1:
-        letters = letters * len(Js)
 
-    if len(Js) != len(letters):
-        return [center_ppm], [1]
+# Scale applied to every line so that intensities keep the order of magnitude
+# the frontend has always displayed.
+INTENSITY_SCALE = 5e4
 
-    spacing_sets = []
-    intensities_sets = []
+# A grid point is attributed to the atoms of a line when that line alone
+# contributes more than this intensity at the point.
+ATOM_ID_THRESHOLD = 1e-3
 
-    for letter, J in zip(letters, Js):
-        base_pattern = get_basic_pattern(letter)
-        base_pattern = np.array(base_pattern) / np.sum(base_pattern)
-        n = len(base_pattern)
-        shifts_hz = np.linspace(-J * (n - 1) / 2, J * (n - 1) / 2, n)
-        spacing_sets.append(shifts_hz)
-        intensities_sets.append(base_pattern)
+LINE_SHAPES = ("gaussian", "lorentzian", "pseudo_voigt")
 
-    all_combinations = list(product(*[range(len(s)) for s in spacing_sets]))
+# Half-width, in FWHM units, of the window each line is evaluated in.
+# A Gaussian is below 1e-30 of its height 5 FWHM away from its centre, so the
+# windowed spectrum matches the full evaluation to float64 rounding (relative
+# error < 1e-12 of the maximum) and the atom IDs are identical. Lorentzian
+# tails decay as 1/x^2: at 50 FWHM they are 1e-4 of the height, which bounds
+# the truncation error of the Lorentzian and pseudo-Voigt shapes.
+DEFAULT_WINDOW_IN_FWHM = {
+    "gaussian": 5.0,
+    "lorentzian": 50.0,
+    "pseudo_voigt": 50.0,
+}
 
-    positions = []
-    intensities = []
 
-    for comb in all_combinations:
-        pos_hz = sum(spacing_sets[i][idx] for i, idx in enumerate(comb))
-        pos_ppm = pos_hz / spectrometer_freq + center_ppm
+def gaussian_line(offsets, fwhm):
+    sigma = fwhm / 2.355
+    return np.exp(-0.5 * (offsets / sigma) ** 2) / (sigma * np.sqrt(2 * np.pi))
 
-        inten = 1
-        for i, idx in enumerate(comb):
-            inten *= intensities_sets[i][idx]
 
-        positions.append(pos_ppm)
-        intensities.append(inten)
+def lorentzian_line(offsets, fwhm):
+    gamma = fwhm / 2
+    return gamma / (np.pi * (offsets**2 + gamma**2))
 
-    intensities = np.array(intensities)
-    intensities /= intensities.sum()
 
-    return positions, intensities
+def line_shape_values(offsets, fwhm, line_shape="gaussian", eta=0.5):
+    if line_shape == "gaussian":
+        return gaussian_line(offsets, fwhm)
+    if line_shape == "lorentzian":
+        return lorentzian_line(offsets, fwhm)
+    if line_shape == "pseudo_voigt":
+        return eta * lorentzian_line(offsets, fwhm) + (1 - eta) * gaussian_line(
+            offsets, fwhm
+        )
+    raise ValueError(f"Unknown line shape: {line_shape}")
 
 
-def simulate_spectrum(associations, fwhm=0.004, ppm_range=(0, 250), resolution=64000):
-    x = np.linspace(ppm_range[1], ppm_range[0], resolution)
-    y = np.zeros_like(x)
-    atoms_ids = [set() for _ in range(len(x))]
+def collect_lines(associations, spectrometer_freq=DEFAULT_SPECTROMETER_FREQ):
+    positions = []
+    amplitudes = []
+    owners = []
 
-    for assoc in associations:
+    for owner, assoc in enumerate(associations):
         ppm = assoc["ppm"]
         J = assoc.get("couplings", [])
         mult = assoc.get("multiplicity", "s") or "s"
         nb_atoms = assoc.get("nb_atoms", 1)
-        atom_ids = assoc.get("atoms", [])
-        positions, intensities = get_subpeak_shifts(mult.lower(), J, ppm)
+        sub_positions, sub_intensities = get_subpeak_shifts(
+            mult.lower(), J, ppm, spectrometer_freq
+        )
+
+        positions.extend(sub_positions)
+        amplitudes.extend(nb_atoms * np.asarray(sub_intensities, dtype=float))
+        owners.extend([owner] * len(sub_positions))
+
+    return (
+        np.asarray(positions, dtype=float),
+        np.asarray(amplitudes, dtype=float),
+        np.asarray(owners, dtype=int),
+    )
+
+
+# Sums all lines on the grid ``x`` (ascending or descending, not necessarily
+# uniform) in one batched pass, evaluating each line only within ``window``
+# FWHM of its centre. Also returns, for every line, the [start, stop) index
+# range of ``x`` where it exceeds ATOM_ID_THRESHOLD (empty when it never does).
+def render_lines(
+    x,
+    positions,
+    amplitudes,
+    fwhm=0.004,
+    line_shape="gaussian",
+    window=None,
+    dtype=np.float64,
+    eta=0.5,
+):
+    if line_shape not in LINE_SHAPES:
+        raise ValueError(f"Unknown line shape: {line_shape}")
+    if window is None:
+        window = DEFAULT_WINDOW_IN_FWHM[line_shape]
+    dtype = np.dtype(dtype)
+
+    n_points = len(x)
+    n_lines = len(positions)
+    starts = np.zeros(n_lines, dtype=int)
+    stops = np.zeros(n_lines, dtype=int)
+    if n_points == 0 or n_lines == 0:
+        return np.zeros(n_points, dtype=dtype), starts, stops
+
+    descending = x[0] > x[-1]
+    x_asc = x[::-1] if descending else x
+
+    half_width = window * fwhm
+    lo = np.searchsorted(x_asc, positions - half_width, side="left")
+    hi = np.searchsorted(x_asc, positions + half_width, side="right")
+    counts = hi - lo
+
+    # Flatten the ragged (line, point) windows into two parallel index arrays
+    line_idx = np.repeat(np.arange(n_lines), counts)
+    first_slot = np.cumsum(counts) - counts
+    point_idx = np.arange(counts.sum()) + np.repeat(lo - first_slot, counts)
+
+    offsets = (x_asc[point_idx] - positions[line_idx]).astype(dtype, copy=False)
+    values = line_shape_values(offsets, dtype.type(fwhm), line_shape, dtype.type(eta))
+    values *= (amplitudes * INTENSITY_SCALE).astype(dtype)[line_idx]
+
+    y = np.bincount(point_idx, weights=values, minlength=n_points).astype(dtype)
 
-        for pos, amp in zip(positions, intensities):
-            peak = nb_atoms * amp * norm.pdf(x, loc=pos, scale=fwhm / 2.355) * 5e4
-            y += peak
-            for i in range(len(x)):
-                if peak[i] > 1e-3:
-                    atoms_ids[i].update(atom_ids)
+    # Lines are unimodal, so the points above threshold form one contiguous run
+    above = np.flatnonzero(values > ATOM_ID_THRESHOLD)
+    if len(above):
+        above_lines = line_idx[above]
+        tagged, first = np.unique(above_lines, return_index=True)
+        last = len(above) - 1 - np.unique(above_lines[::-1], return_index=True)[1]
+        starts[tagged] = point_idx[above[first]]
+        stops[tagged] = point_idx[above[last]] + 1
 
-    return x, y, atoms_ids
+    if descending:
+        y = y[::-1]
+        starts, stops = n_points - stops, n_points - starts
+
+    return y, starts, stops
+
+
+GRID_MODES = ("uniform", "adaptive")
+
+# Adaptive grid: spacing of the dense zones around each line, and number of
+# points spread uniformly over the whole range to draw the baseline
+DEFAULT_POINTS_PER_FWHM = 8
+ADAPTIVE_BASELINE_POINTS = 1000
+
+
+def adaptive_grid(
+    positions,
+    fwhm,
+    ppm_range,
+    points_per_fwhm=DEFAULT_POINTS_PER_FWHM,
+    window=DEFAULT_WINDOW_IN_FWHM["gaussian"],
+    baseline_points=ADAPTIVE_BASELINE_POINTS,
+):
+    # Points every fwhm / points_per_fwhm within ``window`` FWHM of each line,
+    # plus a coarse uniform baseline. Returned in decreasing ppm order like the
+    # uniform grid.
+    low, high = min(ppm_range), max(ppm_range)
+    baseline = np.linspace(low, high, baseline_points)
+    if len(positions) == 0:
+        return baseline[::-1]
+
+    step = fwhm / points_per_fwhm
+    half_width = window * fwhm
+    order = np.argsort(positions)
+    starts = np.clip(positions[order] - half_width, low, high)
+    stops = np.clip(positions[order] + half_width, low, high)
+
+    # Merge overlapping dense zones
+    reach = np.maximum.accumulate(stops)
+    new_zone = np.ones(len(starts), dtype=bool)
+    new_zone[1:] = starts[1:] > reach[:-1]
+    zone_starts = starts[new_zone]
+    zone_stops = reach[np.append(np.flatnonzero(new_zone)[1:], len(starts)) - 1]
+
+    counts = np.floor((zone_stops - zone_starts) / step).astype(int) + 1
+    first_slot = np.cumsum(counts) - counts
+    steps = np.arange(counts.sum()) - np.repeat(first_slot, counts)
+    dense = np.repeat(zone_starts, counts) + steps * step
+
+    return np.unique(np.concatenate((baseline, dense, zone_stops)))[::-1]
+
+
+def line_window_points(
+    fwhm,
+    ppm_range,
+    resolution=DEFAULT_RESOLUTION,
+    grid_mode="uniform",
+    points_per_fwhm=DEFAULT_POINTS_PER_FWHM,
+    window=DEFAULT_WINDOW_IN_FWHM["gaussian"],
+):
+    # Upper bound of the number of grid points a line is evaluated on
+    width = max(ppm_range) - min(ppm_range)
+    half_width = window * fwhm
+    if grid_mode == "adaptive":
+        dense = 2 * window * points_per_fwhm
+        baseline = ADAPTIVE_BASELINE_POINTS * 2 * half_width / width
+        return int(dense + baseline) + 3
+    return min(resolution, int(2 * half_width * (resolution - 1) / width) + 2)
+
+
+def simulate_spectrum(
+    associations,
+    fwhm=0.004,
+    ppm_range=(0, 250),
+    resolution=64000,
+    line_shape="gaussian",
+    window=None,
+    dtype=np.float64,
+    eta=0.5,
+    grid_mode="uniform",
+    points_per_fwhm=DEFAULT_POINTS_PER_FWHM,
+    spectrometer_freq=DEFAULT_SPECTROMETER_FREQ,
+):
+    positions, amplitudes, owners = collect_lines(associations, spectrometer_freq)
+    if grid_mode == "adaptive":
+        x = adaptive_grid(
+            positions,
+            fwhm,
+            ppm_range,
+            points_per_fwhm,
+            window if window is not None else DEFAULT_WINDOW_IN_FWHM[line_shape],
+        )
+    elif grid_mode == "uniform":
+        x = np.linspace(ppm_range[1], ppm_range[0], resolution)
+    else:
+        raise ValueError(f"Unknown grid mode: {grid_mode}")
+
+    y, starts, stops = render_lines(
+        x, positions, amplitudes, fwhm, line_shape, window, dtype, eta
+    )
+
+    annotations = AtomAnnotations.from_line_ranges(
+        x,
+        starts,
+        stops,
+        owners,
+        [assoc.get("atoms", []) for assoc in associations],
+    )
+
+    return x, y, annotations
+
+
+def render_spectrum(
+    peaks,
+    ppm_range,
+    fwhm=DEFAULT_FWHM,
+    resolution=DEFAULT_RESOLUTION,
+    spectrometer_freq=DEFAULT_SPECTROMETER_FREQ,
+    max_points=None,
+    tolerance=None,
+    grid_mode="uniform",
+    points_per_fwhm=DEFAULT_POINTS_PER_FWHM,
+):
+    # Spectrum of merged peaks as sent to the client: simulated, without the
+    # inner points of flat zero runs, then decimated if asked
+    x, y, annotations = simulate_spectrum(
+        peaks,
+        fwhm,
+        ppm_range,
+        resolution,
+        grid_mode=grid_mode,
+        points_per_fwhm=points_per_fwhm,
+        spectrometer_freq=spectrometer_freq,
+    )
+    x, y, annotations = compress_spectrum_points_zero_segments(x, y, annotations)
+    if max_points is not None or tolerance is not None:
+        kept = decimate_spectrum(x, y, max_points, tolerance)
+        x, y = x[kept], y[kept]
+    return x, y, annotations
+
+
+def parse_grid_parameters(parameters):
+    grid_mode = parameters.get("gridMode") or "uniform"
+    if grid_mode not in GRID_MODES:
+        raise ValueError(f"Invalid 'gridMode': {grid_mode}")
+
+    points_per_fwhm = parameters.get("pointsPerFwhm")
+    if points_per_fwhm in (None, ""):
+        return grid_mode, DEFAULT_POINTS_PER_FWHM
+    try:
+        points_per_fwhm = int(points_per_fwhm)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid 'pointsPerFwhm': {points_per_fwhm}")
+    if not 2 <= points_per_fwhm <= 100:
+        raise ValueError("'pointsPerFwhm' must be between 2 and 100")
+
+    return grid_mode, points_per_fwhm
 
 
 def compress_spectrum_points_zero_segments(x, y, atoms_ids):
@@ -110,6 +450,39 @@ def compress_spectrum_points_zero_segments(x, y, atoms_ids):
     indices_sorted = sorted(keep_indices)
     x_comp = x[indices_sorted]
     y_comp = y[indices_sorted]
+
+    # Interval annotations are expressed in ppm and stay valid on any subset of
+    # the grid; only legacy per-point lists need to be filtered.
+    if isinstance(atoms_ids, AtomAnnotations):
+        return x_comp, y_comp, atoms_ids
     atoms_ids_comp = [atoms_ids[i] for i in indices_sorted]
 
     return x_comp, y_comp, atoms_ids_comp
+
+
+def spectrum_to_points(x, y, annotations, atom_id_format="points"):
+    if atom_id_format == "intervals":
+        return [
+            {"ppm": float(ppm), "intensity": float(intens)} for ppm, intens in zip(x, y)
+        ]
+
+    return [
+        {"ppm": float(ppm), "intensity": float(intens), "atomID": atom_ids}
+        for ppm, intens, atom_ids in zip(x, y, annotations.for_points(x))
+    ]
+
+
+def prediction_to_json(prediction, atom_id_format="points"):
+    if "error" in prediction:
+        return prediction
+
+    result = {
+        "spectrum": spectrum_to_points(
+            prediction["x"], prediction["y"], prediction["annotations"], atom_id_format
+        ),
+        "peaksInfos": prediction["peaksInfos"],
+    }
+    if atom_id_format == "intervals":
+        result["atomIntervals"] = prediction["annotations"].to_json()
+
+    return result
@@ -0,0 +1,206 @@
+import threading
+import time
+from collections import deque
+from app.config import Config
+from app.api.services.logger import log_with_time
+
+# Concurrent requests of a nucleus hand their feature rows to one scheduler
+# thread, which waits up to Config.MICRO_BATCH_MAX_WAIT_IN_MS after the oldest
+# queued request (or until Config.MICRO_BATCH_MAX_ROWS rows are queued), runs
+# the forests once over all of them and gives each request its own slice.
+# Requests queued while a batch runs join the next one, so even with a zero
+# wait a busy server batches.
+HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+micro_batchers = {}
+
+
+def histogram():
+    return [0] * (len(HISTOGRAM_BUCKETS) + 1)
+
+
+def record(counts, value):
+    for i, bound in enumerate(HISTOGRAM_BUCKETS):
+        if value <= bound:
+            counts[i] += 1
+            return
+    counts[-1] += 1
+
+
+def histogram_json(counts):
+    # Buckets in order; the last one (upTo null) counts the larger values
+    bounds = list(HISTOGRAM_BUCKETS) + [None]
+    return [{"upTo": bound, "count": count} for bound, count in zip(bounds, counts)]
+
+
+class BatchRequest:
+    def __init__(self, model, X_list, heavy_atom_idx_lists):
+        self.model = model
+        self.X_list = X_list
+        self.heavy_atom_idx_lists = heavy_atom_idx_lists
+        self.rows = sum(len(X) for X in X_list)
+        self.queued_at = time.perf_counter()
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    def __init__(self, nucleus, predict_associations_batch):
+        self.nucleus = nucleus
+        self.predict_associations_batch = predict_associations_batch
+        self.queue = deque()
+        self.queued_rows = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.reset_stats()
+        micro_batchers[nucleus] = self
+
+    def reset_stats(self):
+        with self.condition:
+            self.requests = 0
+            self.batches = 0
+            self.batched_requests = 0
+            self.direct_requests = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.queue_depths = histogram()
+            self.batch_requests = histogram()
+            self.batch_rows = histogram()
+
+    def predict(self, model, X_list, heavy_atom_idx_lists):
+        # Same result as predict_associations_batch(model, X_list, ...)
+        request = BatchRequest(model, X_list, heavy_atom_idx_lists)
+        if not Config.MICRO_BATCHING or request.rows >= Config.MICRO_BATCH_MAX_ROWS:
+            # Already a full batch (e.g. the batch endpoint), no need to queue
+            with self.condition:
+                self.direct_requests += 1
+            return self.predict_associations_batch(model, X_list, heavy_atom_idx_lists)
+
+        with self.condition:
+            self.queue.append(request)
+            self.queued_rows += request.rows
+            self.requests += 1
+            record(self.queue_depths, len(self.queue))
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run,
+                    name=f"micro-batch-{self.nucleus}",
+                    daemon=True,
+                )
+                self.thread.start()
+            self.condition.notify()
+
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            try:
+                self.run_batch(batch)
+            except Exception as e:
+                log_with_time(f"Micro-batch of {self.nucleus} predictions failed: {e}")
+                for request in batch:
+                    if request.result is None and request.error is None:
+                        request.error = e
+            for request in batch:
+                request.done.set()
+
+    def next_batch(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.queue)
+            deadline = (
+                self.queue[0].queued_at + Config.MICRO_BATCH_MAX_WAIT_IN_MS / 1000
+            )
+            while self.queued_rows < Config.MICRO_BATCH_MAX_ROWS:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+
+            # Requests queued before a model reload keep their own model
+            batch = [self.queue.popleft()]
+            rows = batch[0].rows
+            while (
+                self.queue
+                and self.queue[0].model is batch[0].model
+                and rows + self.queue[0].rows <= Config.MICRO_BATCH_MAX_ROWS
+            ):
+                rows += self.queue[0].rows
+                batch.append(self.queue.popleft())
+            self.queued_rows -= rows
+
+            started = time.perf_counter()
+            self.batches += 1
+            self.batched_requests += len(batch)
+            record(self.batch_requests, len(batch))
+            record(self.batch_rows, rows)
+            for request in batch:
+                waited = started - request.queued_at
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            return batch
+
+    def run_batch(self, batch):
+        X_list = [X for request in batch for X in request.X_list]
+        heavy_atom_idx_lists = [
+            idx for request in batch for idx in request.heavy_atom_idx_lists
+        ]
+        try:
+            associations = self.predict_associations_batch(
+                batch[0].model, X_list, heavy_atom_idx_lists
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+                return
+            # Run the requests one by one so an error only fails its own
+            log_with_time(f"Micro-batch failed, retrying per request: {e}")
+            for request in batch:
+                self.run_batch([request])
+            return
+
+        start = 0
+        for request in batch:
+            stop = start + len(request.X_list)
+            request.result = associations[start:stop]
+            start = stop
+
+    def stats(self):
+        with self.condition:
+            return {
+                "requests": self.requests,
+                "directRequests": self.direct_requests,
+                "batches": self.batches,
+                "meanRequestsPerBatch": (
+                    self.batched_requests / self.batches if self.batches else 0.0
+                ),
+                "meanWaitMs": (
+                    self.wait_seconds * 1000 / self.batched_requests
+                    if self.batched_requests
+                    else 0.0
+                ),
+                "maxWaitMs": self.max_wait_seconds * 1000,
+                "queueDepth": len(self.queue),
+                "queueDepthHistogram": histogram_json(self.queue_depths),
+                "batchRequestsHistogram": histogram_json(self.batch_requests),
+                "batchRowsHistogram": histogram_json(self.batch_rows),
+            }
+
+
+def micro_batching_stats():
+    return {
+        "enabled": Config.MICRO_BATCHING,
+        "maxWaitMs": Config.MICRO_BATCH_MAX_WAIT_IN_MS,
+        "maxRows": Config.MICRO_BATCH_MAX_ROWS,
+        "nuclei": {
+            nucleus: batcher.stats() for nucleus, batcher in micro_batchers.items()
+        },
+    }
+
+
+def reset_micro_batching_stats():
+    for batcher in micro_batchers.values():
+        batcher.reset_stats()
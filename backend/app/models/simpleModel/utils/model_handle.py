@@ -0,0 +1,119 @@
+import threading
+import time
+from app.config import Config
+from app.api.services.logger import log_with_time
+from app.models.simpleModel.utils.prediction_cache import (
+    model_version,
+    prediction_cache,
+)
+from app.models.simpleModel.utils.packed_forest import load_model
+
+# Models are loaded on a background thread, either at startup (warm_up_models)
+# or on the first request that needs them. Requests wait for a model that is
+# still loading, up to Config.MODEL_LOAD_TIMEOUT_IN_SECONDS. A model whose
+# file changes is reloaded and its cached predictions are dropped.
+model_handles = {}
+
+
+class ModelHandle:
+    def __init__(self, nucleus, path):
+        self.nucleus = nucleus
+        self.path = path
+        self.state = "not_loaded"
+        self.model = None
+        self.version = None
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.attempted_version = None
+        self.condition = threading.Condition()
+        model_handles[nucleus] = self
+
+    def start_loading(self):
+        with self.condition:
+            self._start_loading()
+
+    def _start_loading(self):
+        if self.state == "loading":
+            return
+        self.state = "loading"
+        self.attempted_version = model_version(self.path)
+        threading.Thread(
+            target=self._load,
+            args=(self.attempted_version,),
+            name=f"load-model-{self.nucleus}",
+            daemon=True,
+        ).start()
+
+    def _load(self, version):
+        log_with_time(f"Loading the {self.nucleus} model from {self.path}")
+        start = time.perf_counter()
+        try:
+            model = load_model(self.path)
+        except Exception as e:
+            log_with_time(f"Could not load the {self.nucleus} model: {e}")
+            with self.condition:
+                self.state = "failed"
+                self.error = str(e)
+                self.condition.notify_all()
+            return
+
+        elapsed = time.perf_counter() - start
+        log_with_time(f"{self.nucleus} model loaded in {elapsed:.2f} s")
+        with self.condition:
+            self.model = model
+            self.version = version
+            self.state = "ready"
+            self.error = None
+            self.load_seconds = elapsed
+            self.loaded_at = time.time()
+            self.condition.notify_all()
+        prediction_cache.invalidate(self.nucleus, version)
+
+    def get(self, timeout=None):
+        # Returns (model, version), loading or reloading the model if needed.
+        # Raises TimeoutError if it is not ready in time, RuntimeError if it
+        # could not be loaded.
+        if timeout is None:
+            timeout = Config.MODEL_LOAD_TIMEOUT_IN_SECONDS
+        version = model_version(self.path)
+        with self.condition:
+            if self.state == "ready" and version not in (None, self.version):
+                log_with_time(f"Model file changed, reloading {self.path}")
+                self._start_loading()
+            elif self.state == "not_loaded" or (
+                self.state == "failed" and version != self.attempted_version
+            ):
+                self._start_loading()
+
+            if self.model is None:
+                self.condition.wait_for(lambda: self.state != "loading", timeout)
+                if self.state == "loading":
+                    raise TimeoutError(
+                        f"The {self.nucleus} model is still loading, "
+                        f"try again later"
+                    )
+                if self.state == "failed":
+                    raise RuntimeError(f"The {self.nucleus} model could not be loaded")
+
+            # While a changed file reloads, the previous model keeps answering
+            return self.model, self.version
+
+    def status(self):
+        with self.condition:
+            return {
+                "state": self.state,
+                "version": self.version,
+                "loadSeconds": self.load_seconds,
+                "loadedAt": self.loaded_at,
+                "error": self.error,
+            }
+
+
+def warm_up_models():
+    for handle in model_handles.values():
+        handle.start_loading()
+
+
+def model_states():
+    return {nucleus: handle.status() for nucleus, handle in model_handles.items()}
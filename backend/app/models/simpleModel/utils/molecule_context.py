@@ -0,0 +1,70 @@
+import numpy as np
+from rdkit import Chem
+from rdkit.Chem import rdPartialCharges
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+
+
+# Whole-molecule data shared by all per-atom features, computed once per
+# molecule instead of once per atom or per hydrogen group.
+class MoleculeContext:
+    def __init__(self, mol):
+        self.mol = mol
+        atoms = list(mol.GetAtoms())
+
+        self.atomic_nums = np.array([a.GetAtomicNum() for a in atoms], dtype=int)
+        self.is_aromatic = np.array([a.GetIsAromatic() for a in atoms], dtype=bool)
+        self.in_ring = np.array([a.IsInRing() for a in atoms], dtype=bool)
+        self.adjacency = Chem.GetAdjacencyMatrix(mol)
+
+        # Topological distances, with -1 for atoms in different fragments as
+        # GetShortestPath reports them (empty path). Same values as
+        # Chem.GetDistanceMatrix, but a BFS per atom scales far better than its
+        # all-pairs algorithm on large molecules with explicit hydrogens.
+        distances = shortest_path(
+            csr_matrix(self.adjacency), directed=False, unweighted=True
+        )
+        self.distance_matrix = np.where(np.isinf(distances), -1, distances).astype(int)
+
+        self.symmetry_ranks = np.array(
+            list(Chem.CanonicalRankAtoms(mol, breakTies=False)), dtype=int
+        )
+
+        if not mol.HasProp("_GasteigerChargesComputed"):
+            rdPartialCharges.ComputeGasteigerCharges(mol)
+            mol.SetProp("_GasteigerChargesComputed", "1")
+        self.charges = np.array([self._charge(a) for a in atoms], dtype=float)
+
+        # Hydrogen -> index of the atom carrying it (-1 for heavy atoms)
+        self.hydrogen_parent = np.full(len(atoms), -1, dtype=int)
+        for atom in atoms:
+            if atom.GetAtomicNum() == 1:
+                self.hydrogen_parent[atom.GetIdx()] = atom.GetNeighbors()[0].GetIdx()
+
+    @staticmethod
+    def _charge(atom):
+        try:
+            return float(atom.GetProp("_GasteigerCharge"))
+        except:
+            return 0.0
+
+    @property
+    def hydrogen_indices(self):
+        return np.flatnonzero(self.atomic_nums == 1)
+
+
+def masked_row_min(values, mask, default=-1):
+    # Row-wise minimum of values where mask is set, default for empty rows
+    masked = np.where(mask, values, np.iinfo(values.dtype).max)
+    minima = masked.min(axis=1) if masked.shape[1] else np.full(len(masked), default)
+    return np.where(mask.any(axis=1), minima, default)
+
+
+def features_in_input_order(features, to_input):
+    # Featurizers run on canonically numbered molecules; maps heavy_atom_idx
+    # back to the caller's SMILES and restores input atom order
+    if features.empty:
+        return features.copy()
+    features = features.copy()
+    features["heavy_atom_idx"] = to_input[features["heavy_atom_idx"].to_numpy()]
+    return features.sort_values("heavy_atom_idx", kind="stable").reset_index(drop=True)
@@ -0,0 +1,100 @@
+import threading
+from functools import lru_cache
+import numpy as np
+from rdkit import Chem
+from rdkit.Chem import rdPartialCharges
+from app.config import Config
+
+# Kekulé conversion, the atom-ID image and both featurizers share one
+# PreparedMolecule per structure: it is parsed once, kept in a bounded cache
+# keyed by canonical SMILES, and derives everything else (hydrogens,
+# Kekulé forms, featurizer data) lazily, once. Prepared molecules use
+# canonical atom numbering; prepare_smiles also returns, for each canonical
+# atom, its index in the caller's SMILES.
+
+
+class PreparedMolecule:
+    def __init__(self, canonical_smiles):
+        self.canonical_smiles = canonical_smiles
+        self.mol = Chem.MolFromSmiles(canonical_smiles)
+        if self.mol is None:
+            raise ValueError(f"Could not parse canonical SMILES: {canonical_smiles}")
+        self.derived = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def derive(self, name, build):
+        # Builds a value once per molecule; failures are kept and re-raised.
+        # Callers must not modify the returned objects.
+        with self.lock:
+            lock = self.locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self.derived:
+                try:
+                    self.derived[name] = (build(), None)
+                except Exception as e:
+                    self.derived[name] = (None, e)
+        value, error = self.derived[name]
+        if error is not None:
+            raise error
+        return value
+
+    def hydrogenated(self):
+        # Gasteiger charges are the same on the aromatic and Kekulé forms, so
+        # they are computed once here and copied along with the molecule
+        def build():
+            mol = Chem.AddHs(self.mol)
+            rdPartialCharges.ComputeGasteigerCharges(mol)
+            mol.SetProp("_GasteigerChargesComputed", "1")
+            return mol
+
+        return self.derive("hydrogenated", build)
+
+    def kekule(self):
+        def build():
+            mol = Chem.Mol(self.mol)
+            Chem.Kekulize(mol, clearAromaticFlags=True)
+            return mol
+
+        return self.derive("kekule", build)
+
+    def kekule_smiles(self):
+        return self.derive(
+            "kekule_smiles",
+            lambda: Chem.MolToSmiles(self.kekule(), canonical=True, kekuleSmiles=True),
+        )
+
+
+@lru_cache(maxsize=Config.MOLECULE_CACHE_SIZE * 4)
+def canonical_numbering(smiles):
+    # Returns the canonical SMILES and, for each canonical atom, the index of
+    # the same atom in the input SMILES
+    mol = Chem.MolFromSmiles(smiles)
+    if mol is None:
+        return None, None
+    canonical = Chem.MolToSmiles(mol)
+    output_order = mol.GetPropsAsDict(True, True)["_smilesAtomOutputOrder"]
+    to_input = np.array(list(output_order), dtype=int)
+    to_input.flags.writeable = False
+    return canonical, to_input
+
+
+@lru_cache(maxsize=Config.MOLECULE_CACHE_SIZE)
+def prepared_molecule(canonical_smiles):
+    return PreparedMolecule(canonical_smiles)
+
+
+def prepare_smiles(smiles):
+    # (PreparedMolecule, canonical -> input atom indices), or (None, None)
+    # for a SMILES RDKit cannot parse
+    canonical, to_input = canonical_numbering(smiles)
+    if canonical is None:
+        return None, None
+    return prepared_molecule(canonical), to_input
+
+
+def to_canonical_order(to_input):
+    # Inverse permutation: input atom index -> canonical atom index
+    to_canonical = np.empty_like(to_input)
+    to_canonical[to_input] = np.arange(len(to_input))
+    return to_canonical
@@ -0,0 +1,173 @@
+import numpy as np
+from app.models.simpleModel.utils.draw_peaks_and_spectrum import (
+    render_spectrum,
+    prediction_to_json,
+    DEFAULT_POINTS_PER_FWHM,
+    PPM_RANGES,
+)
+from app.models.simpleModel.utils.atom_annotations import AtomAnnotations
+from app.models.simpleModel.utils.peak_merging import (
+    collapse_identical_peaks,
+    peaks_infos,
+)
+from app.models.simpleModel.utils.prediction_cache import prediction_cache
+from app.models.simpleModel.utils.model_handle import ModelHandle
+from app.models.simpleModel.utils.micro_batching import MicroBatcher
+from app.models.simpleModel.utils.process_pool import compute_isolated
+from app.api.services.logger import log_with_time
+
+# The prediction pipeline shared by the simple models: featurization,
+# forests (through the nucleus' micro-batcher), peak merging and rendering.
+# Each predictor module (H/simpleModel_predict_1h_v3.py, ...) creates one
+# NucleusPredictor with its model file, featurizer and forest inference.
+
+
+class NucleusPredictor:
+    def __init__(
+        self,
+        nucleus,
+        model_path,
+        extract_features_from_smiles,
+        predict_associations_batch,
+        featurized_atoms,
+    ):
+        # featurized_atoms names the rows of the features (e.g. "H groups")
+        # in the log of a molecule that has none
+        self.nucleus = nucleus
+        self.extract_features_from_smiles = extract_features_from_smiles
+        self.featurized_atoms = featurized_atoms
+        self.error = f"Error during the {nucleus} prediction"
+        self.model = ModelHandle(nucleus, model_path)
+        self.batcher = MicroBatcher(nucleus, predict_associations_batch)
+
+    def predict_spectrum(
+        self,
+        smiles,
+        max_points=None,
+        tolerance=None,
+        grid_mode="uniform",
+        points_per_fwhm=DEFAULT_POINTS_PER_FWHM,
+    ):
+        render_options = {
+            "max_points": max_points,
+            "tolerance": tolerance,
+            "grid_mode": grid_mode,
+            "points_per_fwhm": points_per_fwhm,
+        }
+        try:
+            _, version = self.model.get()
+        except (TimeoutError, RuntimeError) as e:
+            log_with_time(str(e))
+            return {"error": str(e)}
+
+        return prediction_cache.cached_prediction(
+            smiles,
+            self.nucleus,
+            version,
+            render_options,
+            lambda: compute_isolated(
+                self.nucleus, self.compute_spectrum, smiles, render_options
+            ),
+        )
+
+    def compute_spectrum(self, smiles, **render_options):
+        try:
+            feats_df = self.extract_features_from_smiles(smiles)
+        except Exception as e:
+            log_with_time(f"Error during the processing of the SMILES: {e}")
+            return {"error": self.error}
+
+        return self.predict_spectra([(smiles, feats_df)], **render_options)[0]
+
+    def predict_spectra(self, items, peaks_only=False, **render_options):
+        # items are (smiles, features) pairs; the forests run once for all of
+        # them
+        try:
+            model, _ = self.model.get()
+        except (TimeoutError, RuntimeError) as e:
+            log_with_time(str(e))
+            return [{"error": str(e)}] * len(items)
+
+        predictions = [None] * len(items)
+        positions, X_list, heavy_atom_idx_lists = [], [], []
+        for i, (smiles, feats_df) in enumerate(items):
+            if feats_df.empty:
+                log_with_time(
+                    f"No {self.featurized_atoms} detected in the SMILES : {smiles}"
+                )
+                predictions[i] = self.empty_prediction(peaks_only)
+                continue
+            positions.append(i)
+            X_list.append(feats_df.drop(columns=["heavy_atom_idx"]))
+            heavy_atom_idx_lists.append(feats_df["heavy_atom_idx"].tolist())
+
+        try:
+            associations = self.batcher.predict(model, X_list, heavy_atom_idx_lists)
+        except Exception as e:
+            if len(positions) == 1:
+                log_with_time(f"Error during the processing of the SMILES: {e}")
+                predictions[positions[0]] = {"error": self.error}
+                return predictions
+
+            # Retry one molecule at a time so a bad row only fails its molecule
+            log_with_time(f"Batch prediction failed, retrying per molecule: {e}")
+            for i in positions:
+                retried = self.predict_spectra([items[i]], peaks_only, **render_options)
+                predictions[i] = retried[0]
+            return predictions
+
+        for i, associations_pred in zip(positions, associations):
+            try:
+                predictions[i] = self.render_associations(
+                    associations_pred, peaks_only, **render_options
+                )
+            except Exception as e:
+                log_with_time(f"Error during the processing of the SMILES: {e}")
+                predictions[i] = {"error": self.error}
+
+        return predictions
+
+    def empty_prediction(self, peaks_only=False):
+        if peaks_only:
+            return {"peaksInfos": []}
+        return {
+            "x": np.array(PPM_RANGES[self.nucleus], dtype=float),
+            "y": np.zeros(2),
+            "annotations": AtomAnnotations.empty(),
+            "peaksInfos": [],
+        }
+
+    def render_associations(
+        self,
+        associations_pred,
+        peaks_only=False,
+        max_points=None,
+        tolerance=None,
+        grid_mode="uniform",
+        points_per_fwhm=DEFAULT_POINTS_PER_FWHM,
+    ):
+        merged_peaks = collapse_identical_peaks(associations_pred)
+        peaksInfos = peaks_infos(merged_peaks)
+
+        if peaks_only:
+            return {"peaksInfos": peaksInfos}
+
+        x, y, annotations = render_spectrum(
+            merged_peaks,
+            PPM_RANGES[self.nucleus],
+            max_points=max_points,
+            tolerance=tolerance,
+            grid_mode=grid_mode,
+            points_per_fwhm=points_per_fwhm,
+        )
+        return {
+            "x": x,
+            "y": y,
+            "annotations": annotations,
+            "peaksInfos": peaksInfos,
+        }
+
+    def predict(self, smiles, atom_id_format="points", **render_options):
+        return prediction_to_json(
+            self.predict_spectrum(smiles, **render_options), atom_id_format
+        )
@@ -0,0 +1,224 @@
+import threading
+import numpy as np
+from joblib import dump, load
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.multioutput import MultiOutputRegressor
+
+# The training script saves the forests as flat node arrays instead of
+# scikit-learn trees (whose unpickling copies every node into private
+# memory). The file is written uncompressed and loaded with mmap_mode, so
+# all worker processes share its read-only pages through the OS page cache.
+# Models saved by scikit-learn directly are packed when first used.
+FOREST_KEYS = ("reg_ppm", "clf_multiplicity", "reg_couplings")
+TREE_LEAF = -1
+PICKLE_PROTO = b"\x80"
+ROW_CHUNK = 512
+
+engine_lock = threading.Lock()
+
+
+class ForestEngine:
+    # Every tree of every forest of a model in one set of node arrays, walked
+    # in a single pass over rows and trees. Predictions match the
+    # estimators' predict exactly: float32 inputs, the same split tests,
+    # classifier probabilities normalized per tree, and tree outputs added
+    # in forest order.
+    def __init__(self, estimators):
+        forests = []
+        self.outputs = {}
+        for name, estimator in estimators.items():
+            multi_output = isinstance(estimator, MultiOutputRegressor)
+            members = estimator.estimators_ if multi_output else [estimator]
+            self.outputs[name] = (
+                len(forests),
+                len(forests) + len(members),
+                multi_output,
+            )
+            forests.extend(members)
+
+        for forest in forests:
+            if forest.n_outputs_ != 1:
+                raise ValueError("Only single-output forests can be packed")
+
+        trees = [
+            estimator.tree_ for forest in forests for estimator in forest.estimators_
+        ]
+        node_offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        self.roots = node_offsets[:-1]
+        self.forest_trees = np.cumsum([0] + [len(f.estimators_) for f in forests])
+        self.forest_nodes = node_offsets[self.forest_trees]
+
+        # Leaves loop back to themselves and have feature -1, so pairs that
+        # reached a leaf can stay in the traversal until they are dropped
+        self.children = np.concatenate(
+            [
+                pack_children(t.children_left, t.children_right, o)
+                for t, o in zip(trees, node_offsets)
+            ]
+        )
+        self.feature = np.concatenate(
+            [np.where(t.children_left == TREE_LEAF, -1, t.feature) for t in trees]
+        ).astype(np.int32)
+        self.threshold = np.concatenate([t.threshold for t in trees])
+        self.missing_go_to_left = np.concatenate([missing_go_to_left(t) for t in trees])
+
+        self.values = [forest_values(forest) for forest in forests]
+        self.classes = [
+            forest.classes_ if isinstance(forest, RandomForestClassifier) else None
+            for forest in forests
+        ]
+
+    def leaves(self, X, first_tree, last_tree):
+        # Leaf reached by each (row, tree), all pairs advancing one level per
+        # step; pairs already on a leaf are dropped once they make up a
+        # quarter of those left
+        n_trees = last_tree - first_tree
+        X_flat = X.reshape(-1)
+        has_nan = np.isnan(X_flat).any()
+        children = self.children.reshape(-1)
+        leaves = np.empty(len(X) * n_trees, dtype=np.int32)
+
+        node = np.tile(self.roots[first_tree:last_tree].astype(np.int32), len(X))
+        position = np.arange(len(leaves))
+        offset = np.repeat(np.arange(len(X)) * X.shape[1], n_trees)
+        feature = self.feature.take(node)
+        while True:
+            done = feature < 0
+            n_done = np.count_nonzero(done)
+            if n_done == len(node):
+                leaves[position] = node
+                return leaves.reshape(len(X), n_trees)
+            if n_done * 4 > len(node):
+                leaves[position[done]] = node[done]
+                keep = ~done
+                node, position = node[keep], position[keep]
+                offset, feature = offset[keep], feature[keep]
+
+            # take on flat arrays is much cheaper than fancy indexing here
+            values = X_flat.take(offset + feature)
+            go_right = ~(values <= self.threshold.take(node))
+            if has_nan:
+                go_right &= ~(np.isnan(values) & self.missing_go_to_left.take(node))
+            node = children.take(2 * node + go_right)
+            feature = self.feature.take(node)
+
+    def forest_predictions(self, leaves, first_tree, forest):
+        start, stop = self.forest_trees[forest], self.forest_trees[forest + 1]
+        forest_leaves = leaves[:, start - first_tree : stop - first_tree]
+        values = self.values[forest][forest_leaves - self.forest_nodes[forest]]
+        # cumsum adds the trees one after the other, in the forest's order
+        total = np.cumsum(values, axis=1)[:, -1]
+        total /= stop - start
+        classes = self.classes[forest]
+        if classes is None:
+            return total[:, 0]
+        return classes.take(np.argmax(total, axis=1), axis=0)
+
+    def predict(self, X, names=None):
+        # {output name: predictions} for the given outputs (all by default).
+        # Symmetric atoms have identical feature rows: each distinct row is
+        # evaluated once and its predictions copied back to the others.
+        X = np.asarray(X, dtype=np.float32)
+        distinct, first_rows = {}, []
+        inverse = np.empty(len(X), dtype=np.intp)
+        for i, row in enumerate(X):
+            key = row.tobytes()
+            if key not in distinct:
+                distinct[key] = len(first_rows)
+                first_rows.append(i)
+            inverse[i] = distinct[key]
+        if len(first_rows) == len(X):
+            return self.predict_rows(X, names)
+
+        predictions = self.predict_rows(X[first_rows], names)
+        return {
+            name: value.take(inverse, axis=0) for name, value in predictions.items()
+        }
+
+    def predict_rows(self, X, names=None):
+        names = list(self.outputs) if names is None else names
+        first_forest = min(self.outputs[name][0] for name in names)
+        last_forest = max(self.outputs[name][1] for name in names)
+        first_tree = self.forest_trees[first_forest]
+        last_tree = self.forest_trees[last_forest]
+
+        forest_outputs = {forest: [] for forest in range(first_forest, last_forest)}
+        for start in range(0, max(len(X), 1), ROW_CHUNK):
+            leaves = self.leaves(X[start : start + ROW_CHUNK], first_tree, last_tree)
+            for forest, chunks in forest_outputs.items():
+                chunks.append(self.forest_predictions(leaves, first_tree, forest))
+
+        predictions = {}
+        for name in names:
+            first, last, multi_output = self.outputs[name]
+            columns = [np.concatenate(forest_outputs[f]) for f in range(first, last)]
+            predictions[name] = np.asarray(columns).T if multi_output else columns[0]
+        return predictions
+
+
+class ForestOutput:
+    # Stands in for one packed estimator (e.g. model_dict["reg_ppm"])
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.name = name
+
+    def predict(self, X):
+        return self.engine.predict(X, [self.name])[self.name]
+
+
+def pack_children(left, right, offset):
+    leaf = left == TREE_LEAF
+    nodes = np.arange(len(left))
+    children = np.column_stack(
+        [np.where(leaf, nodes, left), np.where(leaf, nodes, right)]
+    )
+    return (children + offset).astype(np.int32)
+
+
+def missing_go_to_left(tree):
+    if hasattr(tree, "missing_go_to_left"):
+        return np.asarray(tree.missing_go_to_left, dtype=bool)
+    return np.zeros(tree.node_count, dtype=bool)
+
+
+def forest_values(forest):
+    # Per-node outputs; class probabilities are normalized like
+    # DecisionTreeClassifier.predict_proba
+    values = []
+    for estimator in forest.estimators_:
+        if isinstance(forest, RandomForestClassifier):
+            proba = estimator.tree_.value[:, 0, : forest.n_classes_].copy()
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(proba / normalizer)
+        else:
+            values.append(estimator.tree_.value[:, 0, :])
+    return np.concatenate(values)
+
+
+def pack_model(model_dict):
+    forests = {key: model_dict[key] for key in FOREST_KEYS if key in model_dict}
+    engine = ForestEngine(forests)
+    packed = {key: ForestOutput(engine, key) for key in forests}
+    return {**model_dict, **packed, "forest_engine": engine}
+
+
+def forest_engine(model_dict):
+    # Models saved by scikit-learn are packed on first use, once
+    if "forest_engine" not in model_dict:
+        with engine_lock:
+            if "forest_engine" not in model_dict:
+                model_dict.update(pack_model(model_dict))
+    return model_dict["forest_engine"]
+
+
+def save_model(model_dict, path):
+    # Uncompressed so that load_model can memory-map the node arrays
+    dump(pack_model(model_dict), path)
+
+
+def load_model(path):
+    # Compressed files (saved by scikit-learn directly) cannot be mapped
+    with open(path, "rb") as f:
+        uncompressed = f.read(1) == PICKLE_PROTO
+    return load(path, mmap_mode="r" if uncompressed else None)
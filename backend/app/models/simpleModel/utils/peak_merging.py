@@ -0,0 +1,132 @@
+import numpy as np
+
+# Post-processing shared by the 1H and 13C predictors. Predicted shifts
+# closer than ppm_tol are merged into one group (merge_close_associations),
+# then peaks that are the same up to their atoms are collapsed
+# (collapse_identical_peaks) before rendering.
+
+
+def multiplicity_complexity(multiplicity):
+    if multiplicity is None:
+        return 0
+    return len(multiplicity)
+
+
+def merge_close_associations(associations, ppm_tol):
+    # Sorted by shift, each association joins the current group while it is
+    # within ppm_tol of the group's running weighted mean shift. A group
+    # counts its members' atoms (at least one each) and keeps the first of
+    # its most complex multiplicities, with its couplings. A group of one
+    # association is returned unchanged.
+    if not associations:
+        return []
+
+    ppm = np.fromiter((a["ppm"] for a in associations), float, len(associations))
+    order = np.argsort(ppm, kind="stable").tolist()
+    ppm = ppm.tolist()
+    weights = [a["nb_atoms"] or 1 for a in associations]
+
+    # Group boundaries and running means, on plain floats
+    starts, means, totals = [0], [ppm[order[0]]], [weights[order[0]]]
+    for position in range(1, len(order)):
+        i = order[position]
+        if abs(ppm[i] - means[-1]) < ppm_tol:
+            total = totals[-1] + weights[i]
+            means[-1] = (means[-1] * totals[-1] + ppm[i] * weights[i]) / total
+            totals[-1] = total
+        else:
+            starts.append(position)
+            means.append(ppm[i])
+            totals.append(weights[i])
+    starts.append(len(order))
+
+    merged = []
+    for group, (start, stop) in enumerate(zip(starts[:-1], starts[1:])):
+        members = [associations[i] for i in order[start:stop]]
+        if len(members) == 1:
+            merged.append({**members[0], "atoms": list(members[0]["atoms"])})
+            continue
+        complexities = [multiplicity_complexity(m["multiplicity"]) for m in members]
+        richest = members[complexities.index(max(complexities))]
+        merged.append(
+            {
+                **members[0],
+                "ppm": means[group],
+                "nb_atoms": totals[group],
+                "atoms": [atom for member in members for atom in member["atoms"]],
+                "multiplicity": richest["multiplicity"],
+                "couplings": richest["couplings"],
+            }
+        )
+    return merged
+
+
+def peak_key(peak):
+    return (
+        round(peak["ppm"], 6),
+        peak["nb_atoms"],
+        peak["multiplicity"],
+        tuple(peak["couplings"]),
+    )
+
+
+def collapse_identical_peaks(associations):
+    # Peaks with the same rounded shift, atom count, multiplicity and
+    # couplings become one peak with the union of their atoms, in shift order
+    collapsed = {}
+    for assoc in sorted(associations, key=lambda assoc: assoc["ppm"]):
+        key = peak_key(assoc)
+        if key in collapsed:
+            collapsed[key]["atoms"].update(assoc.get("atoms", []))
+        else:
+            collapsed[key] = {**assoc, "atoms": set(assoc.get("atoms", []))}
+
+    peaks = list(collapsed.values())
+    for peak in peaks:
+        peak["atoms"] = list(peak["atoms"])
+    return peaks
+
+
+def peaks_infos(peaks):
+    return [
+        {
+            "assignement": peak["atoms"],
+            "delta": peak["ppm"],
+            "nbAtoms": peak["nb_atoms"],
+            "multiplicity": peak["multiplicity"],
+            "coupling": peak["couplings"],
+        }
+        for peak in peaks
+    ]
+
+
+def peaks_from_infos(infos):
+    # Inverse of peaks_infos, for peak lists sent back by clients (simple
+    # models or external predictors). Raises ValueError on a malformed peak.
+    peaks = []
+    for i, info in enumerate(infos):
+        if not isinstance(info, dict):
+            raise ValueError(f"Invalid peak {i}: expected an object")
+        try:
+            ppm = float(info["delta"])
+            nb_atoms = info.get("nbAtoms")
+            nb_atoms = 1 if nb_atoms is None else float(nb_atoms)
+            couplings = [float(J) for J in info.get("coupling") or []]
+            atoms = [int(atom) for atom in info.get("assignement") or []]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Invalid peak {i}: {info}")
+        if not np.isfinite([ppm, nb_atoms, *couplings]).all():
+            raise ValueError(f"Invalid peak {i}: {info}")
+        multiplicity = info.get("multiplicity")
+        if multiplicity is not None and not isinstance(multiplicity, str):
+            raise ValueError(f"Invalid multiplicity in peak {i}: {multiplicity}")
+        peaks.append(
+            {
+                "ppm": ppm,
+                "nb_atoms": nb_atoms,
+                "multiplicity": multiplicity,
+                "couplings": couplings,
+                "atoms": atoms,
+            }
+        )
+    return peaks
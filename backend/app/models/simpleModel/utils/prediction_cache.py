@@ -0,0 +1,218 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from app.config import Config
+from app.models.simpleModel.utils.molecule_preparation import (
+    canonical_numbering,
+    to_canonical_order,
+)
+from app.models.simpleModel.utils.atom_annotations import AtomAnnotations
+
+# Predictions are keyed by (canonical SMILES, nucleus, model version, render
+# parameters) and stored with atom IDs in canonical atom order, so any SMILES
+# spelling of the same structure hits the same entry and gets its own atom
+# numbering back.
+ARRAY_FIELDS = ("ppm_min", "ppm_max", "peak_index", "atom_ids", "atom_offsets")
+
+
+def model_version(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def renumber_prediction(prediction, mapping):
+    return {
+        **prediction,
+        "annotations": prediction["annotations"].renumbered(mapping),
+        "peaksInfos": [
+            {**peak, "assignement": [int(mapping[a]) for a in peak["assignement"]]}
+            for peak in prediction["peaksInfos"]
+        ],
+    }
+
+
+def serialize_prediction(prediction):
+    annotations = prediction["annotations"]
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        x=prediction["x"],
+        y=prediction["y"],
+        **{field: getattr(annotations, field) for field in ARRAY_FIELDS},
+    )
+    return json.dumps(prediction["peaksInfos"]), buffer.getvalue()
+
+
+def deserialize_prediction(peaks, arrays):
+    with np.load(io.BytesIO(arrays), allow_pickle=False) as data:
+        annotations = AtomAnnotations(*(data[field] for field in ARRAY_FIELDS))
+        return {
+            "x": data["x"],
+            "y": data["y"],
+            "annotations": annotations,
+            "peaksInfos": json.loads(peaks),
+        }
+
+
+def frozen(array):
+    array = np.array(array)
+    array.flags.writeable = False
+    return array
+
+
+class SQLitePredictionStore:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "key TEXT PRIMARY KEY, nucleus TEXT, version TEXT, "
+            "peaks TEXT, arrays BLOB, created REAL)"
+        )
+        self.connection.commit()
+
+    def load(self, key):
+        row = self.connection.execute(
+            "SELECT peaks, arrays FROM predictions WHERE key = ?", (key,)
+        ).fetchone()
+        return deserialize_prediction(*row) if row else None
+
+    def save(self, key, nucleus, version, prediction):
+        peaks, arrays = serialize_prediction(prediction)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?, ?)",
+            (key, nucleus, version, peaks, arrays, time.time()),
+        )
+        self.connection.commit()
+
+    def delete_stale(self, nucleus, version):
+        self.connection.execute(
+            "DELETE FROM predictions WHERE nucleus = ? AND version IS NOT ?",
+            (nucleus, version),
+        )
+        self.connection.commit()
+
+    def clear(self):
+        self.connection.execute("DELETE FROM predictions")
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+
+
+class PredictionCache:
+    def __init__(self, max_entries, path=None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.store = SQLitePredictionStore(path) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][2]
+
+            if self.store is not None:
+                prediction = self.store.load(key)
+                if prediction is not None:
+                    nucleus, version = json.loads(key)[1:3]
+                    self.remember(key, nucleus, version, prediction)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return prediction
+
+            self.misses += 1
+            return None
+
+    def put(self, key, nucleus, version, prediction):
+        with self.lock:
+            self.remember(key, nucleus, version, prediction)
+            if self.store is not None:
+                self.store.save(key, nucleus, version, prediction)
+
+    def remember(self, key, nucleus, version, prediction):
+        # The entry keeps read-only copies of the spectrum: the caller's
+        # arrays stay writable, and hits cannot change the cached ones
+        prediction = {
+            **prediction,
+            "x": frozen(prediction["x"]),
+            "y": frozen(prediction["y"]),
+        }
+        self.entries[key] = (nucleus, version, prediction)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, nucleus, version):
+        # Drops the entries of other versions of a nucleus' model
+        with self.lock:
+            stale = [
+                key
+                for key, (entry_nucleus, entry_version, _) in self.entries.items()
+                if entry_nucleus == nucleus and entry_version != version
+            ]
+            for key in stale:
+                del self.entries[key]
+            if self.store is not None:
+                self.store.delete_stale(nucleus, version)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.store is not None:
+                self.store.clear()
+            self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "maxEntries": self.max_entries,
+                "persistent": self.store is not None,
+                "diskEntries": len(self.store) if self.store is not None else 0,
+            }
+
+    def cached_prediction(self, smiles, nucleus, version, render_options, compute):
+        canonical, output_order = canonical_numbering(smiles)
+        if canonical is None or version is None:
+            return compute()
+
+        key = json.dumps([canonical, nucleus, version, sorted(render_options.items())])
+        cached = self.get(key)
+        if cached is not None:
+            return renumber_prediction(cached, output_order)
+
+        prediction = compute()
+        if "error" not in prediction:
+            to_canonical = to_canonical_order(output_order)
+            self.put(
+                key, nucleus, version, renumber_prediction(prediction, to_canonical)
+            )
+        return prediction
+
+
+prediction_cache = PredictionCache(
+    Config.PREDICTION_CACHE_SIZE,
+    Config.PREDICTION_CACHE_PATH if Config.PREDICTION_CACHE_PERSIST else None,
+)
@@ -0,0 +1,263 @@
+import multiprocessing
+import threading
+import time
+from app.config import Config
+from app.api.services.logger import log_with_time
+
+# Optional isolation of the simple model predictions
+# (Config.SIMPLE_MODEL_PROCESS_POOL): featurization, inference and rendering
+# of a molecule run in one of a few worker processes, which load the models
+# once when they start. A prediction past PROCESS_POOL_DEADLINE_IN_SECONDS
+# gets its worker killed and replaced, and workers are replaced after
+# PROCESS_POOL_MAX_TASKS_PER_WORKER predictions to bound their memory. The
+# prediction cache stays in the server process.
+WORKER_NAME = "prediction-worker"
+
+
+class PredictionTimeout(Exception):
+    pass
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+def worker_main(conn):
+    # Runs in the worker: loads the models, then answers (nucleus, SMILES,
+    # render options) tasks until it gets None or the server goes away
+    from app.models.simpleModel.utils.batch_prediction import PREDICTORS
+
+    # One prediction at a time here: nothing to batch it with
+    Config.MICRO_BATCHING = False
+    try:
+        for predictor in PREDICTORS.values():
+            predictor.MODEL.get()
+    except (TimeoutError, RuntimeError) as e:
+        conn.send(("failed", str(e)))
+        return
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        nucleus, smiles, render_options = task
+        try:
+            result = PREDICTORS[nucleus].compute_spectrum(smiles, **render_options)
+        except Exception as e:
+            log_with_time(f"Error during the processing of the SMILES: {e}")
+            result = {"error": f"Error during the {nucleus} prediction"}
+        conn.send(result)
+
+
+class Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=worker_main,
+            args=(child_conn,),
+            name=WORKER_NAME,
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def stop(self, kill=False):
+        if not kill:
+            try:
+                self.conn.send(None)
+            except OSError:
+                kill = True
+        if not kill:
+            self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class PredictionPool:
+    def __init__(self, size, deadline, max_tasks, start_method):
+        self.size = size
+        self.deadline = deadline
+        self.max_tasks = max_tasks
+        self.context = multiprocessing.get_context(start_method)
+        self.idle = []
+        self.busy = 0
+        self.starting = 0
+        self.condition = threading.Condition()
+        self.tasks = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = 0
+        self.started = 0
+        self.start_failures = 0
+        with self.condition:
+            self.fill()
+
+    def fill(self):
+        # Called with the condition held: starts workers until there are
+        # size of them, each joining the idle list once its models are loaded
+        while len(self.idle) + self.busy + self.starting < self.size:
+            self.starting += 1
+            threading.Thread(
+                target=self.start_worker, name="start-prediction-worker", daemon=True
+            ).start()
+
+    def start_worker(self):
+        worker = None
+        try:
+            worker = Worker(self.context)
+            if not worker.conn.poll(Config.MODEL_LOAD_TIMEOUT_IN_SECONDS):
+                raise TimeoutError("its models did not load in time")
+            state, error = worker.conn.recv()
+            if state != "ready":
+                raise RuntimeError(error)
+        except (EOFError, OSError, TimeoutError, RuntimeError) as e:
+            # Not retried here: the next prediction starts a new worker
+            log_with_time(f"Could not start a prediction worker: {e}")
+            if worker is not None:
+                worker.stop(kill=True)
+            with self.condition:
+                self.starting -= 1
+                self.start_failures += 1
+                self.condition.notify_all()
+            return
+
+        with self.condition:
+            self.starting -= 1
+            self.started += 1
+            self.idle.append(worker)
+            self.condition.notify()
+
+    def acquire(self, timeout):
+        # None if no worker is free in time; raises WorkerCrashed when no
+        # worker could start
+        with self.condition:
+            self.fill()
+            self.condition.wait_for(
+                lambda: self.idle or not (self.starting or self.busy), timeout
+            )
+            if not self.idle:
+                if not (self.starting or self.busy):
+                    raise WorkerCrashed("No prediction worker could be started")
+                return None
+            self.busy += 1
+            return self.idle.pop()
+
+    def release(self, worker, healthy):
+        if healthy and worker.tasks < self.max_tasks:
+            with self.condition:
+                self.busy -= 1
+                self.idle.append(worker)
+                self.condition.notify()
+            return
+
+        # Stopped outside the lock; the replacement starts at once
+        with self.condition:
+            self.busy -= 1
+            if healthy:
+                self.recycled += 1
+            self.fill()
+        worker.stop(kill=not healthy)
+
+    def run(self, nucleus, smiles, render_options):
+        # The worker's compute_spectrum result. Raises PredictionTimeout when
+        # no worker is free or the prediction does not end within the
+        # deadline (the worker is then killed), WorkerCrashed if the worker
+        # dies.
+        deadline = time.monotonic() + self.deadline
+        worker = self.acquire(self.deadline)
+        if worker is None:
+            with self.condition:
+                self.timeouts += 1
+            raise PredictionTimeout(
+                f"No prediction worker available within {self.deadline} s"
+            )
+
+        healthy = False
+        try:
+            worker.conn.send((nucleus, smiles, render_options))
+            if not worker.conn.poll(max(deadline - time.monotonic(), 0)):
+                with self.condition:
+                    self.timeouts += 1
+                raise PredictionTimeout(
+                    f"The {nucleus} prediction was stopped after {self.deadline} s"
+                )
+            result = worker.conn.recv()
+            worker.tasks += 1
+            healthy = True
+        except (EOFError, OSError):
+            with self.condition:
+                self.crashes += 1
+            raise WorkerCrashed("The prediction worker stopped unexpectedly")
+        finally:
+            self.release(worker, healthy)
+
+        with self.condition:
+            self.tasks += 1
+        return result
+
+    def stats(self):
+        with self.condition:
+            return {
+                "enabled": True,
+                "workers": self.size,
+                "idle": len(self.idle),
+                "busy": self.busy,
+                "starting": self.starting,
+                "deadlineSeconds": self.deadline,
+                "maxTasksPerWorker": self.max_tasks,
+                "tasks": self.tasks,
+                "timeouts": self.timeouts,
+                "crashes": self.crashes,
+                "recycled": self.recycled,
+                "started": self.started,
+                "startFailures": self.start_failures,
+            }
+
+
+prediction_pool = None
+prediction_pool_lock = threading.Lock()
+
+
+def in_prediction_worker():
+    # Workers are started with "spawn", which runs the server's main module
+    # again in them: they must not start a pool of their own
+    return multiprocessing.current_process().name == WORKER_NAME
+
+
+def start_prediction_pool():
+    global prediction_pool
+    with prediction_pool_lock:
+        if prediction_pool is None:
+            prediction_pool = PredictionPool(
+                Config.PROCESS_POOL_WORKERS,
+                Config.PROCESS_POOL_DEADLINE_IN_SECONDS,
+                Config.PROCESS_POOL_MAX_TASKS_PER_WORKER,
+                Config.PROCESS_POOL_START_METHOD,
+            )
+        return prediction_pool
+
+
+def compute_isolated(nucleus, compute, smiles, render_options):
+    # compute(smiles, **render_options), in a worker process when
+    # Config.SIMPLE_MODEL_PROCESS_POOL is set
+    if not Config.SIMPLE_MODEL_PROCESS_POOL:
+        return compute(smiles, **render_options)
+
+    try:
+        return start_prediction_pool().run(nucleus, smiles, render_options)
+    except (PredictionTimeout, WorkerCrashed) as e:
+        log_with_time(f"{e} (SMILES: {smiles})")
+        return {"error": str(e)}
+
+
+def process_pool_stats():
+    if prediction_pool is None:
+        return {"enabled": Config.SIMPLE_MODEL_PROCESS_POOL, "workers": 0}
+    return prediction_pool.stats()
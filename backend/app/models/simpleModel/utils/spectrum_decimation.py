@@ -0,0 +1,161 @@
+import numpy as np
+from scipy.signal import find_peaks
+
+# Peaks whose prominence is below this fraction of the spectrum maximum are
+# treated as noise or line tails and are not forced into the decimated
+# spectrum.
+PEAK_PROMINENCE = 0.01
+# With a point budget, at most this share of it goes to forced peak tops and
+# the valleys between them; the envelope gets the rest.
+PEAK_BUDGET_SHARE = 0.5
+
+
+def _first_index_per_segment(values, targets, segment_of_point):
+    hits = np.flatnonzero(values == targets[segment_of_point])
+    _, first = np.unique(segment_of_point[hits], return_index=True)
+    return hits[first]
+
+
+def segment_extrema(y, edges):
+    # Index of the minimum and of the maximum of y[edges[i]:edges[i + 1]]
+    lengths = np.diff(edges)
+    segment_of_point = np.repeat(np.arange(len(lengths)), lengths)
+    starts = edges[:-1]
+    y_seg = y[starts[0] : edges[-1]]
+
+    maxima = np.maximum.reduceat(y_seg, starts - starts[0])
+    minima = np.minimum.reduceat(y_seg, starts - starts[0])
+    argmax = _first_index_per_segment(y_seg, maxima, segment_of_point) + starts[0]
+    argmin = _first_index_per_segment(y_seg, minima, segment_of_point) + starts[0]
+    return argmin, argmax
+
+
+def peak_indices(y, prominence=PEAK_PROMINENCE, max_peaks=None):
+    # Tops of the peaks at least prominence * max|y| high above their
+    # surroundings, keeping the max_peaks most prominent ones
+    if len(y) == 0:
+        return np.zeros(0, dtype=int)
+    peaks, properties = find_peaks(y, prominence=prominence * np.max(np.abs(y)))
+    if max_peaks is not None and len(peaks) > max_peaks:
+        top = np.argsort(properties["prominences"], kind="stable")[::-1][:max_peaks]
+        peaks = np.sort(peaks[top])
+    return peaks
+
+
+def peak_structure_indices(y, max_points=None):
+    # Peak tops plus the deepest point between two consecutive tops, so that
+    # the lines of a multiplet stay resolved; at most max_points of them
+    max_peaks = None if max_points is None else (max_points + 1) // 2
+    peaks = peak_indices(y, max_peaks=max_peaks)
+    if len(peaks) < 2:
+        return peaks
+    valleys, _ = segment_extrema(y, peaks)
+    return np.union1d(peaks, valleys)
+
+
+# Share of the bins spread uniformly along the spectrum; the others follow the
+# intensity variation so that line flanks get more points than the baseline.
+UNIFORM_BIN_SHARE = 0.1
+
+
+def envelope_indices(y, max_points):
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    if max_points < 4:
+        return np.unique([0, int(np.argmax(y)), n - 1])
+
+    n_bins = max(1, (max_points - 2) // 2)
+    variation = np.concatenate(([0.0], np.cumsum(np.abs(np.diff(y)))))
+    position = np.arange(n) / (n - 1)
+    if variation[-1] > 0:
+        position = (
+            UNIFORM_BIN_SHARE * position
+            + (1 - UNIFORM_BIN_SHARE) * variation / variation[-1]
+        )
+
+    edges = np.searchsorted(position, np.linspace(0, 1, n_bins + 1)[1:-1])
+    edges = np.unique(np.concatenate(([0], edges, [n])))
+    argmin, argmax = segment_extrema(y, edges)
+    return np.unique(np.concatenate(([0, n - 1], argmin, argmax)))
+
+
+def rdp_indices(x, y, tolerance):
+    # Ramer-Douglas-Peucker on the vertical distance to the chord, with the
+    # tolerance expressed as a fraction of the maximum absolute intensity
+    n = len(y)
+    if n <= 2:
+        return np.arange(n)
+
+    epsilon = tolerance * np.max(np.abs(y))
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    stack = [(0, n - 1)]
+
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        xs = x[start + 1 : end]
+        slope = (y[end] - y[start]) / (x[end] - x[start])
+        errors = np.abs(y[start + 1 : end] - (y[start] + slope * (xs - x[start])))
+        worst = int(np.argmax(errors))
+        if errors[worst] > epsilon:
+            split = start + 1 + worst
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return np.flatnonzero(keep)
+
+
+def decimate_spectrum(x, y, max_points=None, tolerance=None):
+    # Sorted indices of the points to keep. tolerance runs Ramer-Douglas-
+    # Peucker, max_points keeps the min/max envelope of bins sized by the
+    # intensity variation. The most prominent peak tops and the valleys
+    # between them are kept first, within the max_points budget.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    indices = np.arange(len(y))
+
+    peak_budget = None
+    if max_points is not None:
+        peak_budget = int((max_points - 3) * PEAK_BUDGET_SHARE)
+    peaks = peak_structure_indices(y, peak_budget)
+
+    if tolerance is not None:
+        indices = rdp_indices(x, y, tolerance)
+    if max_points is not None and len(indices) > max_points:
+        budget = max_points - len(peaks)
+        indices = indices[envelope_indices(y[indices], budget)]
+
+    if len(indices) < len(y):
+        indices = np.union1d(indices, peaks)
+    return indices
+
+
+def parse_decimation_parameters(parameters):
+    max_points = parameters.get("maxPoints")
+    tolerance = parameters.get("tolerance")
+
+    if max_points not in (None, ""):
+        try:
+            max_points = int(max_points)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid 'maxPoints': {max_points}")
+        if max_points < 3:
+            raise ValueError("'maxPoints' must be at least 3")
+    else:
+        max_points = None
+
+    if tolerance not in (None, ""):
+        try:
+            tolerance = float(tolerance)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid 'tolerance': {tolerance}")
+        if not 0 <= tolerance < 1:
+            raise ValueError("'tolerance' must be in [0, 1)")
+    else:
+        tolerance = None
+
+    return max_points, tolerance
@@ -4,7 +4,8 @@ import os
 from sklearn.model_selection import train_test_split
 from app.models.simpleModel.H.model_utils_1h_v3 import train_model as train_model_1h
 from app.models.simpleModel.C.model_utils_13c_v2 import train_model as train_model_13c
-from joblib import dump
+from app.models.simpleModel.utils.columnar_features import expand_joined_list_column
+from app.models.simpleModel.utils.packed_forest import save_model
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TRAIN_DATASET_1H_PATH = os.path.join(BASE_DIR, "dataset_features_labels_1000_1h_v3.csv")
@@ -15,7 +16,7 @@ MODEL_1H_PATH = os.path.join(BASE_DIR, "..", "H", "trained_model_1h_v3.joblib")
 MODEL_13C_PATH = os.path.join(BASE_DIR, "..", "C", "trained_model_13c_v2.joblib")
 
 
-def train_1h():
+def split_1h():
     df = pd.read_csv(TRAIN_DATASET_1H_PATH)
 
     df = df.dropna(subset=["ppm", "nb_atoms", "multiplicity"])
@@ -27,19 +28,20 @@ def train_1h():
     X = df.drop(
         columns=["ppm", "nb_atoms", "multiplicity", "couplings", "heavy_atom_idx"]
     )
-    X["neighbor_atomic_nums"] = X["neighbor_atomic_nums"].astype(str)
+    X = expand_joined_list_column(X, "neighbor_atomic_nums")
+    X = expand_joined_list_column(X, "neighbor_H_counts_per_atom")
     y = df[["ppm", "nb_atoms", "multiplicity", "couplings"]]
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
 
+def train_1h():
+    X_train, X_test, y_train, y_test = split_1h()
     model_1h = train_model_1h(X_train, y_train)
-    dump(model_1h, MODEL_1H_PATH, compress=3)
+    save_model(model_1h, MODEL_1H_PATH)
 
 
-def train_13c():
-
+def split_13c():
     df = pd.read_csv(TRAIN_DATASET_13C_PATH)
     df = df.dropna(subset=["ppm", "nb_atoms", "multiplicity"])
 
@@ -50,15 +52,16 @@ def train_13c():
     X = df.drop(
         columns=["ppm", "nb_atoms", "multiplicity", "couplings", "heavy_atom_idx"]
     )
-    X["neighbor_atomic_nums"] = X["neighbor_atomic_nums"].astype(str)
+    X = expand_joined_list_column(X, "neighbor_atomic_nums")
     y = df[["ppm", "nb_atoms", "multiplicity", "couplings"]]
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+    return train_test_split(X, y, test_size=0.2, random_state=42)
 
+
+def train_13c():
+    X_train, X_test, y_train, y_test = split_13c()
     model_13c = train_model_13c(X_train, y_train)
-    dump(model_13c, MODEL_13C_PATH, compress=3)
+    save_model(model_13c, MODEL_13C_PATH)
 
 
 def train_models():
@@ -0,0 +1,65 @@
+"""Compare the adaptive grid with the uniform 64,000-point grid.
+
+Every line has unit area before scaling, so the exact integral of a spectrum
+is sum(nb_atoms) * INTENSITY_SCALE. The script reports the trapezoidal
+integral of both grids against it, and exits with an error when the adaptive
+grid deviates from the exact value by more than 0.1%.
+
+Run from the backend directory:
+    python -m benchmarks.bench_adaptive_grid
+"""
+
+import sys
+import time
+import numpy as np
+from app.models.simpleModel.utils.draw_peaks_and_spectrum import (
+    INTENSITY_SCALE,
+    simulate_spectrum,
+)
+from benchmarks.bench_simulate_spectrum import random_associations
+
+MAX_RELATIVE_AREA_ERROR = 1e-3
+
+
+def integral(x, y):
+    order = np.argsort(x)
+    return np.trapezoid(y[order], x[order])
+
+
+def main():
+    rng = np.random.default_rng(0)
+    failed = False
+
+    print(
+        f"{'nucleus':<8} {'groups':>6} {'grid':<9} {'points':>7} {'time (ms)':>9} "
+        f"{'area error':>11}"
+    )
+    for nucleus, ppm_range in (("1H", (0, 10)), ("13C", (0, 250))):
+        for n_groups in (10, 40):
+            associations = random_associations(n_groups, ppm_range, rng)
+            if nucleus == "13C":
+                for assoc in associations:
+                    assoc["multiplicity"] = "s"
+                    assoc["couplings"] = []
+            exact = sum(a["nb_atoms"] for a in associations) * INTENSITY_SCALE
+
+            for grid_mode in ("uniform", "adaptive"):
+                start = time.perf_counter()
+                x, y, _ = simulate_spectrum(
+                    associations, 0.004, ppm_range, 64000, grid_mode=grid_mode
+                )
+                elapsed = time.perf_counter() - start
+                error = abs(integral(x, y) - exact) / exact
+                print(
+                    f"{nucleus:<8} {n_groups:>6} {grid_mode:<9} {len(x):>7} "
+                    f"{elapsed * 1000:>9.1f} {error:>11.1e}"
+                )
+                if grid_mode == "adaptive" and error > MAX_RELATIVE_AREA_ERROR:
+                    failed = True
+
+    if failed:
+        sys.exit("Adaptive grid integral deviates from the exact area")
+
+
+if __name__ == "__main__":
+    main()
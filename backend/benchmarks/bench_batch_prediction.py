@@ -0,0 +1,65 @@
+"""Compare one prediction per molecule with the batch path (peak lists only).
+
+"per molecule" featurizes and calls the forests once per SMILES, as
+/api/simpleModelPrediction does. "batch" featurizes on a thread pool and runs
+each forest once over the rows of all molecules.
+
+Run from the backend directory (needs the trained models):
+    python -m benchmarks.bench_batch_prediction
+"""
+
+import time
+from app.models.simpleModel.utils.batch_prediction import PREDICTORS, predict_batch
+
+CHAINS = ["C", "CC", "CCC", "CC(C)", "CCCC", "CC(C)C", "C=CC", "COC"]
+LINKERS = ["", "O", "N", "C(=O)", "C(=O)O", "S", "C(=O)N", "OC(=O)"]
+RINGS = ["c1ccccc1", "c1ccncc1", "C1CCCCC1", "c1ccc(Cl)cc1", "c1ccc(O)cc1"]
+
+
+def library(n):
+    smiles = []
+    for i in range(n):
+        chain = CHAINS[i % len(CHAINS)]
+        linker = LINKERS[(i // len(CHAINS)) % len(LINKERS)]
+        ring = RINGS[(i // (len(CHAINS) * len(LINKERS))) % len(RINGS)]
+        smiles.append(chain + linker + ring)
+    return smiles
+
+
+def per_molecule(smiles_list, nucleus):
+    predictor = PREDICTORS[nucleus]
+    return [
+        predictor.predict_spectra(
+            [(smiles, predictor.extract_features_from_smiles(smiles))],
+            peaks_only=True,
+        )[0]
+        for smiles in smiles_list
+    ]
+
+
+def main():
+    print(
+        f"{'nucleus':<8} {'molecules':>9} {'per molecule (s)':>16} "
+        f"{'batch (s)':>9} {'speed-up':>9} {'same':>5}"
+    )
+    for nucleus in PREDICTORS:
+        for n in (10, 100, 1000):
+            smiles_list = library(n)
+
+            start = time.perf_counter()
+            reference = per_molecule(smiles_list, nucleus)
+            t_single = time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = predict_batch(smiles_list, [nucleus], peaks_only=True, workers=4)
+            t_batch = time.perf_counter() - start
+
+            same = reference == [result[nucleus] for result in results]
+            print(
+                f"{nucleus:<8} {n:>9} {t_single:>16.2f} {t_batch:>9.2f} "
+                f"{t_single / t_batch:>8.1f}x {str(same):>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
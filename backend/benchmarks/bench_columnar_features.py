@@ -0,0 +1,161 @@
+"""Compare the joined-string neighbour features with the columnar path.
+
+"strings" is the previous pipeline: featurizers join neighbour lists into
+strings and the ColumnTransformer parses them row by row. "columnar" reads
+the stat columns with ColumnarPreprocessor. Both preprocessors are fitted on
+the training CSVs here, so no trained model is needed.
+
+Run from the backend directory:
+    python -m benchmarks.bench_columnar_features
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder
+from app.models.simpleModel.utils import train_models
+from app.models.simpleModel.utils.columnar_features import (
+    ColumnarPreprocessor,
+    expand_joined_list_column,
+    stat_columns,
+)
+
+NUMERIC_1H = [
+    "num_H",
+    "heavy_atomic_num",
+    "heavy_degree",
+    "heavy_in_ring",
+    "heavy_is_aromatic",
+    "heavy_formal_charge",
+    "heavy_partial_charge",
+    "num_heavy_neighbors",
+    "num_H_neighbors",
+    "num_couplable_H_neighbors",
+    "distance_to_nearest_non_equivalent_H",
+    "in_symmetric_env",
+    "is_in_CH3",
+    "is_in_CH2",
+    "is_terminal_CH",
+]
+NUMERIC_13C = [
+    "degree",
+    "in_ring",
+    "is_aromatic",
+    "formal_charge",
+    "partial_charge",
+    "num_H_neighbors",
+    "num_heavy_neighbors",
+    "dist_to_O",
+    "dist_to_N",
+    "dist_to_aromatic",
+    "in_symmetric_env",
+    "neighbor_C_count",
+    "neighbor_O_count",
+    "neighbor_N_count",
+    "neighbor_S_count",
+    "neighbor_Halogen_count",
+]
+NUCLEI = {
+    "1H": (
+        train_models.TRAIN_DATASET_1H_PATH,
+        NUMERIC_1H,
+        ["neighbor_atomic_nums", "neighbor_H_counts_per_atom"],
+        "heavy_hybridization",
+    ),
+    "13C": (
+        train_models.TRAIN_DATASET_13C_PATH,
+        NUMERIC_13C,
+        ["neighbor_atomic_nums"],
+        "hybridization",
+    ),
+}
+
+
+class RowByRowListStats(BaseEstimator, TransformerMixin):
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        stats = []
+        for val in X.iloc[:, 0]:
+            if pd.isna(val):
+                nums = []
+            else:
+                try:
+                    nums = [int(x) for x in str(val).split(",")]
+                except:
+                    nums = []
+            mean = np.mean(nums) if nums else 0
+            std = np.std(nums) if nums else 0
+            stats.append([mean, std, len(nums)])
+        return np.array(stats)
+
+
+def fitted_preprocessors(frame, numeric, list_columns, categorical):
+    strings = frame.copy()
+    for name in list_columns:
+        strings[name] = strings[name].astype(str)
+    string_preprocessor = ColumnTransformer(
+        [("num", "passthrough", numeric)]
+        + [(name, RowByRowListStats(), [name]) for name in list_columns]
+        + [("cat", OneHotEncoder(handle_unknown="ignore"), [categorical])]
+    ).fit(strings)
+
+    columns = frame
+    for name in list_columns:
+        columns = expand_joined_list_column(columns, name)
+    columnar_preprocessor = ColumnTransformer(
+        [("num", "passthrough", numeric)]
+        + [(name, "passthrough", stat_columns(name)) for name in list_columns]
+        + [("cat", OneHotEncoder(handle_unknown="ignore"), [categorical])]
+    ).fit(columns)
+    return strings, string_preprocessor, columns, columnar_preprocessor
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def dense(matrix):
+    return matrix.toarray() if hasattr(matrix, "toarray") else matrix
+
+
+def main():
+    print(
+        f"{'nucleus':<8} {'input':<17} {'strings (ms)':>12} "
+        f"{'columnar (ms)':>13} {'same':>5}"
+    )
+    for nucleus, (path, numeric, list_columns, categorical) in NUCLEI.items():
+        frame = pd.read_csv(path)
+        strings, string_preprocessor, columns, fitted = fitted_preprocessors(
+            frame, numeric, list_columns, categorical
+        )
+        columnar = ColumnarPreprocessor(fitted)
+
+        reference, t_strings = timed(lambda: string_preprocessor.transform(strings), 3)
+        result, t_columnar = timed(lambda: columnar.transform(columns), 3)
+        same = np.array_equal(dense(reference), result)
+        print(
+            f"{nucleus:<8} {f'CSV, {len(frame)} rows':<17} {t_strings * 1000:>12.1f} "
+            f"{t_columnar * 1000:>13.1f} {str(same):>5}"
+        )
+
+        # Molecule-sized inputs, as seen by single-molecule inference
+        for n_rows in (5, 20):
+            _, t_strings = timed(
+                lambda: string_preprocessor.transform(strings.iloc[:n_rows]), 50
+            )
+            _, t_columnar = timed(lambda: columnar.transform(columns.iloc[:n_rows]), 50)
+            print(
+                f"{nucleus:<8} {f'{n_rows} rows':<17} "
+                f"{t_strings * 1000:>12.2f} {t_columnar * 1000:>13.2f} {'-':>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Featurization latency with and without ETKDG embedding, by molecule size.
+
+"embedded" reproduces the previous behaviour: the molecule is embedded
+before featurization although no feature reads the coordinates.
+
+Run from the backend directory:
+    python -m benchmarks.bench_conformer
+"""
+
+import time
+from rdkit import Chem
+from rdkit.Chem import AllChem
+from app.models.simpleModel.C import extract_mol_features_13c_v2 as featurizer_13c
+from app.models.simpleModel.H import extract_mol_features_1h_v3 as featurizer_1h
+from benchmarks.bench_featurize_1h import polyalanine
+
+TIERS = {
+    "small": ["CCO", "CC(=O)O", "c1ccccc1", "CC(C)O", "CN(C)C=O"],
+    "medium": [
+        "CC(=O)Oc1ccccc1C(=O)O",
+        "CN1C=NC2=C1C(=O)N(C(=O)N2C)C",
+        "CC(C)Cc1ccc(cc1)C(C)C(=O)O",
+        "COc1ccc2[nH]cc(CCNC(C)=O)c2c1",
+    ],
+    "large": [
+        "CCCCCCCCCCCCCCCC(=O)OCC(COC(=O)CCCCCCCCCCCCCCC)OC(=O)CCCCCCCCCCCCCCC",
+        polyalanine(10),
+    ],
+}
+
+
+def embedded(featurize):
+    def run(smiles):
+        mol = Chem.AddHs(Chem.MolFromSmiles(smiles))
+        AllChem.EmbedMolecule(mol, AllChem.ETKDG())
+        return featurize(smiles)
+
+    return run
+
+
+def mean_latency(func, smiles_list, repeat=3):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for smiles in smiles_list:
+            func(smiles)
+    return (time.perf_counter() - start) / (repeat * len(smiles_list))
+
+
+def main():
+    print(
+        f"{'nucleus':<8} {'tier':<7} {'heavy atoms':>11} {'embedded (ms)':>13} "
+        f"{'on demand (ms)':>14} {'speed-up':>9}"
+    )
+    for nucleus, module in (("1H", featurizer_1h), ("13C", featurizer_13c)):
+        featurize = module.extract_features_from_smiles
+        for tier, smiles_list in TIERS.items():
+            sizes = [Chem.MolFromSmiles(s).GetNumHeavyAtoms() for s in smiles_list]
+            t_embedded = mean_latency(embedded(featurize), smiles_list)
+            t_on_demand = mean_latency(featurize, smiles_list)
+            print(
+                f"{nucleus:<8} {tier:<7} {f'{min(sizes)}-{max(sizes)}':>11} "
+                f"{t_embedded * 1000:>13.1f} {t_on_demand * 1000:>14.1f} "
+                f"{t_embedded / t_on_demand:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare the zero-segment compressor with the shape-preserving decimation.
+
+Run from the backend directory:
+    python -m benchmarks.bench_decimation
+"""
+
+import json
+import time
+import numpy as np
+from app.models.simpleModel.utils.spectrum_decimation import (
+    decimate_spectrum,
+    peak_indices,
+)
+from app.models.simpleModel.utils.draw_peaks_and_spectrum import (
+    compress_spectrum_points_zero_segments,
+    simulate_spectrum,
+)
+from benchmarks.bench_simulate_spectrum import random_associations
+
+
+def payload_size(x, y):
+    points = [
+        {"ppm": float(ppm), "intensity": float(intens), "atomID": []}
+        for ppm, intens in zip(x, y)
+    ]
+    return len(json.dumps(points))
+
+
+def report(label, x, y, kept, elapsed):
+    x_kept, y_kept = x[kept], y[kept]
+    # np.interp needs increasing abscissae
+    rebuilt = np.interp(x[::-1], x_kept[::-1], y_kept[::-1])[::-1]
+    max_err = np.max(np.abs(rebuilt - y)) / np.max(np.abs(y))
+    peaks = peak_indices(y)
+    peaks_kept = np.isin(peaks, kept).mean() if len(peaks) else 1.0
+    print(
+        f"  {label:<24} {len(kept):>7} {payload_size(x_kept, y_kept) / 1024:>9.0f} "
+        f"{elapsed * 1000:>9.1f} {max_err:>10.1e} {peaks_kept:>7.0%}"
+    )
+
+
+def compare(name, x, y):
+    print(f"{name} ({len(x)} points)")
+    print(
+        f"  {'method':<24} {'points':>7} {'JSON (kB)':>9} {'time (ms)':>9} "
+        f"{'max err':>10} {'peaks':>7}"
+    )
+
+    start = time.perf_counter()
+    x_comp, _, _ = compress_spectrum_points_zero_segments(x, y, [[]] * len(x))
+    elapsed = time.perf_counter() - start
+    report("zero segments (current)", x, y, np.flatnonzero(np.isin(x, x_comp)), elapsed)
+
+    for max_points in (4000, 2000, 1000, 100):
+        start = time.perf_counter()
+        kept = decimate_spectrum(x, y, max_points=max_points)
+        report(f"envelope {max_points}", x, y, kept, time.perf_counter() - start)
+
+    for tolerance in (1e-3, 1e-2):
+        start = time.perf_counter()
+        kept = decimate_spectrum(x, y, tolerance=tolerance)
+        report(f"RDP {tolerance:g}", x, y, kept, time.perf_counter() - start)
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    for n_groups in (10, 40):
+        associations = random_associations(n_groups, (0, 10), rng)
+        x, y, _ = simulate_spectrum(associations, 0.004, (0, 10), 64000)
+        compare(f"Predicted 1H, {n_groups} groups", x, y)
+
+    # Experimental-like spectra: same lines with 0.1% and 2% baseline noise
+    for level in (1e-3, 2e-2):
+        noise = rng.normal(0, level * np.max(y), len(y))
+        compare(f"Noisy 1H ({level:.1%}), 40 groups", x, y + noise)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Time 13C carbon featurization against molecule size.
+
+The reference re-implements the previous per-carbon loop: one
+CanonicalRankAtoms call and one GetShortestPath call per (carbon, O/N/aromatic
+atom) pair. Embedding is left out of both timings.
+
+Run from the backend directory:
+    python -m benchmarks.bench_featurize_13c
+"""
+
+import time
+from rdkit import Chem
+from app.models.simpleModel.C.extract_mol_features_13c_v2 import (
+    extract_features_for_C_atoms,
+)
+from app.models.simpleModel.utils.molecule_context import MoleculeContext
+from benchmarks.bench_featurize_1h import polyalanine
+
+
+def legacy_carbon_terms(mol, carbon_idx):
+    Chem.CanonicalRankAtoms(mol, breakTies=False)
+
+    def shortest_distance(predicate):
+        dists = [
+            len(Chem.rdmolops.GetShortestPath(mol, carbon_idx, a.GetIdx())) - 1
+            for a in mol.GetAtoms()
+            if a.GetIdx() != carbon_idx and predicate(a)
+        ]
+        return min(dists) if dists else -1
+
+    return (
+        shortest_distance(lambda a: a.GetAtomicNum() == 8),
+        shortest_distance(lambda a: a.GetAtomicNum() == 7),
+        shortest_distance(lambda a: a.IsInRing() and a.GetIsAromatic()),
+    )
+
+
+def main():
+    print(
+        f"{'heavy atoms':>11} {'carbons':>7} {'reference (ms)':>14} "
+        f"{'context (ms)':>12} {'speed-up':>9} {'same':>5}"
+    )
+    for n_residues in (2, 5, 10, 20, 40, 80):
+        mol = Chem.AddHs(Chem.MolFromSmiles(polyalanine(n_residues)))
+        carbons = [a.GetIdx() for a in mol.GetAtoms() if a.GetAtomicNum() == 6]
+
+        start = time.perf_counter()
+        reference = [legacy_carbon_terms(mol, idx) for idx in carbons]
+        t_reference = time.perf_counter() - start
+
+        mol = Chem.AddHs(Chem.MolFromSmiles(polyalanine(n_residues)))
+        start = time.perf_counter()
+        features = extract_features_for_C_atoms(MoleculeContext(mol))
+        t_context = time.perf_counter() - start
+
+        columns = ["dist_to_O", "dist_to_N", "dist_to_aromatic"]
+        same = reference == [tuple(row) for row in features[columns].values.tolist()]
+        print(
+            f"{mol.GetNumHeavyAtoms():>11} {len(carbons):>7} "
+            f"{t_reference * 1000:>14.1f} {t_context * 1000:>12.1f} "
+            f"{t_reference / t_context:>8.0f}x {str(same):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Time 1H group featurization against molecule size.
+
+The reference re-implements the previous per-group loops: one
+CanonicalRankAtoms call per group and two GetShortestPath calls per hydrogen
+per group. Embedding is left out of both timings.
+
+Run from the backend directory:
+    python -m benchmarks.bench_featurize_1h
+"""
+
+import time
+from rdkit import Chem
+from app.models.simpleModel.H.extract_mol_features_1h_v3 import (
+    extract_features_for_H_groups,
+    get_equivalent_H_groups,
+)
+from app.models.simpleModel.utils.molecule_context import MoleculeContext
+
+
+def polyalanine(n_residues):
+    return "N" + "C(C)C(=O)N" * (n_residues - 1) + "C(C)C(=O)O"
+
+
+def legacy_group_terms(mol, heavy_idx, groups):
+    Chem.CanonicalRankAtoms(mol, breakTies=False)
+
+    def is_non_equivalent_H(h_idx):
+        for g_heavy, g_H in groups.items():
+            if h_idx in g_H and g_heavy != heavy_idx:
+                return True
+        return False
+
+    num_couplable = 0
+    for atom in mol.GetAtoms():
+        if atom.GetAtomicNum() == 1 and is_non_equivalent_H(atom.GetIdx()):
+            path = Chem.rdmolops.GetShortestPath(
+                mol, heavy_idx, atom.GetNeighbors()[0].GetIdx()
+            )
+            if 2 <= len(path) - 1 <= 3:
+                num_couplable += 1
+
+    distances = []
+    for atom in mol.GetAtoms():
+        if atom.GetAtomicNum() == 1 and is_non_equivalent_H(atom.GetIdx()):
+            path = Chem.rdmolops.GetShortestPath(
+                mol, heavy_idx, atom.GetNeighbors()[0].GetIdx()
+            )
+            distances.append(len(path) - 1)
+
+    return num_couplable, min(distances) if distances else -1
+
+
+def prepared_mol(smiles):
+    mol = Chem.AddHs(Chem.MolFromSmiles(smiles))
+    return mol, get_equivalent_H_groups(mol)
+
+
+def main():
+    print(
+        f"{'heavy atoms':>11} {'groups':>6} {'reference (ms)':>14} "
+        f"{'context (ms)':>12} {'speed-up':>9} {'same':>5}"
+    )
+    for n_residues in (2, 5, 10, 20, 40, 80):
+        mol, groups = prepared_mol(polyalanine(n_residues))
+
+        start = time.perf_counter()
+        reference = [legacy_group_terms(mol, h, groups) for h in groups]
+        t_reference = time.perf_counter() - start
+
+        mol, groups = prepared_mol(polyalanine(n_residues))
+        start = time.perf_counter()
+        features = extract_features_for_H_groups(MoleculeContext(mol), groups)
+        t_context = time.perf_counter() - start
+
+        same = reference == [
+            (
+                f["num_couplable_H_neighbors"],
+                f["distance_to_nearest_non_equivalent_H"],
+            )
+            for f in features
+        ]
+        print(
+            f"{mol.GetNumHeavyAtoms():>11} {len(groups):>6} "
+            f"{t_reference * 1000:>14.1f} {t_context * 1000:>12.1f} "
+            f"{t_reference / t_context:>8.0f}x {str(same):>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
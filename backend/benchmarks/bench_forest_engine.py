@@ -0,0 +1,69 @@
+"""Compare scikit-learn forest inference with the packed ForestEngine.
+
+"scikit-learn" calls predict on every forest of a model (for 1H: ppm,
+multiplicity and the five coupling forests). "engine" walks all their trees
+in one pass. The models are trained here on the training CSVs, and rows
+are drawn from the training features, so no trained model is needed. The
+last column checks that both give exactly the same predictions.
+
+Run from the backend directory:
+    python -m benchmarks.bench_forest_engine
+"""
+
+import time
+import numpy as np
+from app.models.simpleModel.H import model_utils_1h_v3
+from app.models.simpleModel.C import model_utils_13c_v2
+from app.models.simpleModel.utils import train_models
+from app.models.simpleModel.utils.packed_forest import FOREST_KEYS, ForestEngine
+
+ROWS = (1, 10, 10000)
+MODELS = {
+    "1H": (train_models.split_1h, model_utils_1h_v3),
+    "13C": (train_models.split_13c, model_utils_13c_v2),
+}
+
+
+def median_seconds(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(
+        f"{'nucleus':<8} {'rows':>6} {'scikit-learn (ms)':>17} "
+        f"{'engine (ms)':>11} {'speed-up':>9} {'same':>5}"
+    )
+    for nucleus, (split, model_utils) in MODELS.items():
+        X_train, X_test, y_train, _ = split()
+        model = model_utils.train_model(X_train, y_train)
+        forests = {key: model[key] for key in FOREST_KEYS if key in model}
+        engine = ForestEngine(forests)
+        features = model_utils.transform_features(model, X_test)
+
+        for n_rows in ROWS:
+            X = features[rng.integers(0, len(features), n_rows)]
+            repeat = 3 if n_rows > 1000 else 20
+
+            def reference():
+                return {key: forest.predict(X) for key, forest in forests.items()}
+
+            t_reference = median_seconds(reference, repeat)
+            t_engine = median_seconds(lambda: engine.predict(X), repeat)
+
+            expected, predicted = reference(), engine.predict(X)
+            same = all(np.array_equal(expected[key], predicted[key]) for key in forests)
+            print(
+                f"{nucleus:<8} {n_rows:>6} {t_reference * 1000:>17.1f} "
+                f"{t_engine * 1000:>11.1f} {t_reference / t_engine:>8.1f}x "
+                f"{str(same):>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Responsiveness of the server while slow predictions are in progress,
+with synchronous /api/predict calls and with prediction jobs.
+
+The app is served by waitress with its default 4 threads. CLIENTS clients
+each ask for a prediction from a stand-in external predictor that answers
+after UPSTREAM_DELAY seconds (the predictor response cache is disabled).
+Meanwhile a probe asks for /api/getMolImageWithIds every PROBE_INTERVAL
+seconds and records its latency.
+
+"legacy" clients call /api/predict and wait for the response, each holding
+a waitress thread. "jobs" clients submit /api/jobs/predict and poll the job
+every POLL_INTERVAL seconds; the predictions run JOB_WORKERS at a time on
+the job pool, then CLIENTS at a time. "done" is when the last client has
+its result.
+
+Run from the backend directory:
+    python -m benchmarks.bench_jobs
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import requests
+from waitress.server import create_server
+from app import create_app
+from app.config import Config
+from app.api.routes import jobs, predict
+from app.api.services.jobs import JobManager
+
+CLIENTS = 8
+UPSTREAM_DELAY = 2.0
+PROBE_INTERVAL = 0.1
+POLL_INTERVAL = 0.25
+SMILES = "CCOC(=O)c1ccccc1"
+
+
+class SlowPredictor(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(UPSTREAM_DELAY)
+        body = json.dumps(
+            {
+                "smiles": payload["smiles"],
+                "peaksInfos": [],
+                "spectrum": [{"ppm": 1.0, "intensity": 0.5}],
+                "metadata": {"nucleusType": "1H"},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class NoCache:
+    def fetch(self, key, call):
+        return call()
+
+
+def synchronous(base, body):
+    response = requests.post(f"{base}/predict", json=body, timeout=60)
+    response.raise_for_status()
+
+
+def as_job(base, body):
+    job = requests.post(f"{base}/jobs/predict", json=body, timeout=60).json()
+    while True:
+        time.sleep(POLL_INTERVAL)
+        status = requests.get(f"{base}/jobs/{job['id']}", timeout=60).json()
+        if status["status"] not in ("queued", "running"):
+            assert status["status"] == "done", status
+            return
+
+
+def run(base, client, body):
+    # Probe latencies while the clients run, and time until all are done
+    latencies = []
+    finished = threading.Event()
+
+    def probe():
+        while not finished.is_set():
+            start = time.perf_counter()
+            response = requests.post(
+                f"{base}/getMolImageWithIds", json={"SMILES": "c1ccccc1O"}, timeout=60
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+            time.sleep(PROBE_INTERVAL)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        list(pool.map(lambda _: client(base, body), range(CLIENTS)))
+    done = time.perf_counter() - start
+    finished.set()
+    prober.join()
+    return done, np.array(latencies) * 1000
+
+
+def main():
+    app = create_app(serve_frontend=False)
+    predict.predictor_cache = NoCache()
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), SlowPredictor)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    server = create_server(app, host="127.0.0.1", port=0)
+    threading.Thread(target=server.run, daemon=True).start()
+    base = f"http://127.0.0.1:{server.effective_port}/api"
+    body = {
+        "smiles": SMILES,
+        "endpoint": f"http://127.0.0.1:{upstream.server_address[1]}/predict",
+    }
+
+    print(
+        f"{CLIENTS} clients, predictor {UPSTREAM_DELAY} s, "
+        f"{server.adj.threads} waitress threads, {Config.JOB_WORKERS} job workers"
+    )
+    print(
+        f"{'version':<16} {'done (s)':>8} {'probes':>6} {'image p50 (ms)':>14} "
+        f"{'image max (ms)':>14}"
+    )
+    for name, client, workers in (
+        ("legacy", synchronous, None),
+        (f"jobs, {Config.JOB_WORKERS} workers", as_job, Config.JOB_WORKERS),
+        (f"jobs, {CLIENTS} workers", as_job, CLIENTS),
+    ):
+        if workers is not None:
+            jobs.job_manager = JobManager(workers, CLIENTS, 60, 1)
+        done, latencies = run(base, client, body)
+        print(
+            f"{name:<16} {done:>8.2f} {len(latencies):>6} "
+            f"{np.median(latencies):>14.1f} {latencies.max():>14.1f}"
+        )
+
+    upstream.shutdown()
+    server.close()
+
+
+if __name__ == "__main__":
+    main()
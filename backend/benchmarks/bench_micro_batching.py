@@ -0,0 +1,76 @@
+"""Throughput and latency of concurrent single-molecule predictions, with and
+without micro-batching.
+
+Each client thread predicts the peaks of pre-featurized molecules one after
+the other (predict_spectra with a single item, as a request does after
+featurization), so the timings cover the queueing and the forest inference.
+"off" runs every request on its own; the other rows queue requests for up to
+the given wait. p50 and p99 are request latencies in milliseconds.
+
+Run from the backend directory:
+    python -m benchmarks.bench_micro_batching
+"""
+
+import threading
+import time
+import numpy as np
+from app.config import Config
+from app.models.simpleModel.utils.batch_prediction import PREDICTORS
+from app.models.simpleModel.utils.micro_batching import micro_batchers
+from benchmarks.bench_conformer import TIERS
+
+CLIENTS = (1, 4, 16)
+WAITS_IN_MS = (None, 0, 2, 5)
+REQUESTS_PER_CLIENT = 40
+
+
+def run_clients(predictor, items, n_clients):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        own = []
+        for i in range(REQUESTS_PER_CLIENT):
+            item = items[(offset + i) % len(items)]
+            start = time.perf_counter()
+            predictor.predict_spectra([item], peaks_only=True)
+            own.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.percentile(latencies, [50, 99]) * 1000
+
+
+def main():
+    smiles_list = [smiles for tier in ("small", "medium") for smiles in TIERS[tier]]
+    print(
+        f"{'nucleus':<8} {'clients':>7} {'wait (ms)':>9} {'req/s':>7} "
+        f"{'p50 (ms)':>8} {'p99 (ms)':>8} {'req/batch':>9}"
+    )
+    for nucleus, predictor in PREDICTORS.items():
+        items = [(s, predictor.extract_features_from_smiles(s)) for s in smiles_list]
+        predictor.predict_spectra(items, peaks_only=True)
+        for n_clients in CLIENTS:
+            for wait in WAITS_IN_MS:
+                Config.MICRO_BATCHING = wait is not None
+                Config.MICRO_BATCH_MAX_WAIT_IN_MS = wait or 0
+                micro_batchers[nucleus].reset_stats()
+                throughput, (p50, p99) = run_clients(predictor, items, n_clients)
+                stats = micro_batchers[nucleus].stats()
+                print(
+                    f"{nucleus:<8} {n_clients:>7} "
+                    f"{'off' if wait is None else wait:>9} {throughput:>7.0f} "
+                    f"{p50:>8.1f} {p99:>8.1f} "
+                    f"{stats['meanRequestsPerBatch']:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Load time and memory of N worker processes serving both simple models.
+
+"compressed" is the previous artifact: scikit-learn forests saved with
+compress=3, which every worker decompresses into its own memory. "packed"
+is the format now written by train_models: flat node arrays saved
+uncompressed and memory-mapped, so workers share the pages of the file.
+
+Each worker loads both models, predicts the training rows (touching most
+tree nodes) and waits until every worker has done the same; the memory
+columns are then summed over the workers, as increases over the worker's
+footprint before loading. PSS splits shared pages between the processes
+using them, so its sum is the real cost to the host. Linux only.
+
+Run from the backend directory (needs scikit-learn models, i.e. models
+trained before the packed format or loaded from a backup):
+    python -m benchmarks.bench_model_artifacts
+"""
+
+import multiprocessing
+import os
+import queue
+import tempfile
+import time
+import pandas as pd
+from joblib import dump, load
+from app.models.simpleModel.H import model_utils_1h_v3, simpleModel_predict_1h_v3
+from app.models.simpleModel.C import model_utils_13c_v2, simpleModel_predict_13c_v2
+from app.models.simpleModel.utils import train_models
+from app.models.simpleModel.utils.columnar_features import expand_joined_list_column
+from app.models.simpleModel.utils.packed_forest import load_model, save_model
+
+WORKERS = (1, 4, 8)
+MODELS = {
+    "1H": (
+        simpleModel_predict_1h_v3.MODEL_PATH,
+        model_utils_1h_v3,
+        train_models.TRAIN_DATASET_1H_PATH,
+        ["neighbor_atomic_nums", "neighbor_H_counts_per_atom"],
+    ),
+    "13C": (
+        simpleModel_predict_13c_v2.MODEL_PATH,
+        model_utils_13c_v2,
+        train_models.TRAIN_DATASET_13C_PATH,
+        ["neighbor_atomic_nums"],
+    ),
+}
+DROPPED = ["ppm", "nb_atoms", "multiplicity", "couplings", "heavy_atom_idx"]
+
+
+def memory():
+    # (RSS, PSS) in MiB
+    values = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                values[parts[0]] = int(parts[1]) / 1024
+    return values["Rss:"], values["Pss:"]
+
+
+def training_rows(dataset_path, list_columns):
+    X = pd.read_csv(dataset_path).drop(columns=DROPPED)
+    for column in list_columns:
+        X = expand_joined_list_column(X, column)
+    return X
+
+
+def worker(paths, barrier, results):
+    rows = {
+        nucleus: training_rows(dataset, lists)
+        for nucleus, (_, _, dataset, lists) in MODELS.items()
+    }
+    rss_before, pss_before = memory()
+
+    start = time.perf_counter()
+    models = {nucleus: load_model(path) for nucleus, path in paths.items()}
+    load_seconds = time.perf_counter() - start
+
+    for nucleus, model in models.items():
+        X = rows[nucleus]
+        MODELS[nucleus][1].predict_associations(model, X, list(range(len(X))))
+
+    barrier.wait()
+    rss_after, pss_after = memory()
+    results.put((load_seconds, rss_after - rss_before, pss_after - pss_before))
+    barrier.wait()
+
+
+def run_workers(paths, n_workers):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(n_workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(paths, barrier, results))
+        for _ in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+
+    measured = []
+    while len(measured) < n_workers:
+        try:
+            measured.append(results.get(timeout=1))
+        except queue.Empty:
+            if any(process.exitcode not in (None, 0) for process in processes):
+                # A worker died, typically killed when memory ran out
+                for process in processes:
+                    process.terminate()
+                return None
+    for process in processes:
+        process.join()
+
+    load_seconds = sum(m[0] for m in measured) / n_workers
+    return load_seconds, sum(m[1] for m in measured), sum(m[2] for m in measured)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        artifacts = {"compressed": {}, "packed": {}}
+        for nucleus, (path, _, _, _) in MODELS.items():
+            model = load(path)
+            if "forest_engine" in model:
+                raise SystemExit(
+                    f"{path} is already packed; restore a scikit-learn model"
+                )
+            for fmt in artifacts:
+                artifacts[fmt][nucleus] = os.path.join(directory, f"{fmt}_{nucleus}")
+            dump(model, artifacts["compressed"][nucleus], compress=3)
+            save_model(model, artifacts["packed"][nucleus])
+            del model
+
+        print(
+            f"{'format':<11} {'workers':>7} {'load (s)':>8} "
+            f"{'RSS total (MiB)':>15} {'PSS total (MiB)':>15}"
+        )
+        for fmt, paths in artifacts.items():
+            size = sum(os.path.getsize(p) for p in paths.values()) / 2**20
+            for n_workers in WORKERS:
+                measured = run_workers(paths, n_workers)
+                if measured is None:
+                    print(f"{fmt:<11} {n_workers:>7}   a worker died (out of memory?)")
+                    continue
+                load_seconds, rss, pss = measured
+                print(
+                    f"{fmt:<11} {n_workers:>7} {load_seconds:>8.2f} "
+                    f"{rss:>15.0f} {pss:>15.0f}"
+                )
+            print(f"{fmt:<11} {'file':>7} {size:>33.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
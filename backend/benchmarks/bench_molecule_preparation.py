@@ -0,0 +1,102 @@
+"""Latency of one analysis session: Kekulé conversion, atom-ID image, 1H and
+13C prediction of the same SMILES.
+
+"separate" reproduces the previous behaviour: every step parses and prepares
+its own molecule and the two nuclei are predicted one after the other.
+"shared" prepares the molecule once and predicts both nuclei concurrently,
+as the "1H+13C" request mode does. Prediction results are not cached in
+either case. The "prep" columns time the same steps with featurization in
+place of prediction, i.e. without the forest inference.
+
+Run from the backend directory:
+    python -m benchmarks.bench_molecule_preparation
+"""
+
+import time
+from rdkit import Chem
+from app.api.services.kekule_converter import convert_smiles_to_kekule
+from app.api.services.molecule_image_generator import (
+    generate_molecule_image_with_atom_ids,
+)
+from app.models.simpleModel.utils import molecule_preparation
+from app.models.simpleModel.utils.batch_prediction import PREDICTORS, predict_nuclei
+from app.models.simpleModel.utils.prediction_cache import prediction_cache
+from benchmarks.bench_conformer import TIERS
+
+
+def clear_caches():
+    molecule_preparation.canonical_numbering.cache_clear()
+    molecule_preparation.prepared_molecule.cache_clear()
+    prediction_cache.clear()
+
+
+def separate_session(smiles):
+    clear_caches()
+    convert_smiles_to_kekule(smiles)
+    clear_caches()
+    generate_molecule_image_with_atom_ids(smiles)
+    for predictor in PREDICTORS.values():
+        clear_caches()
+        predictor.predict_spectrum(smiles)
+
+
+def separate_preparation(smiles):
+    clear_caches()
+    convert_smiles_to_kekule(smiles)
+    clear_caches()
+    generate_molecule_image_with_atom_ids(smiles)
+    for predictor in PREDICTORS.values():
+        clear_caches()
+        predictor.extract_features_from_smiles(smiles)
+
+
+def shared_preparation(smiles):
+    clear_caches()
+    convert_smiles_to_kekule(smiles)
+    generate_molecule_image_with_atom_ids(smiles)
+    for predictor in PREDICTORS.values():
+        predictor.extract_features_from_smiles(smiles)
+
+
+def shared_session(smiles):
+    clear_caches()
+    convert_smiles_to_kekule(smiles)
+    generate_molecule_image_with_atom_ids(smiles)
+    predict_nuclei(smiles, list(PREDICTORS))
+
+
+def mean_latency(func, smiles_list, repeat=3):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for smiles in smiles_list:
+            func(smiles)
+    return (time.perf_counter() - start) / (repeat * len(smiles_list))
+
+
+def main():
+    for smiles in TIERS["small"]:
+        shared_session(smiles)
+
+    print(
+        f"{'tier':<7} {'heavy atoms':>11} {'prep separate (ms)':>18} "
+        f"{'prep shared (ms)':>16} {'separate (ms)':>13} {'shared (ms)':>11}"
+    )
+    for tier, smiles_list in TIERS.items():
+        sizes = [Chem.MolFromSmiles(s).GetNumHeavyAtoms() for s in smiles_list]
+        timings = [
+            mean_latency(session, smiles_list) * 1000
+            for session in (
+                separate_preparation,
+                shared_preparation,
+                separate_session,
+                shared_session,
+            )
+        ]
+        print(
+            f"{tier:<7} {f'{min(sizes)}-{max(sizes)}':>11} {timings[0]:>18.1f} "
+            f"{timings[1]:>16.1f} {timings[2]:>13.1f} {timings[3]:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
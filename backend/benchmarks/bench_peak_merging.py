@@ -0,0 +1,176 @@
+"""Compare the previous association post-processing with peak_merging on
+macromolecule-sized inputs.
+
+"legacy" is the code previously copied in the 1H and 13C predictors: the
+tolerance merge of predict_associations and the duplicate scan of
+render_associations, which compares every association with every merged
+peak. "shared" is merge_close_associations followed by
+collapse_identical_peaks. Random associations mimic the predictions of
+large molecules (exact duplicates from symmetric atoms, tight clusters,
+missing atom counts, mixed multiplicities). Before timing, both versions
+are run on many random inputs and must give identical peak lists.
+
+Run from the backend directory:
+    python -m benchmarks.bench_peak_merging
+"""
+
+import time
+import numpy as np
+from app.models.simpleModel.utils.peak_merging import (
+    collapse_identical_peaks,
+    merge_close_associations,
+    multiplicity_complexity,
+)
+
+GROUPS = (100, 500, 2000)
+MULTIPLICITIES = [None, "s", "d", "t", "q", "dd", "dt", "td", "ddd"]
+PPM_TOL = 0.15
+
+
+def legacy_merge(associations, ppm_tol):
+    merged = []
+    associations = sorted(associations, key=lambda x: x["ppm"])
+    if not associations:
+        return merged
+
+    current = associations[0].copy()
+    for assoc in associations[1:]:
+        if abs(assoc["ppm"] - current["ppm"]) < ppm_tol:
+            nb1 = current["nb_atoms"] or 1
+            nb2 = assoc["nb_atoms"] or 1
+            total_nb = nb1 + nb2
+
+            current["ppm"] = (current["ppm"] * nb1 + assoc["ppm"] * nb2) / total_nb
+            current["nb_atoms"] = total_nb
+            current["atoms"].extend(assoc["atoms"])
+
+            if multiplicity_complexity(assoc["multiplicity"]) > multiplicity_complexity(
+                current["multiplicity"]
+            ):
+                current["multiplicity"] = assoc["multiplicity"]
+                current["couplings"] = assoc["couplings"]
+
+        else:
+            merged.append(current)
+            current = assoc.copy()
+
+    merged.append(current)
+    return merged
+
+
+def legacy_collapse(associations_pred):
+    merged_peaks = []
+    for assoc in sorted(associations_pred, key=lambda assoc: assoc["ppm"]):
+        key = (
+            round(assoc["ppm"], 6),
+            assoc["nb_atoms"],
+            assoc["multiplicity"],
+            tuple(assoc["couplings"]),
+        )
+
+        found = False
+        for peak in merged_peaks:
+            peak_keys = (
+                round(peak["ppm"], 6),
+                peak["nb_atoms"],
+                peak["multiplicity"],
+                tuple(peak["couplings"]),
+            )
+            if peak_keys == key:
+                peak["atoms"].update(assoc.get("atoms", []))
+                found = True
+                break
+        if not found:
+            new_assoc = assoc.copy()
+            new_assoc["atoms"] = set(assoc.get("atoms", []))
+            merged_peaks.append(new_assoc)
+
+    for peak in merged_peaks:
+        peak["atoms"] = list(peak["atoms"])
+    return merged_peaks
+
+
+def random_associations(n_groups, rng, ppm_range=10.0):
+    # Distinct environments, each repeated by a few symmetric atoms
+    environments = []
+    for _ in range(max(1, n_groups // 3)):
+        multiplicity = MULTIPLICITIES[rng.integers(len(MULTIPLICITIES))]
+        n_couplings = len(multiplicity) if multiplicity else 0
+        environments.append(
+            {
+                "ppm": float(rng.uniform(0, ppm_range)),
+                "nb_atoms": [None, 1, 2, 3][rng.integers(4)],
+                "multiplicity": multiplicity,
+                "couplings": [float(c) for c in rng.uniform(0, 15, n_couplings)],
+            }
+        )
+
+    associations = []
+    for atom in range(n_groups):
+        environment = environments[rng.integers(len(environments))]
+        assoc = {**environment, "atoms": [atom]}
+        if rng.random() < 0.3:
+            assoc["ppm"] += float(rng.normal(0, 0.05))
+        associations.append(assoc)
+    rng.shuffle(associations)
+    return associations
+
+
+def copied(associations):
+    return [{**a, "atoms": list(a["atoms"])} for a in associations]
+
+
+def legacy(associations, merge):
+    merged = legacy_merge(associations, PPM_TOL) if merge else associations
+    return legacy_collapse(merged)
+
+
+def shared(associations, merge):
+    merged = merge_close_associations(associations, PPM_TOL) if merge else associations
+    return collapse_identical_peaks(merged)
+
+
+def check_equivalence(rng, n_inputs=300):
+    for i in range(n_inputs):
+        n_groups = int(rng.integers(0, 300))
+        ppm_range = [0.5, 10.0, 250.0][i % 3]
+        associations = random_associations(n_groups, rng, ppm_range)
+        for merge in (True, False):
+            expected = legacy(copied(associations), merge)
+            if shared(copied(associations), merge) != expected:
+                raise SystemExit(f"Different peak lists for input {i}")
+    print(f"{n_inputs} random inputs: identical peak lists")
+
+
+def median_seconds(func, repeat=20):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    check_equivalence(rng)
+
+    print(
+        f"{'groups':>6} {'merge':>5} {'peaks':>5} {'legacy (ms)':>11} "
+        f"{'shared (ms)':>11} {'speed-up':>9}"
+    )
+    for n_groups in GROUPS:
+        associations = random_associations(n_groups, rng)
+        for merge in (True, False):
+            t_legacy = median_seconds(lambda: legacy(copied(associations), merge))
+            t_shared = median_seconds(lambda: shared(copied(associations), merge))
+            n_peaks = len(shared(copied(associations), merge))
+            print(
+                f"{n_groups:>6} {str(merge):>5} {n_peaks:>5} "
+                f"{t_legacy * 1000:>11.2f} {t_shared * 1000:>11.2f} "
+                f"{t_legacy / t_shared:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Compare calling /api/predict once per predictor with one /api/predictMany
+call for the same predictors.
+
+The predictors are stubs on this machine: a stand-in HTTP server whose path
+picks the behaviour (/delay/<ms> answers after that many milliseconds,
+/fail answers 500, /hang answers after HANG_SECONDS, past the deadline),
+plus the in-process simple model. The predictor response cache is disabled,
+so every run calls the stubs.
+
+"legacy" is one /api/predict request per predictor, all sent at once as a
+browser would. "thread time" is the time server threads are held, summed
+over the requests. "fan-out" is one /api/predictMany request (all results
+at the end), and "stream" the same with "stream": true, where "first
+result" is the time to its first line.
+
+Run from the backend directory:
+    python -m benchmarks.bench_predict_many
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app import create_app
+from app.api.routes import predict
+
+HANG_SECONDS = 3
+DEADLINE = 1.0
+SMILES = "CCOC(=O)c1ccccc1"
+
+
+class StubPredictor(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.startswith("/delay/"):
+            time.sleep(int(self.path.rsplit("/", 1)[1]) / 1000)
+        elif self.path == "/hang":
+            time.sleep(HANG_SECONDS)
+        status = 500 if self.path == "/fail" else 200
+        body = json.dumps(
+            {
+                "smiles": payload["smiles"],
+                "peaksInfos": [],
+                "spectrum": [{"ppm": 1.0, "intensity": 0.5}],
+                "metadata": {"nucleusType": payload.get("type", "1H")},
+            }
+        ).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class NoCache:
+    def fetch(self, key, call):
+        return call()
+
+
+def legacy(app, predictions):
+    # Wall time, summed request times and status of each call
+    def send(prediction):
+        start = time.perf_counter()
+        response = app.test_client().post(
+            "/api/predict", json={"smiles": SMILES, **prediction}
+        )
+        return time.perf_counter() - start, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(len(predictions)) as pool:
+        calls = list(pool.map(send, predictions))
+    wall = time.perf_counter() - start
+    return wall, sum(t for t, _ in calls), [status for _, status in calls]
+
+
+def fan_out(client, predictions):
+    start = time.perf_counter()
+    response = client.post(
+        "/api/predictMany",
+        json={"smiles": SMILES, "predictions": predictions, "timeout": DEADLINE},
+    )
+    results = response.get_json()["results"]
+    return time.perf_counter() - start, [r["status"] for r in results]
+
+
+def stream(client, predictions):
+    start = time.perf_counter()
+    response = client.post(
+        "/api/predictMany",
+        json={
+            "smiles": SMILES,
+            "predictions": predictions,
+            "timeout": DEADLINE,
+            "stream": True,
+        },
+        buffered=False,
+    )
+    first, order = None, []
+    for line in response.response:
+        line = json.loads(line)
+        if first is None:
+            first = time.perf_counter() - start
+        if "index" in line:
+            order.append(line["index"])
+    return time.perf_counter() - start, first, order
+
+
+def main():
+    app = create_app(serve_frontend=False)
+    client = app.test_client()
+    predict.predictor_cache = NoCache()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubPredictor)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub = f"http://127.0.0.1:{server.server_address[1]}"
+
+    local = {"endpoint": "api/simpleModelPrediction", "type": "1H"}
+    client.post("/api/predict", json={"smiles": SMILES, **local})
+    cases = {
+        "4 x 200 ms": [{"endpoint": f"{stub}/delay/200"}] * 4,
+        "mixed delays": [
+            {"endpoint": f"{stub}/delay/{ms}", "type": "13C"} for ms in (50, 400, 150)
+        ]
+        + [local],
+        "with failures": [
+            {"endpoint": f"{stub}/delay/300"},
+            {"endpoint": f"{stub}/fail"},
+            {"endpoint": f"{stub}/hang"},
+            local,
+        ],
+    }
+
+    for name, predictions in cases.items():
+        print(f"{name}: {len(predictions)} predictors")
+        wall, held, statuses = legacy(app, predictions)
+        print(f"  legacy   {wall * 1000:8.1f} ms  thread time {held * 1000:8.1f} ms")
+        print(f"           statuses {statuses}")
+        wall, statuses = fan_out(client, predictions)
+        print(f"  fan-out  {wall * 1000:8.1f} ms  thread time {wall * 1000:8.1f} ms")
+        print(f"           statuses {statuses}")
+        wall, first, order = stream(client, predictions)
+        print(f"  stream   {wall * 1000:8.1f} ms  first result {first * 1000:8.1f} ms")
+        print(f"           order {order}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Latency of /api/predict calls to an external and to a local predictor.
+
+The external predictor is a stand-in HTTP server on this machine that
+returns either a fixed 2000-point spectrum or only a peak list. "new
+connection" is the previous client (one requests.post, so one TCP
+connection, per call); "pooled" is post_to_predictor with its keep-alive
+session. The TLS handshake that a remote HTTPS predictor adds to every new
+connection is not included.
+
+The local predictor is the simple model (1H, prediction cached, so the
+timings are the dispatch overhead). "HTTP loopback" posts to this app
+served by waitress, as relative endpoints did before; "in-process" calls
+the route's code directly. The last rows time whole /api/predict requests
+through the Flask test client.
+
+Run from the backend directory:
+    python -m benchmarks.bench_predict_proxy
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import requests
+from waitress.server import create_server
+from app import create_app
+from app.config import Config
+from app.api.routes import predict
+from app.api.services.predictor_client import post_to_predictor
+
+CALLS = 200
+SMILES = "CCOC(=O)c1ccccc1"
+
+
+class StandInPredictor(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Like production servers; otherwise the body of a keep-alive response
+    # waits for the client's delayed ACK of the headers
+    disable_nagle_algorithm = True
+    x = np.linspace(10, 0, 2000)
+    spectrum_body = json.dumps(
+        {
+            "smiles": SMILES,
+            "peaksInfos": [],
+            "spectrum": [
+                {"ppm": float(v), "intensity": float(np.exp(-(((v - 3) / 0.01) ** 2)))}
+                for v in x
+            ],
+            "metadata": {"nucleusType": "1H"},
+        }
+    ).encode()
+    peaks_body = json.dumps({"smiles": SMILES, "peaksInfos": []}).encode()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = self.peaks_body if self.path == "/peaks" else self.spectrum_body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_in_background(server, serve):
+    threading.Thread(target=serve, daemon=True).start()
+    return server
+
+
+def latencies(func):
+    func()
+    timings = []
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return np.percentile(timings, [50, 99]) * 1000
+
+
+def report(label, timings):
+    print(f"{label:<40} {timings[0]:>8.2f} {timings[1]:>8.2f}")
+
+
+def main():
+    app = create_app(serve_frontend=False)
+    client = app.test_client()
+
+    stand_in = ThreadingHTTPServer(("127.0.0.1", 0), StandInPredictor)
+    serve_in_background(stand_in, stand_in.serve_forever)
+    stand_in_url = f"http://127.0.0.1:{stand_in.server_address[1]}"
+
+    loopback = create_server(app, host="127.0.0.1", port=0, threads=4)
+    serve_in_background(loopback, loopback.run)
+    Config.LOCAL_PREDICTOR_URL = f"http://127.0.0.1:{loopback.effective_port}"
+
+    payload = {"smiles": SMILES, "type": "1H"}
+    local_url = f"{Config.LOCAL_PREDICTOR_URL}/api/simpleModelPrediction"
+    timeout = Config.PREDICTION_MODEL_TIMEOUT_IN_SECONDS
+
+    def new_connection(url):
+        response = requests.post(url, json=payload, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    print(f"{'call':<40} {'p50 (ms)':>8} {'p99 (ms)':>8}")
+    for path in ("/spectrum", "/peaks"):
+        url = stand_in_url + path
+        report(
+            f"stand-in {path}, new connection",
+            latencies(lambda: new_connection(url)),
+        )
+        report(
+            f"stand-in {path}, pooled",
+            latencies(lambda: post_to_predictor(url, payload)),
+        )
+    report(
+        "simple model, HTTP loopback (new conn.)",
+        latencies(lambda: new_connection(local_url)),
+    )
+    report(
+        "simple model, HTTP loopback (pooled)",
+        latencies(lambda: post_to_predictor(local_url, payload)),
+    )
+    local = predict.LOCAL_PREDICTORS["api/simpleModelPrediction"]
+    with app.test_request_context():
+        report("simple model, in-process", latencies(lambda: local(payload)))
+
+    body = {"smiles": SMILES, "endpoint": "api/simpleModelPrediction", "type": "1H"}
+    report(
+        "/api/predict, relative, in-process",
+        latencies(lambda: client.post("/api/predict", json=body)),
+    )
+    predict.LOCAL_PREDICTORS.clear()
+    report(
+        "/api/predict, relative, HTTP (pooled)",
+        latencies(lambda: client.post("/api/predict", json=body)),
+    )
+    predict.LOCAL_PREDICTORS["api/simpleModelPrediction"] = local
+
+    stand_in.shutdown()
+    loopback.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Upstream calls and latency of /api/predict with and without the predictor
+response cache.
+
+The external predictor is a stand-in HTTP server on this machine that
+answers after UPSTREAM_DELAY seconds and counts its calls. "legacy" sends
+every request upstream, as before; "cached" goes through predictor_cache
+(TTL cache and single flight). Requests are whole /api/predict calls through
+the Flask test client, sent by concurrent threads:
+
+- burst: CLIENTS identical requests at once (several users or tabs asking
+  for the same molecule)
+- mixed: CLIENTS threads sending REQUESTS_PER_CLIENT requests each, drawn
+  from DISTINCT molecules in random order
+- repeat: one client asking again for a molecule it already asked for
+
+Run from the backend directory:
+    python -m benchmarks.bench_predictor_cache
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from app import create_app
+from app.api.routes import predict
+from app.api.services.predictor_cache import PredictorCache
+
+UPSTREAM_DELAY = 0.2
+CLIENTS = 16
+REQUESTS_PER_CLIENT = 8
+DISTINCT = ["CCO", "CCN", "CCC", "c1ccccc1O", "CC(=O)O", "CCOC(=O)C", "C1CCCCC1"]
+
+
+class SlowPredictor(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    calls = 0
+    calls_lock = threading.Lock()
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.calls_lock:
+            SlowPredictor.calls += 1
+        time.sleep(UPSTREAM_DELAY)
+        body = json.dumps(
+            {
+                "smiles": payload["smiles"],
+                "peaksInfos": [],
+                "spectrum": [{"ppm": 1.0, "intensity": 0.5}],
+                "metadata": {"nucleusType": "1H"},
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class NoCache:
+    def fetch(self, key, call):
+        return call()
+
+
+def run(app, bodies):
+    # Upstream calls, wall time and p50 / max latency of the bodies, sent by
+    # CLIENTS threads
+    def send(body):
+        start = time.perf_counter()
+        response = app.test_client().post("/api/predict", json=body)
+        assert response.status_code == 200, response.data
+        return time.perf_counter() - start
+
+    calls = SlowPredictor.calls
+    start = time.perf_counter()
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        timings = list(pool.map(send, bodies))
+    wall = time.perf_counter() - start
+    return SlowPredictor.calls - calls, wall, np.median(timings), max(timings)
+
+
+def main():
+    app = create_app(serve_frontend=False)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowPredictor)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/predict"
+
+    def body(smiles):
+        return {"smiles": smiles, "endpoint": endpoint, "type": "1H"}
+
+    rng = np.random.default_rng(0)
+    mixed = rng.integers(len(DISTINCT), size=CLIENTS * REQUESTS_PER_CLIENT)
+    # Name, requests sent beforehand, timed requests
+    scenarios = [
+        ("burst", [], [body("CCOC(=O)c1ccccc1")] * CLIENTS),
+        ("mixed", [], [body(DISTINCT[i]) for i in mixed]),
+        ("repeat", [body("CC(C)O")], [body("CC(C)O")]),
+    ]
+
+    print(
+        f"{'scenario':<8} {'version':<7} {'requests':>8} {'upstream':>8} "
+        f"{'wall (s)':>8} {'p50 (ms)':>9} {'max (ms)':>9}"
+    )
+    for name, before, bodies in scenarios:
+        for version in ("legacy", "cached"):
+            cached = version == "cached"
+            predict.predictor_cache = PredictorCache(128, 600) if cached else NoCache()
+            if before:
+                run(app, before)
+            calls, wall, p50, longest = run(app, bodies)
+            print(
+                f"{name:<8} {version:<7} {len(bodies):>8} {calls:>8} "
+                f"{wall:>8.2f} {p50 * 1000:>9.1f} {longest * 1000:>9.1f}"
+            )
+        stats = predict.predictor_cache.stats()
+        print(
+            f"{'':<8} cache: hits {stats['hits']}, misses {stats['misses']}, "
+            f"coalesced {stats['coalesced']}, max waiters {stats['maxWaiters']}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Simple model predictions run inline and in the prediction process pool.
+
+"inline" is the current default: /api/simpleModelPrediction computes the
+spectrum in the server process. "pool" sets SIMPLE_MODEL_PROCESS_POOL with
+WORKERS workers. The prediction cache is cleared before each request, so
+every request computes its spectrum.
+
+The second part sends SLOW_SMILES, a molecule whose 1H featurization takes
+several seconds, with a DEADLINE seconds deadline, and meanwhile one
+request for SMILES every PROBE_INTERVAL seconds. Inline, the slow
+prediction runs to its end and the probes share the interpreter with it;
+in the pool, its worker is killed at the deadline and replaced.
+
+Run from the backend directory:
+    python -m benchmarks.bench_process_pool
+"""
+
+import threading
+import time
+import numpy as np
+from app import create_app
+from app.config import Config
+from app.models.simpleModel.utils import process_pool
+from app.models.simpleModel.utils.prediction_cache import prediction_cache
+
+WORKERS = 2
+DEADLINE = 2
+REPEATS = 20
+PROBE_INTERVAL = 0.1
+SMILES = ["CCO", "c1ccccc1CC(=O)OCC", "CC(C)Cc1ccc(cc1)C(C)C(=O)O"]
+SLOW_SMILES = "CC(C)(O)" * 800
+
+
+def predict(client, smiles, nuclei="1H+13C"):
+    prediction_cache.clear()
+    start = time.perf_counter()
+    result = client.post(
+        "/api/simpleModelPrediction", json={"smiles": smiles, "type": nuclei}
+    ).get_json()
+    return time.perf_counter() - start, result
+
+
+def latencies(client):
+    return np.array(
+        [predict(client, smiles)[0] for _ in range(REPEATS) for smiles in SMILES]
+    )
+
+
+def with_slow_prediction(client):
+    # Time and answer of the slow prediction, latencies of the probes
+    probes = []
+    slow = {}
+
+    def send_slow():
+        slow["time"], slow["result"] = predict(client, SLOW_SMILES, "1H")
+
+    thread = threading.Thread(target=send_slow)
+    thread.start()
+    time.sleep(PROBE_INTERVAL)
+    while thread.is_alive():
+        probes.append(predict(client, SMILES[1])[0])
+        time.sleep(PROBE_INTERVAL)
+    thread.join()
+    return slow["time"], slow["result"], np.array(probes)
+
+
+def wait_for_workers(pool):
+    while pool.stats()["idle"] < WORKERS:
+        time.sleep(0.05)
+
+
+def report(name, times):
+    times = times * 1000
+    print(
+        f"  {name:<8} p50 {np.median(times):8.1f} ms  "
+        f"p95 {np.percentile(times, 95):8.1f} ms  max {times.max():8.1f} ms"
+    )
+
+
+def main():
+    app = create_app(serve_frontend=False)
+    client = app.test_client()
+    for smiles in SMILES:
+        predict(client, smiles)
+
+    print(f"{len(SMILES)} molecules x {REPEATS}, 1H+13C")
+    report("inline", latencies(client))
+
+    Config.SIMPLE_MODEL_PROCESS_POOL = True
+    Config.PROCESS_POOL_WORKERS = WORKERS
+    Config.PROCESS_POOL_DEADLINE_IN_SECONDS = DEADLINE
+    start = time.perf_counter()
+    pool = process_pool.start_prediction_pool()
+    wait_for_workers(pool)
+    print(f"  {WORKERS} workers ready in {time.perf_counter() - start:.2f} s")
+    report("pool", latencies(client))
+
+    print(f"slow 1H prediction, {DEADLINE} s deadline in the pool")
+    for name, enabled in (("inline", False), ("pool", True)):
+        Config.SIMPLE_MODEL_PROCESS_POOL = enabled
+        wait_for_workers(pool)
+        elapsed, result, probes = with_slow_prediction(client)
+        answer = result.get("error", "spectrum")
+        print(f"  {name:<8} slow request {elapsed:6.2f} s: {answer}")
+        report("probes", probes)
+
+    print(f"  pool stats {process_pool.process_pool_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Compare the windowed renderer with the original full-grid renderer.
+
+Run from the backend directory:
+    python -m benchmarks.bench_simulate_spectrum
+"""
+
+import time
+import numpy as np
+from scipy.stats import norm
+from app.models.simpleModel.utils.draw_peaks_and_spectrum import (
+    collect_lines,
+    get_subpeak_shifts,
+    render_lines,
+    simulate_spectrum,
+)
+
+MULTIPLICITIES = ["s", "d", "t", "q", "dd", "dt", "td", "ddd", "ddt"]
+
+
+def legacy_simulate_spectrum(associations, fwhm, ppm_range, resolution):
+    x = np.linspace(ppm_range[1], ppm_range[0], resolution)
+    y = np.zeros_like(x)
+    atoms_ids = [set() for _ in range(len(x))]
+
+    for assoc in associations:
+        mult = assoc.get("multiplicity", "s") or "s"
+        positions, intensities = get_subpeak_shifts(
+            mult.lower(), assoc["couplings"], assoc["ppm"]
+        )
+        for pos, amp in zip(positions, intensities):
+            peak = (
+                assoc["nb_atoms"] * amp * norm.pdf(x, loc=pos, scale=fwhm / 2.355) * 5e4
+            )
+            y += peak
+            for i in range(len(x)):
+                if peak[i] > 1e-3:
+                    atoms_ids[i].update(assoc["atoms"])
+
+    return x, y, atoms_ids
+
+
+def random_associations(n_groups, ppm_range, rng):
+    associations = []
+    for i in range(n_groups):
+        multiplicity = MULTIPLICITIES[rng.integers(len(MULTIPLICITIES))]
+        associations.append(
+            {
+                "ppm": float(rng.uniform(ppm_range[0] + 0.5, ppm_range[1] - 0.5)),
+                "atoms": [i],
+                "nb_atoms": int(rng.integers(1, 4)),
+                "multiplicity": multiplicity,
+                "couplings": [
+                    float(rng.uniform(1, 15)) for _ in range(len(multiplicity))
+                ],
+            }
+        )
+    return associations
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    rng = np.random.default_rng(0)
+    ppm_range = (0, 10)
+
+    # "total" includes the atom ID intervals, "engine" is render_lines only
+    print(
+        f"{'groups':>6} {'lines':>6} {'legacy (s)':>11} {'total (s)':>10} "
+        f"{'engine f64':>11} {'engine f32':>11} {'speed-up':>9} "
+        f"{'max rel err':>12} {'atom IDs':>9}"
+    )
+    for n_groups in (5, 10, 20, 40):
+        associations = random_associations(n_groups, ppm_range, rng)
+
+        (x, y_ref, ids_ref), t_ref = timed(
+            legacy_simulate_spectrum, associations, 0.004, ppm_range, 64000
+        )
+        (_, y, annotations), t_new = timed(
+            simulate_spectrum, associations, 0.004, ppm_range, 64000
+        )
+        positions, amplitudes, _ = collect_lines(associations)
+        _, t_f64 = timed(render_lines, x, positions, amplitudes, 0.004)
+        _, t_f32 = timed(
+            render_lines, x, positions, amplitudes, 0.004, dtype=np.float32
+        )
+
+        max_rel_err = np.max(np.abs(y - y_ref)) / np.max(y_ref)
+        ids = annotations.for_points(x)
+        same_ids = "same" if ids == [sorted(s) for s in ids_ref] else "DIFF"
+        print(
+            f"{n_groups:>6} {len(positions):>6} {t_ref:>11.3f} {t_new:>10.4f} "
+            f"{t_f64:>11.4f} {t_f32:>11.4f} {t_ref / t_new:>8.0f}x "
+            f"{max_rel_err:>12.1e} {same_ids:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Forest inference on the feature rows of symmetric molecules, with and
+without deduplication of identical rows.
+
+Symmetric atoms (the methyls of a tert-butyl group, the carbons of a
+para-substituted benzene) have identical feature rows. "all rows" evaluates
+every row, "distinct rows" (ForestEngine.predict) evaluates each distinct
+row once and copies its predictions back. The last column checks that both
+give the same predictions.
+
+Run from the backend directory:
+    python -m benchmarks.bench_symmetry_dedup
+"""
+
+import time
+import numpy as np
+from app.models.simpleModel.H import model_utils_1h_v3
+from app.models.simpleModel.C import model_utils_13c_v2
+from app.models.simpleModel.utils.batch_prediction import PREDICTORS
+from app.models.simpleModel.utils.packed_forest import forest_engine
+
+MODEL_UTILS = {"1H": model_utils_1h_v3, "13C": model_utils_13c_v2}
+MOLECULES = {
+    "tert-butylbenzene": "CC(C)(C)c1ccccc1",
+    "p-xylene": "Cc1ccc(C)cc1",
+    "hexamethylbenzene": "Cc1c(C)c(C)c(C)c(C)c1C",
+    "naphthalene": "c1ccc2ccccc2c1",
+    "tripalmitin": "CCCCCCCCCCCCCCCC(=O)OCC(COC(=O)CCCCCCCCCCCCCCC)"
+    "OC(=O)CCCCCCCCCCCCCCC",
+    "aspirin": "CC(=O)Oc1ccccc1C(=O)O",
+}
+
+
+def median_seconds(func, repeat=200):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    print(
+        f"{'nucleus':<8} {'molecule':<18} {'rows':>4} {'distinct':>8} "
+        f"{'all rows (ms)':>13} {'distinct rows (ms)':>18} {'same':>5}"
+    )
+    for nucleus, predictor in PREDICTORS.items():
+        model, _ = predictor.MODEL.get()
+        engine = forest_engine(model)
+        for name, smiles in MOLECULES.items():
+            features = predictor.extract_features_from_smiles(smiles)
+            X = MODEL_UTILS[nucleus].transform_features(
+                model, features.drop(columns=["heavy_atom_idx"])
+            )
+            X = np.asarray(X, dtype=np.float32)
+            n_distinct = len(np.unique(X, axis=0))
+
+            t_all = median_seconds(lambda: engine.predict_rows(X))
+            t_distinct = median_seconds(lambda: engine.predict(X))
+            expected, predicted = engine.predict_rows(X), engine.predict(X)
+            same = all(np.array_equal(expected[k], predicted[k]) for k in expected)
+            print(
+                f"{nucleus:<8} {name:<18} {len(X):>4} {n_distinct:>8} "
+                f"{t_all * 1000:>13.2f} {t_distinct * 1000:>18.2f} {str(same):>5}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare the point-dict JSON payload with the columnar and binary formats.
+
+Run from the backend directory:
+    python -m benchmarks.bench_wire_format
+"""
+
+import json
+import time
+import numpy as np
+from app.api.services.spectrum_encoding import encode_binary, encode_columns
+from app.models.simpleModel.utils.draw_peaks_and_spectrum import (
+    simulate_spectrum,
+    spectrum_to_points,
+)
+from benchmarks.bench_simulate_spectrum import random_associations
+
+
+def timed(func, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    rng = np.random.default_rng(0)
+    associations = random_associations(40, (0, 10), rng)
+    x_full, y_full, annotations = simulate_spectrum(associations, 0.004, (0, 10), 64000)
+
+    print(
+        f"{'points':>7} {'format':<10} {'size (kB)':>10} {'build+serialize (ms)':>21}"
+    )
+    for n_points in (2000, 20000, 64000):
+        step = len(x_full) // n_points
+        x, y = x_full[::step][:n_points], y_full[::step][:n_points]
+        body = {"smiles": "C", "peaksInfos": [], "metadata": {"nucleusType": "1H"}}
+
+        payload, elapsed = timed(
+            lambda: json.dumps(
+                {**body, "spectrum": spectrum_to_points(x, y, annotations)}
+            )
+        )
+        print(
+            f"{n_points:>7} {'json':<10} {len(payload) / 1024:>10.0f} "
+            f"{elapsed * 1000:>21.1f}"
+        )
+
+        body["atomIntervals"] = annotations.to_json()
+        payload, elapsed = timed(
+            lambda: json.dumps({**body, "spectrum": encode_columns(x, y)})
+        )
+        print(
+            f"{n_points:>7} {'columnar':<10} {len(payload) / 1024:>10.0f} "
+            f"{elapsed * 1000:>21.1f}"
+        )
+
+        payload, elapsed = timed(lambda: encode_binary(body, x, y))
+        print(
+            f"{n_points:>7} {'binary':<10} {len(payload) / 1024:>10.0f} "
+            f"{elapsed * 1000:>21.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()